@@ -1,112 +1,386 @@
+import builtins
 import json 
-import copy
-from typing import Dict
-from onshape_client.onshape_url import OnshapeElement 
+import keyword
+import re
+import textwrap
+from typing import Dict, List
 
+import snippet_runtime
+from snippet_runtime.downloads import is_download  # the operations with a "_download" version 
+from snippet_runtime.payloads import Payload  # the base of the payload builders 
+from snippet_runtime.tessellation import ARRAY_DECODERS  # the operations with an "_arrays" version 
+from snippet_runtime.urls import ELEMENT_PATH_PARAMS  # the path parameters filled from the document url 
+from spec_index import get_index, split_path
 
-def clean_request_body(openApi: Dict, body: Dict, add_used: Dict) -> Dict: 
+
+class FrozenTemplate(dict): 
     """
-    A recursion built to clean the request_body with all the "$ref"
-    
-    add_used: the addresses that have been used; avoid infinite recursion depth 
-                if a component of the body allows multiple sub_components of the same 
-                type as the mother component 
-    address: the cleaned address; e.g., "BTMFeature-134"
-    body: the retrieved request body, potentially with more refs inside
-    """
-    for key, item in body.items(): 
-        # Reference to other schema inside a schema reference 
-        if '$ref' in item: 
-            address = item['$ref'].split('/')[-1]
-            if address in add_used: 
-                body[key] = "string"
-            else: 
-                add_used[address] = True 
-                if 'properties' in openApi['components']['schemas'][address]: 
-                    sub_body = copy.deepcopy(openApi['components']['schemas'][address]['properties'])
-                    body[key] = clean_request_body(openApi, sub_body, add_used)
+    A read-only dictionary for expanded schema templates, which are shared by 
+    every endpoint referencing the same schema instead of being deep copied 
+    """
+    def _read_only(self, *args, **kwargs): 
+        raise TypeError("Schema templates are shared between endpoints and cannot be modified")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+
+def _freeze(value): 
+    if isinstance(value, dict): 
+        return FrozenTemplate((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list): 
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class SchemaResolver: 
+    """
+    Expands the "$ref" component schemas of the OpenAPI spec into payload templates. 
+
+    Every schema is expanded once per cycle-cut set (the addresses already used when 
+    it is reached) and the resulting immutable template is memoized, together with the 
+    addresses the expansion used up, so shared schemas (e.g., the BTM feature types) 
+    are not re-expanded for every endpoint that references them. 
+    """
+    def __init__(self, openApi: Dict): 
+        self.openApi = openApi
+        self.schemas = openApi['components']['schemas']
+        self._expanded = {}  # (address, frozenset(add_used)) -> (template, added addresses)
+
+    def resolve(self, address: str, add_used: Dict): 
+        """
+        Expand the schema at address, which must not be in add_used yet; 
+        address and every schema expanded under it are added to add_used 
+        """
+        key = (address, frozenset(add_used))
+        if key in self._expanded: 
+            template, added = self._expanded[key]
+            add_used.update(dict.fromkeys(added, True))
+            return template
+        before = set(add_used)
+        add_used[address] = True 
+        schema = self.schemas[address]
+        if 'properties' in schema: 
+            template = self.clean(schema['properties'], add_used)
+        elif schema['type'] == 'object': 
+            template = FrozenTemplate()
+        elif schema['type'] == 'array': 
+            template = ()
+        else: 
+            template = schema['type']
+        self._expanded[key] = (template, tuple(set(add_used) - before))
+        return template
+
+    def clean(self, body: Dict, add_used: Dict) -> FrozenTemplate: 
+        """
+        Clean a dictionary of schema properties, expanding all the "$ref" inside 
+        """
+        cleaned = {}
+        for key, item in body.items(): 
+            # Reference to other schema inside a schema reference 
+            if '$ref' in item: 
+                address = item['$ref'].split('/')[-1]
+                if address in add_used: 
+                    cleaned[key] = "string"
                 else: 
-                    if openApi['components']['schemas'][address]['type'] == 'object': 
-                        body[key] = {}
-                    elif openApi['components']['schemas'][address]['type'] == 'array': 
-                        body[key] = []
+                    cleaned[key] = self.resolve(address, add_used)
+            # An array of items 
+            elif item['type'] == 'array': 
+                if '$ref' in item['items']: 
+                    address = item['items']['$ref'].split('/')[-1]
+                    if address in add_used: 
+                        cleaned[key] = ("string",)
+                    elif 'properties' in self.schemas[address]: 
+                        cleaned[key] = (self.resolve(address, add_used),)
                     else: 
-                        body[key] = openApi['components']['schemas'][address]['type']
-        # An array of items 
-        elif item['type'] == 'array': 
-            if '$ref' in item['items']: 
-                address = item['items']['$ref'].split('/')[-1]
-                if address in add_used:  
-                    body[key] = ["string"]
+                        cleaned[key] = self.resolve(address, add_used)
                 else: 
-                    add_used[address] = True 
-                    if 'properties' in openApi['components']['schemas'][address]: 
-                        sub_body = copy.deepcopy(openApi['components']['schemas'][address]['properties'])
-                        body[key] = [clean_request_body(openApi, sub_body, add_used)]
-                    else: 
-                        if openApi['components']['schemas'][address]['type'] == 'object': 
-                            body[key] = {}
-                        elif openApi['components']['schemas'][address]['type'] == 'array': 
-                            body[key] = []
-                        else: 
-                            body[key] = openApi['components']['schemas'][address]['type']
-            else: 
-                body[key] = [item['items']['type']]
-        # A dictionary of items 
-        elif item['type'] == 'object': 
-            temp_item = copy.deepcopy(item)
-            if 'example' in item: 
-                body[key] = temp_item['example']
-            elif 'properties' in item: 
-                body[key] = clean_request_body(openApi, temp_item['properties'], add_used)
+                    cleaned[key] = (item['items']['type'],)
+            # A dictionary of items 
+            elif item['type'] == 'object': 
+                if 'example' in item: 
+                    cleaned[key] = _freeze(item['example'])
+                elif 'properties' in item: 
+                    cleaned[key] = self.clean(item['properties'], add_used)
+                else: 
+                    cleaned[key] = FrozenTemplate()
+            # Just an item of a specific data type 
             else: 
-                del temp_item['type']
-                body[key] = {}
-        # Just an item of a specific data type 
+                cleaned[key] = item['type']
+        return FrozenTemplate(cleaned)
+
+    def template(self, body_address: str) -> FrozenTemplate: 
+        """
+        The expanded template of a request body schema 
+        """
+        if 'properties' in self.schemas[body_address]: 
+            return self.resolve(body_address, {})
+        inner_address = self.schemas[body_address]['allOf'][0]['$ref'].split('/')[-1]
+        return self.resolve(inner_address, {body_address: True})
+
+
+_resolvers = {}  # id(openApi) -> SchemaResolver
+
+
+def get_resolver(openApi: Dict) -> SchemaResolver: 
+    """
+    The memoizing schema resolver of an OpenAPI spec, shared by all endpoints 
+    """
+    resolver = _resolvers.get(id(openApi))
+    if resolver is None or resolver.openApi is not openApi: 
+        resolver = _resolvers[id(openApi)] = SchemaResolver(openApi)
+    return resolver
+
+
+_RESERVED_NAMES = frozenset(snippet_runtime.__all__) | frozenset(snippet_runtime._LAZY) | frozenset(dir(builtins))  # names a builder must not shadow 
+
+
+def builder_name(schema: str) -> str: 
+    """
+    The name of the payload builder class of a component schema, e.g. "BTMFeature-134" -> "BTMFeature_134" 
+    """
+    name = re.sub(r'\W', '_', schema)
+    if name[0].isdigit() or keyword.iskeyword(name) or name in _RESERVED_NAMES: 
+        name += '_'
+    return name
+
+
+def field_name(key: str) -> str: 
+    """
+    The attribute of a payload builder holding a JSON property, e.g. "from" -> "from_" 
+    """
+    name = re.sub(r'\W', '_', key) or '_'
+    if name[0].isdigit() or keyword.iskeyword(name) or name == 'self' or hasattr(Payload, name): 
+        name += '_'
+    return name
+
+
+def _ref_name(ref: str) -> str: 
+    return ref.split('/')[-1]
+
+
+def _is_object(schema: Dict) -> bool: 
+    return 'properties' in schema or 'allOf' in schema
+
+
+def _base_schema(schemas: Dict, name: str): 
+    """
+    The object schema a schema extends (the first "$ref" of its "allOf"), or None 
+    """
+    for part in schemas[name].get('allOf', ()): 
+        if '$ref' in part and _is_object(schemas.get(_ref_name(part['$ref']), {})): 
+            return _ref_name(part['$ref'])
+    return None
+
+
+def schema_fields(schemas: Dict, name: str, seen: frozenset = frozenset()) -> Dict[str, Dict]: 
+    """
+    The properties of a component schema, including those of the schemas it extends with "allOf" 
+    """
+    fields = {}
+    for part in schemas[name].get('allOf', ()): 
+        if '$ref' in part: 
+            if _ref_name(part['$ref']) not in seen: 
+                fields.update(schema_fields(schemas, _ref_name(part['$ref']), seen | {name}))
         else: 
-            body[key] = item['type']
-    return body
+            fields.update(part.get('properties', {}))
+    fields.update(schemas[name].get('properties', {}))
+    return fields
+
+
+def field_type(schemas: Dict, item: Dict, depth: int = 0) -> str: 
+    """
+    The type of a property for the documentation: a builder class, "[item type]" for arrays, or a JSON type 
+    """
+    if '$ref' in item: 
+        name = _ref_name(item['$ref'])
+        schema = schemas.get(name, {})
+        if _is_object(schema): 
+            return builder_name(name)
+        item = schema
+    if item.get('type') == 'array' and depth < 3: 
+        return '[{}]'.format(field_type(schemas, item.get('items') or {}, depth + 1))
+    return item.get('type', 'object')
+
+
+def field_summary(schemas: Dict, name: str) -> str: 
+    """
+    The fields of a payload builder with their types, on one line 
+    """
+    return ', '.join('{}: {}'.format(field_name(key), field_type(schemas, item)) 
+                     for key, item in schema_fields(schemas, name).items())
+
+
+def payload_schemas(openApi: Dict) -> List[str]: 
+    """
+    The object schemas a request body of the POST endpoints can contain (following every "$ref", 
+    e.g. the subtypes listed by a discriminator), each one after the schema it extends 
+    """
+    schemas = openApi['components']['schemas']
+    found = set()
+    stack = [operation.body_ref for operation in get_index(openApi).operations 
+             if operation.method == 'post' and operation.body_ref]
+    while stack: 
+        name = stack.pop()
+        if name in found or name not in schemas: 
+            continue
+        found.add(name)
+        nodes = [schemas[name]]
+        while nodes: 
+            node = nodes.pop()
+            if isinstance(node, dict): 
+                if isinstance(node.get('$ref'), str): 
+                    stack.append(_ref_name(node['$ref']))
+                nodes.extend(node.values())
+            elif isinstance(node, list): 
+                nodes.extend(node)
+            elif isinstance(node, str) and node.startswith('#/components/schemas/'): 
+                stack.append(_ref_name(node))  # a discriminator mapping 
+
+    ordered = []
+    placed = set()
+
+    def place(name: str): 
+        if name not in placed: 
+            placed.add(name)
+            base = _base_schema(schemas, name)
+            if base is not None and base in found: 
+                place(base)
+            ordered.append(name)
+
+    for name in sorted(found): 
+        if _is_object(schemas[name]): 
+            place(name)
+    return ordered
+
+
+def _wrapped(text: str, indent: str) -> str: 
+    """
+    A comma separated list of generated code, wrapped onto lines of at most 110 characters 
+    """
+    return textwrap.fill(text, 110, initial_indent=indent, subsequent_indent=indent, 
+                         break_long_words=False, break_on_hyphens=False)[len(indent):]
+
+
+def payload_builder(openApi: Dict, name: str, defined: Dict[str, List[str]]) -> str: 
+    """
+    The code of the payload builder of one object schema, whose base schema (if any) comes first: its slots, 
+    and an __init__ and to_dict reading and writing them directly (see the `Payload` helper). 
+    defined: the fields of the builder classes written so far, in the order of their `_fields`, to which 
+    this one is added. Empty if its name is taken already 
+    """
+    schemas = openApi['components']['schemas']
+    class_name = builder_name(name)
+    if class_name in defined:  # another schema with the same name once sanitized 
+        return ''
+    base = _base_schema(schemas, name)
+    parent = builder_name(base) if base is not None and builder_name(base) in defined else 'Payload'
+    inherited = schema_fields(schemas, base) if parent != 'Payload' else {}
+    keys = [key for key in schema_fields(schemas, name) if key not in inherited]
+    renamed = {field_name(key): key for key in keys if field_name(key) != key}
+    fields = defined[class_name] = defined.get(parent, []) + [field_name(key) for key in keys]
+    slots = ', '.join(json.dumps(field_name(key)) for key in keys) + (',' if len(keys) == 1 else '')
+    code = '''class {}({}):
+    """{}: {}"""
+    __slots__ = ({})
+    _schema = {}'''.format(class_name, parent, name, field_summary(schemas, name) or 'no fields', slots, 
+                       json.dumps(name))
+    if renamed: 
+        code += '''
+    _renamed = {}'''.format(json.dumps(renamed))
+    if fields: 
+        code += '''
+
+    def __init__(self, *, {}):
+{}
+
+    def to_dict(self):
+        return self._body(({}))'''.format(
+            _wrapped(', '.join('{}=UNSET'.format(field) for field in fields), ' ' * 17), 
+            '\n'.join('        self.{0} = {0}'.format(field) for field in fields), 
+            _wrapped(', '.join('self.' + field for field in fields) + (',' if len(fields) == 1 else ''), 
+                     ' ' * 27))
+    return code
+
+
+def generate_payload_builders(openApi: Dict) -> str: 
+    """
+    The code of the payload builders: a `__slots__` class per object schema of the POST request bodies, 
+    based on the `Payload` helper, with the fields of the schema listed in a one-line docstring 
+    """
+    defined = {}
+    classes = [payload_builder(openApi, name, defined) for name in payload_schemas(openApi)]
+    return '\n\n\n'.join(code for code in classes if code)
 
 
 def print_request_body(openApi: Dict, api_path: str, api_type="post") -> str: 
     """
-    Generate the format of the request body of the API call in comment format. 
+    Generate the description of the request body of the API call in comment format: the payload builder 
+    of its schema and its fields on one line, instead of the whole expanded template of the body. 
     It is meant to be used as a reference for the users, where more info can be found online. 
     """
+    operation = get_index(openApi).at(api_path, api_type)
+    schemas = openApi['components']['schemas']
     # General common description 
     output_format = ""
-    if 'description' in openApi['paths'][api_path][api_type]['requestBody']: 
+    if operation.body_description is not None: 
         output_format += '''
-                Description: {}'''.format(openApi['paths'][api_path][api_type]['requestBody']['description'].replace('\n', ' '))
-
-    # Look for specific data type 
-    header = list(openApi['paths'][api_path][api_type]['requestBody']['content'].keys())[0]
-    schema = openApi['paths'][api_path][api_type]['requestBody']['content'][header]['schema']
-    # A referred schema 
-    if "$ref" in schema: 
-        body_address = openApi['paths'][api_path][api_type]['requestBody']['content'][header]['schema']['$ref']
-        body_address = body_address.split('/')[-1]
-        used_address = {body_address: True}
-        if 'properties' in openApi['components']['schemas'][body_address]: 
-            request_body = copy.deepcopy(openApi['components']['schemas'][body_address]["properties"])
-        else: 
-            body_address = openApi['components']['schemas'][body_address]['allOf'][0]['$ref']
-            body_address = body_address.split('/')[-1]
-            used_address[body_address] = True 
-            request_body = copy.deepcopy(openApi['components']['schemas'][body_address]['properties'])
-        request_body = clean_request_body(openApi, request_body, used_address)
+                Description: {}'''.format(operation.body_description.replace('\n', ' '))
+
+    # A referred object schema, built with its payload builder 
+    if operation.body_ref is not None and _is_object(schemas.get(operation.body_ref, {})): 
         output_format += '''
-{}
-        '''.format(json.dumps(request_body, indent=4, sort_keys=True))
+                Build it with `{}(...)` (see the "Payload Builders" cell), or as a dictionary with the same fields: 
+                {}'''.format(builder_name(operation.body_ref), field_summary(schemas, operation.body_ref) or 'no fields')
+    # Another referred schema (e.g. an array) 
+    elif operation.body_ref is not None: 
+        output_format += '''
+                The request body for this API endpoint is a {}'''.format(
+            field_type(schemas, {'$ref': '#/components/schemas/' + operation.body_ref}))
     # No schema used 
     else: 
         output_format += '''
-                The request body for this API endpoint is a {}'''.format(schema['type'])
+                The request body for this API endpoint is a {}'''.format(operation.body_type)
     
     return output_format
 
 
-def generate_api(openApi: Dict, api_path: str, api_type: str) -> str: 
+def url_code(func_name: str, api_path: str) -> str: 
+    """
+    Generate the code building the url path of an endpoint. The path template is split once here, 
+    so that each call only does a single join instead of one str.replace per path parameter. 
+    Path parameters that are not part of the document url must be given in params. 
+    """
+    pieces = []
+    custom = []
+    for i, part in enumerate(split_path(api_path)): 
+        if i % 2 == 0: 
+            if part: 
+                pieces.append(json.dumps(part))
+        elif part in ELEMENT_PATH_PARAMS: 
+            pieces.append(ELEMENT_PATH_PARAMS[part])
+        else: 
+            custom.append(part)
+            pieces.append('str(params.pop({}))'.format(json.dumps(part)))
+
+    code = ''
+    if custom: 
+        code += '''
+    params = dict(params)  # the path parameters are taken out of the query parameters 
+    missing = [name for name in ({},) if name not in params]
+    if missing: 
+        raise ValueError("{} needs the path parameter(s) {{}} in params".format(missing))'''.format(
+            ', '.join(json.dumps(name) for name in custom), func_name)
+    if len(pieces) == 1: 
+        code += '''
+    fixed_url = {}'''.format(pieces[0])
+    else: 
+        code += '''
+    fixed_url = "".join(({}))'''.format(', '.join(pieces))
+    return code
+
+
+def generate_api(openApi: Dict, api_path: str, api_type: str, asynchronous: bool = False, 
+                 compact: bool = False) -> str: 
     """
     This function retrieves all required and optional components for a REST API call in Onshape 
     Source info (Glassworks): https://cad.onshape.com/glassworks/explorer/ 
@@ -114,29 +388,28 @@ def generate_api(openApi: Dict, api_path: str, api_type: str) -> str:
     openApi: the source JSON, containing all info about API endpoints for Onshape 
     api_path: the title of the API endpoint on Glassworks 
     api_type: the tag for the API endpiont on Glassworks ("GET", "POST", "DELETE")
+    asynchronous: also generate an `async def` version of the function, named with the suffix "_async" 
+    compact: only bind the function with the shared `endpoint` helper (see generate_binding) 
     """
+    if compact: 
+        return generate_binding(openApi, api_path, api_type, asynchronous)
     api_path = api_path.strip()
     api_type = api_type.strip().lower()
     required = {True: "Required", False: "Optional"}
+    operation = get_index(openApi).at(api_path, api_type)
 
     # Body 
-    try: 
-        if 'required' in openApi['paths'][api_path][api_type]['requestBody']: 
-            body_arg = 'payload'
-        else: 
-            body_arg = 'payload={}'
-    except KeyError: 
+    if operation.body_required: 
+        body_arg = 'payload'
+    else: 
         body_arg = 'payload={}'
 
     # Description 
-    func_tag = openApi['paths'][api_path][api_type]['tags'][0]
-    func_name = openApi['paths'][api_path][api_type]['operationId']
-    if 'summary' in openApi['paths'][api_path][api_type]: 
-        func_descrip = openApi['paths'][api_path][api_type]['summary'].replace('\n', ' ')
-    else: 
-        func_descrip = ""
+    func_tag = operation.tag
+    func_name = operation.operation_id
+    func_descrip = operation.summary
     func_intro = '''#@title `{}` (type `{}`)
-def {}(client, url, {}, params={{}}, show_response=False): 
+def {}(client, url, {}, params={{}}, show_response=False, output=None, items=None): 
     """
     API call type: `{}`
     {}
@@ -147,62 +420,47 @@ def {}(client, url, {}, params={{}}, show_response=False):
         func_name, api_type.upper(), func_name, body_arg, 
         api_type.upper(), func_descrip, func_tag, func_name)
     
-    # Start defining the function 
-    func_code = '''
+    # Start defining the function (the "_download" version only needs what follows the method) 
+    method_code = '''
     method = "{}" '''.format(api_type.upper())
+    func_code = '''
+    call = start_call("{}")  # times the call when metrics are recorded (see use_metrics) '''.format(func_name)
 
     # URL path 
     func_code += '''
-    element = OnshapeElement(url)
-    base = element.base_url
-    fixed_url = "/api{}"'''.format(api_path)
+    base, did, wvm, wvmid, eid = parse_url(url)'''
+    func_code += url_code(func_name, api_path)
     
     # Query parameters     
-    if 'parameters' in openApi['paths'][api_path][api_type]: 
+    if operation.parameters is not None: 
         func_intro += '''
     - `params`: a dictionary of the following parameters for the API call'''
-        params = openApi['paths'][api_path][api_type]['parameters']
-        for param in params: 
-            if param['in'] == "path": 
-                if param['name'] == 'did': 
-                    func_code += '''
-    fixed_url = fixed_url.replace('{did}', element.did)'''
-                elif param['name'] in ['wvm', 'wv', 'wm']: 
-                    func_code += '''
-    fixed_url = fixed_url.replace('{{{}}}', element.wvm)'''.format(param['name'])
-                elif param['name'] in ['wvmid', 'wvid', 'wmid', 'wid']: 
-                    func_code += '''
-    fixed_url = fixed_url.replace('{{{}}}', element.wvmid)'''.format(param['name'])
-                elif param['name'] == 'eid': 
-                    func_code += '''
-    fixed_url = fixed_url.replace('{eid}', element.eid)'''
-                else: 
-                    func_code += '''
-    fixed_url = fixed_url.replace('{{{}}}', params["{}"])
-    del params["{}"]'''.format(param["name"], param["name"], param["name"])
-                    if 'description' in param: 
+        for param in operation.parameters: 
+            if param.location == "path": 
+                if param.name not in ELEMENT_PATH_PARAMS: 
+                    if param.description is not None: 
                         func_intro += '''
-        - `{}` (Required): {}'''.format(param['name'], param['description'].replace('\n', ' '))
+        - `{}` (Required): {}'''.format(param.name, param.description.replace('\n', ' '))
                     else: 
                         func_intro += '''
-        - `{}` (Required)'''.format(param['name'])
+        - `{}` (Required)'''.format(param.name)
             else:
-                if param['name'] == 'If-None-Match':  # special case
+                if param.name == 'If-None-Match':  # special case
                     func_intro += '''
-        - `If-None-Match`: string'''
+        - `If-None-Match`: string (sent automatically for the responses kept by `use_cache`)'''
                 else: 
-                    if 'description' in param: 
-                        param_descrip = ": " + param['description']
+                    if param.description is not None: 
+                        param_descrip = ": " + param.description
                     else: 
                         param_descrip = "" 
-                    if 'default' in param['schema']: 
-                        param_default = "(default: " + str(param['schema']['default']) + ')'
+                    if param.default is not None: 
+                        param_default = "(default: " + str(param.default) + ')'
                     else: 
                         param_default = ''
                     func_intro += '''
-        - `{}`: {} ({}){} {}'''.format(param['name'], 
-                                    param['schema']['type'], 
-                                    required['required' in param], 
+        - `{}`: {} ({}){} {}'''.format(param.name, 
+                                    param.type, 
+                                    required[param.required], 
                                     param_descrip, 
                                     param_default)
     else: 
@@ -210,48 +468,147 @@ def {}(client, url, {}, params={{}}, show_response=False):
     - `params={}`: no params accepted for this API call. '''
             
     # Body 
-    if api_type == 'post' and 'requestBody' in openApi['paths'][api_path][api_type]: 
+    if api_type == 'post' and operation.has_body: 
         func_intro += '''
-    - `payload` ({}): a dictionary of the payload body of this API call; a template of the body is shown below: {}'''.format(
-        required['required' in openApi['paths'][api_path][api_type]['requestBody']], print_request_body(openApi, api_path))
+    - `payload` ({}): the payload body of this API call: {}'''.format(
+        required[operation.body_required], print_request_body(openApi, api_path))
     else: 
         func_intro += '''
     - `payload={}`: no payload body is accepted for this API call'''
 
     # Headers 
-    if 'default' in openApi['paths'][api_path][api_type]['responses']: 
-        if list(openApi['paths'][api_path][api_type]['responses']['default']['content'].keys()): 
-            func_code += '''
-    headers = {{"Accept": "{}", "Content-Type": "application/json"}}
-            '''.format(list(openApi['paths'][api_path][api_type]['responses']['default']['content'].keys())[0])
-        else: 
-            func_code += '''
-    headers = {{}}
-            '''.format(None)
-    elif '200' in openApi['paths'][api_path][api_type]['responses']: 
-        if 'content' in openApi['paths'][api_path][api_type]['responses']['200']: 
-            func_code += '''
+    if operation.accept: 
+        func_code += '''
     headers = {{"Accept": "{}", "Content-Type": "application/json"}}
-            '''.format(list(openApi['paths'][api_path][api_type]['responses']['200']['content'].keys())[0])
-        else: 
-            func_code += '''
-    headers = {{}}
-            '''.format(None)
+            '''.format(operation.accept)
     else: 
         func_code += '''
-    headers = {{}}
-        '''.format(None)
+    headers = {}
+            '''
     
     # Make the call 
-    func_code += '''
-    response = client.api_client.request(method, url=base + fixed_url, query_params=params, headers=headers, body=payload)
-    parsed = json.loads(response.data)
-    if show_response: 
-        print(json.dumps(parsed, indent=4, sort_keys=True)) 
-    return parsed 
-    '''.format(None)
+    call_code = '''
+    response = {}({}, method, base + fixed_url, params, headers, payload, 
+                   stream=output is not None or items is not None, call=call)
+    return read_response(response, show_response, output, items, call)
+    '''
 
     output = func_intro + '''
     - `show_response`: boolean: do you want to print out the response of this API call (default: False)
-    """'''+ func_code 
+    - `output`: a file path or binary file to stream the response into instead of parsing it; 
+        the number of bytes written is returned (default: None)
+    - `items`: an ijson prefix, e.g. "items.item"; returns an iterator parsing the matching elements of 
+        the response one by one instead of the whole response at once (default: None)
+    """'''+ method_code + func_code + call_code.format('send_request', 'client')
+
+    # The asynchronous version shares everything but the call 
+    if asynchronous: 
+        output += '''
+
+async def {}_async(session, url, {}, params={{}}, show_response=False, output=None, items=None): 
+    """
+    The asynchronous version of `{}` (see above). 
+    - `session`: the AsyncTransport making the call (None: the one set with use_async_transport)
+    """'''.format(func_name, body_arg, func_name) + method_code + func_code + call_code.format('await send_request_async', 'session')
+
+    # A paged list operation can also be iterated item by item, across all its pages
+    if operation.paginated:
+        output += '''
+
+def iter_{}(client, url, params={{}}, prefetch=False):
+    """
+    Iterate over the `items` of `{}` (see above), page after page, following the `next` link of each page;
+    only one page is held in memory at a time.
+    - `params`: the parameters of `{}`; `limit` sets the number of items per page
+    - `prefetch`: request the next page in the background while the items of the current one are used (default: False)
+    """
+    yield from paginate(client, {}(client, url, params=params), {}, prefetch)'''.format(
+            func_name, func_name, func_name, func_name, json.dumps(operation.accept))
+
+    # A file (e.g. an export) can also be downloaded straight to disk, in chunks 
+    if api_type == 'get' and is_download(operation.accept): 
+        output += '''
+
+def {}_download(client, url, path, params={{}}, segments=1, resume=True):
+    """
+    Download the response of `{}` (see above) into the file at `path` chunk by chunk, instead of holding it in memory; 
+    returns its size, which is verified against the size announced by the server. 
+    - `segments`: the number of ranges downloaded in parallel when the server supports HTTP ranges (default: 1)
+    - `resume`: continue an interrupted download of the same file where it stopped (default: True)
+    """'''.format(func_name, func_name) + func_code + '''
+    return download_file(client, base + fixed_url, path, params, headers, segments, resume, call=call)'''
+
+
+    # The tessellation and STL export operations can also be decoded straight into NumPy arrays 
+    if func_name in ARRAY_DECODERS: 
+        decoder = ARRAY_DECODERS[func_name]
+        merge = decoder != 'decode_tessellated_edges'
+        output += '''
+
+def {}_arrays(client, url, params={{}}, path=None, {}out_dir=None):
+    """
+    The response of `{}` (see above) decoded by `{}` straight into contiguous NumPy arrays 
+    (float32 coordinates, int32 indices) instead of nested lists of Python floats; needs numpy.
+    - `path`: stream the response into this file and decode it memory-mapped, for very large models (default: None){}
+    - `out_dir`: write the arrays as .npy files into this folder and return them memory-mapped (default: None)
+    """
+    return {}(fetch_body({}, client, url, params, path), {}out_dir=out_dir)'''.format(
+            func_name, 'merge=False, ' if merge else '', func_name, decoder, '''
+    - `merge`: share the vertices of adjacent triangles, which `facets` then index (default: False)''' if merge else '', 
+            decoder, func_name, 'merge=merge, ' if merge else '')
+    return output
+
+
+def payload_template_text(openApi: Dict, body_address: str) -> str: 
+    """
+    The template of a request body schema as compact JSON text 
+    """
+    return json.dumps(get_resolver(openApi).template(body_address), separators=(',', ':'), sort_keys=True)
+
+
+def payload_templates(openApi: Dict) -> Dict[str, str]: 
+    """
+    The template of every request body schema of the POST endpoints, as compact JSON text, 
+    for the payload_template helper of the compact notebook; schemas that fail to expand are left out 
+    """
+    templates = {}
+    for operation in get_index(openApi).operations: 
+        if operation.method == 'post' and operation.body_ref and operation.body_ref not in templates: 
+            try: 
+                templates[operation.body_ref] = payload_template_text(openApi, operation.body_ref)
+            except Exception: 
+                continue
+    return templates
+
+
+def generate_binding(openApi: Dict, api_path: str, api_type: str, asynchronous: bool = False) -> str: 
+    """
+    The compact version of generate_api: a single call of the `endpoint` helper creating the function, 
+    which documents itself at run time (see `help(operationId)`) instead of in the notebook 
+    """
+    operation = get_index(openApi).at(api_path.strip(), api_type.strip())
+    func_name = operation.operation_id
+    query = [param.name for param in operation.parameters or () 
+             if param.location != "path" and param.name != 'If-None-Match']
+    arguments = [json.dumps(func_name), json.dumps(operation.method.upper()), json.dumps(operation.path), 
+                 json.dumps(operation.accept) if operation.accept else 'None', 
+                 json.dumps(operation.summary), json.dumps(operation.tag)]
+    if query: 
+        arguments.append('params={}'.format(json.dumps(query)))
+    if operation.method == 'post' and operation.body_ref: 
+        arguments.append('payload_schema={}'.format(json.dumps(operation.body_ref)))
+    output = '''#@title `{}` (type `{}`)
+{} = endpoint({})'''.format(func_name, operation.method.upper(), func_name, ', '.join(arguments))
+    if asynchronous: 
+        output += '''
+{}_async = async_endpoint({})'''.format(func_name, func_name)
+    if operation.paginated: 
+        output += '''
+iter_{} = paginated({})'''.format(func_name, func_name)
+    if func_name in ARRAY_DECODERS: 
+        output += '''
+{}_arrays = array_endpoint({})'''.format(func_name, func_name)
+    if operation.method == 'get' and is_download(operation.accept): 
+        output += '''
+{}_download = download_endpoint({})'''.format(func_name, func_name)
     return output
@@ -0,0 +1,86 @@
+from functools import wraps
+from typing import Dict, Optional
+
+from snippet_runtime import endpoint, paginate
+from spec_index import Operation, get_index
+
+
+def build_operation_index(openApi: Dict) -> Dict[str, Operation]:
+    """
+    The operations of the spec that can be called (those with an operationId): operationId -> Operation
+    """
+    return get_index(openApi).by_id
+
+
+def _make_endpoint(client, name: str, operation: Operation):
+    """
+    Create the function calling one operation, with the same arguments as the generated snippets
+    """
+    query = [param.name for param in operation.parameters or () if param.location != 'path']
+    function = endpoint(name, operation.method.upper(), operation.path, operation.accept, operation.summary,
+                        operation.tag, params=query)
+
+    @wraps(function)
+    def bound(url, payload={}, params={}, show_response=False, output=None, items=None):
+        return function(client, url, payload, params, show_response, output, items)
+
+    return bound
+
+
+def _make_iterator(client, name: str, operation: Operation):
+    """
+    Create the function iterating over the items of all the pages of a paged list operation
+    """
+    endpoint = _make_endpoint(client, name, operation)
+
+    def iterate(url, params={}, prefetch=False):
+        yield from paginate(client, endpoint(url, params=params), operation.accept, prefetch)
+
+    iterate.__name__ = iterate.__qualname__ = 'iter_' + name
+    iterate.__doc__ = '''
+    Iterate over the `items` of `{}`, page after page; only one page is held in memory at a time.
+    prefetch: request the next page in the background while the items of the current one are used
+    '''.format(name)
+    return iterate
+
+
+class OnshapeAPI:
+    """
+    A runtime alternative to the generated snippets: every Onshape operation is an attribute,
+    e.g. `api.getDocument(url, show_response=True)`; paged list operations also have an
+    `iter_<operationId>` attribute iterating over the items of all their pages.
+
+    Only a compact index of the operations is built from the spec; the function calling an
+    operation is created the first time it is accessed and then cached on the instance, so
+    memory and start-up time grow with the endpoints a process actually uses.
+
+    client: the Onshape client configured with your API keys
+    openApi: the OpenAPI spec; loaded with spec_loader.load_openapi (and its keyword arguments) if not given
+    """
+    def __init__(self, client, openApi: Optional[Dict] = None, **loader_kwargs):
+        if openApi is None:
+            from spec_loader import load_openapi
+            openApi = load_openapi(**loader_kwargs)
+        self._client = client
+        self._operations = build_operation_index(openApi)
+
+    def __getattr__(self, name: str):
+        operations = self.__dict__.get('_operations', {})
+        if name.startswith('iter_') and getattr(operations.get(name[5:]), 'paginated', False):
+            endpoint = _make_iterator(self._client, name[5:], operations[name[5:]])
+        elif name in operations:
+            endpoint = _make_endpoint(self._client, name, operations[name])
+        else:
+            raise AttributeError("Onshape has no operation named {!r}".format(name))
+        setattr(self, name, endpoint)  # later lookups find it directly
+        return endpoint
+
+    def __dir__(self):
+        iterators = {'iter_' + name for name, operation in self._operations.items() if operation.paginated}
+        return sorted(set(super().__dir__()) | set(self._operations) | iterators)
+
+    def operations(self, tag: Optional[str] = None) -> list:
+        """
+        The operationIds of the API, optionally only those of one tag
+        """
+        return sorted(name for name, operation in self._operations.items() if tag is None or operation.tag == tag)
@@ -0,0 +1,180 @@
+"""
+Benchmarks of the notebook generator, phase by phase (pytest-benchmark, `pip install pytest-benchmark`):
+
+    python -m pytest benchmarks/bench_generator.py --benchmark-autosave
+    python -m pytest benchmarks/bench_generator.py --benchmark-compare --benchmark-compare-fail=mean:10%
+    BENCHMARK_SPEC=openapi.json python -m pytest benchmarks/bench_generator.py
+
+One benchmark per phase: loading the spec, indexing it, expanding the request body schemas (their payload
+builders, and for the compact notebook their templates), emitting the code of every endpoint and writing
+the notebook, for the full and the compact notebook. The extra_info of each result holds the peak memory
+of the phase (measured in a separate run, as tracing allocations slows everything down), the sha256 of
+the spec, and for schema expansion and code emission the slowest schemas and operations.
+
+The spec is the deterministic one of synthetic_spec.py, so that saved runs (.benchmarks/) compare like
+with like on every machine; BENCHMARK_SPEC measures another one, e.g. a copy of the Onshape spec.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+pytest.importorskip('pytest_benchmark')
+
+import nbformat as nbf  # noqa: E402
+
+import API_generator  # noqa: E402
+import spec_index  # noqa: E402
+from benchmarks.synthetic_spec import synthetic_spec_bytes  # noqa: E402
+from master_writer import (payload_builders_cell, payload_templates_cell, plan_sections, setup_cells,  # noqa: E402
+                           used_runtime_modules)
+from snippet_runtime.codec import json_loads  # noqa: E402
+
+TOP = 10  # slowest schemas and operations kept with the results
+MODES = pytest.mark.parametrize('compact', [False, True], ids=['full', 'compact'])
+
+
+def expand_schemas(openApi: dict, compact: bool) -> tuple:
+    """
+    The payload templates (compact only) and payload builders of the request body schemas,
+    and the time spent on every schema ({name: s})
+    """
+    schema_times = {}
+    templates = {}
+    if compact:
+        for operation in spec_index.get_index(openApi).operations:
+            if operation.method == 'post' and operation.body_ref and operation.body_ref not in templates:
+                start = time.perf_counter()
+                try:
+                    templates[operation.body_ref] = API_generator.payload_template_text(openApi, operation.body_ref)
+                except Exception:  # left out of the notebook, as by payload_templates
+                    pass
+                schema_times[operation.body_ref] = time.perf_counter() - start
+    defined = {}
+    classes = []
+    for name in API_generator.payload_schemas(openApi):
+        start = time.perf_counter()
+        classes.append(API_generator.payload_builder(openApi, name, defined))
+        schema_times[name] = schema_times.get(name, 0.0) + time.perf_counter() - start
+    return templates, '\n\n\n'.join(code for code in classes if code), schema_times
+
+
+def emit_code(openApi: dict, compact: bool) -> tuple:
+    """
+    The snippet (full) or binding (compact) of every endpoint, and the time spent on every operation ({id: s})
+    """
+    index = spec_index.get_index(openApi)
+    operation_times = {}
+    snippets = []
+    for _, _, _, tasks in plan_sections(openApi):
+        for endpoint, typ in tasks:
+            start = time.perf_counter()
+            try:
+                if compact:
+                    snippets.append(API_generator.generate_binding(openApi, endpoint, typ))
+                else:
+                    snippets.append(API_generator.generate_api(openApi, endpoint, typ))
+            except Exception:
+                pass
+            operation_times[index.at(endpoint, typ).operation_id] = time.perf_counter() - start
+    return snippets, operation_times
+
+
+def write_notebook(openApi: dict, templates: dict, builders: str, snippets: list, compact: bool) -> None:
+    nb = nbf.v4.new_notebook()
+    cells = [payload_templates_cell(openApi, templates)] if compact else []
+    cells.append(payload_builders_cell(openApi, builders))
+    cells += [nbf.v4.new_code_cell(code) for code in snippets]
+    nb['cells'] = setup_cells(used_runtime_modules('\n'.join(cell.source for cell in cells))) + cells
+    with tempfile.TemporaryFile('w') as f:
+        nbf.write(nb, f)
+
+
+def fresh(openApi: dict) -> None:
+    """
+    Forget the memoized index and schema templates of the spec, as in a new run of the generator
+    """
+    spec_index._indexes.clear()
+    API_generator._resolvers.clear()
+
+
+def peak_memory(function, *args) -> int:
+    """
+    The most memory allocated at once by one call of function, in bytes
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def slowest(times: dict) -> list:
+    return [(name, round(seconds, 6)) for name, seconds in sorted(times.items(), key=lambda item: -item[1])[:TOP]]
+
+
+@pytest.fixture(scope='module')
+def raw() -> bytes:
+    path = os.environ.get('BENCHMARK_SPEC')
+    if path is None:
+        return synthetic_spec_bytes()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='module')
+def openApi(raw):
+    return json_loads(raw)
+
+
+@pytest.fixture
+def info(benchmark, raw):
+    """
+    The extra_info of the benchmark, with the spec it runs on
+    """
+    benchmark.extra_info['spec_sha256'] = hashlib.sha256(raw).hexdigest()
+    return benchmark.extra_info
+
+
+def test_load(benchmark, info, raw):
+    benchmark(json_loads, raw)
+    info['peak_memory'] = peak_memory(json_loads, raw)
+
+
+def test_index(benchmark, info, openApi):
+    index = benchmark(spec_index.SpecIndex, openApi)
+    info['operations'] = len(index.operations)
+    info['peak_memory'] = peak_memory(spec_index.SpecIndex, openApi)
+
+
+@MODES
+def test_schema_expansion(benchmark, info, openApi, compact):
+    *_, schema_times = benchmark.pedantic(expand_schemas, (openApi, compact), setup=lambda: fresh(openApi),
+                                          rounds=5)
+    info['slowest_schemas'] = slowest(schema_times)
+    fresh(openApi)
+    info['peak_memory'] = peak_memory(expand_schemas, openApi, compact)
+
+
+@MODES
+def test_code_emission(benchmark, info, openApi, compact):
+    expand_schemas(openApi, compact)  # the schema templates are resolved before the code is emitted
+    _, operation_times = benchmark.pedantic(emit_code, (openApi, compact), rounds=5)
+    info['slowest_operations'] = slowest(operation_times)
+    info['peak_memory'] = peak_memory(emit_code, openApi, compact)
+
+
+@MODES
+def test_notebook_write(benchmark, info, openApi, compact):
+    templates, builders, _ = expand_schemas(openApi, compact)
+    snippets, _ = emit_code(openApi, compact)
+    benchmark.pedantic(write_notebook, (openApi, templates, builders, snippets, compact), rounds=5)
+    info['peak_memory'] = peak_memory(write_notebook, openApi, templates, builders, snippets, compact)
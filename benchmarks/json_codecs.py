@@ -0,0 +1,78 @@
+"""
+Compare the JSON codecs available to snippet_runtime.codec (orjson, ujson, the standard library)
+on the Onshape OpenAPI spec and on recorded API responses.
+
+    python benchmarks/json_codecs.py --spec openapi.json --responses recorded_responses/
+
+Without --spec the spec is read from the cache of master_writer.py (.openapi_cache/).
+Responses can be recorded with the `output=` argument of any endpoint function.
+"""
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snippet_runtime.codec import JSON_CODECS  # noqa: E402
+from spec_loader import DEFAULT_CACHE_DIR, SPEC_PATH, _read_index  # noqa: E402
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    The best of repeat runs of function, in seconds
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def bench_document(name: str, raw: bytes, repeat: int) -> list:
+    """
+    Time loads and dumps of one document with every codec; returns rows for the report
+    """
+    rows = []
+    baseline = None
+    for codec, (loads, dumps) in sorted(JSON_CODECS.items(), key=lambda item: item[0] != 'json'):
+        parsed = loads(raw)
+        load_time = best_time(lambda: loads(raw), repeat)
+        dump_time = best_time(lambda: dumps(parsed), repeat)
+        if baseline is None:
+            baseline = (load_time, dump_time)
+        rows.append((name, codec, len(raw) / load_time / 1e6, baseline[0] / load_time,
+                     len(raw) / dump_time / 1e6, baseline[1] / dump_time))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spec', help="the OpenAPI spec as a JSON file (default: the cached spec)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--responses', help="a folder of recorded JSON responses")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement (default: %(default)s)")
+    args = parser.parse_args()
+
+    documents = []
+    if args.spec:
+        with open(args.spec, 'rb') as f:
+            documents.append(('spec', f.read()))
+    else:
+        entry = _read_index(args.cache_dir).get('https://cad.onshape.com' + SPEC_PATH)
+        if entry:
+            with open(os.path.join(args.cache_dir, entry['sha256'] + '.json'), 'rb') as f:
+                documents.append(('spec', f.read()))
+    if args.responses:
+        for path in sorted(glob.glob(os.path.join(args.responses, '*.json'))):
+            with open(path, 'rb') as f:
+                documents.append((os.path.basename(path), f.read()))
+    if not documents:
+        parser.error("nothing to benchmark: pass --spec and/or --responses")
+
+    print("{:<32} {:<8} {:>10} {:>8} {:>10} {:>8}".format(
+        'document', 'codec', 'load MB/s', 'speedup', 'dump MB/s', 'speedup'))
+    for name, raw in documents:
+        for row in bench_document(name, raw, args.repeat):
+            print("{:<32} {:<8} {:>10.1f} {:>7.2f}x {:>10.1f} {:>7.2f}x".format(*row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+A deterministic OpenAPI spec shaped like the Onshape one, to benchmark the generator on the same input
+on every machine and every run, without downloading the spec.
+
+    python benchmarks/synthetic_spec.py > openapi.json
+
+It has the features of the Onshape spec the generator deals with: element paths (/d/{did}/{wvm}/{wvmid}/e/{eid}),
+query parameters with defaults, paged lists (offset/limit, items/next), file downloads, and request bodies
+made of polymorphic BT types (a base schema with a "btType" discriminator, subtypes extending it with "allOf",
+and types containing each other).
+"""
+import json
+import random
+from typing import Dict
+
+TAGS = ('Document', 'PartStudio', 'Assembly', 'Drawing', 'BlobElement', 'Translation', 'Metadata', 'Part',
+        'Sketch', 'FeatureStudio', 'Element', 'Version', 'Workspace', 'ReleasePackage', 'Revision', 'User', 'Team',
+        'Company', 'Webhook', 'Thumbnail', 'Folder', 'Comment', 'AppElement', 'Account', 'Variables', 'Insertable',
+        'Publication', 'Workflow', 'PartNumber', 'Export')
+NOUNS = ('Features', 'Parts', 'Bodies', 'Faces', 'Edges', 'Configuration', 'Properties', 'References', 'Mates',
+         'Instances', 'Views', 'Tables', 'Settings', 'History', 'Shaded', 'Tessellation', 'Names', 'Units')
+FAMILIES = ('MParameter', 'MFeature', 'MSketchEntity', 'MAssemblyFeature', 'MIndividualQuery', 'MParameterValue',
+            'MConfigurationParameter', 'MSketchConstraint', 'MDrawingView', 'MMateConnector', 'MTableColumn',
+            'MImport')
+QUERY_PARAMETERS = (('configuration', 'string', None), ('linkDocumentId', 'string', None),
+                    ('includeGeometry', 'boolean', False), ('rollbackBarIndex', 'integer', -1),
+                    ('outputFacetNormals', 'boolean', True), ('angleTolerance', 'number', None),
+                    ('chordTolerance', 'number', None), ('partId', 'string', None),
+                    ('withThumbnails', 'boolean', False), ('elementId', 'string', None),
+                    ('noSketchGeometry', 'boolean', False), ('featureId', 'string', None))
+ACCEPT = 'application/json;charset=UTF-8; qs=0.09'
+ELEMENT_PATH = '/d/{did}/{wvm}/{wvmid}/e/{eid}'
+PATH_PARAMETERS = {'did': 'The id of the document', 'wvm': 'One of w, v or m', 'wvmid': 'The id of the workspace,'
+                   ' version or microversion', 'eid': 'The id of the element', 'id': 'The id of the resource'}
+
+
+def _ref(name: str) -> Dict:
+    return {'$ref': '#/components/schemas/' + name}
+
+
+class _Builder:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.schemas = {}
+        self.next_id = 100
+
+    def name(self, stem: str) -> str:
+        self.next_id += self.rng.randint(1, 40)
+        return 'BT{}-{}'.format(stem, self.next_id)
+
+    def words(self, count: int) -> str:
+        return ' '.join(self.rng.choice(('the', 'of', 'a', 'part', 'studio', 'element', 'document', 'feature',
+                                         'returns', 'value', 'for', 'each', 'in', 'configuration', 'version'))
+                        for _ in range(count)).capitalize()
+
+    def property(self, refs: list, depth: int = 0) -> Dict:
+        """
+        A property schema: a scalar, an enum, an array, a nested object or a reference to one of refs
+        """
+        kind = self.rng.random()
+        if kind < 0.3:
+            return {'type': 'string', 'description': self.words(6)}
+        if kind < 0.4:
+            return {'type': self.rng.choice(('integer', 'number')), 'format': 'int32'}
+        if kind < 0.5:
+            return {'type': 'boolean'}
+        if kind < 0.55:
+            return {'type': 'string', 'enum': [self.words(1).upper() + str(i) for i in range(self.rng.randint(2, 8))]}
+        if kind < 0.6:
+            return {'type': 'string', 'format': 'date-time'}
+        if kind < 0.7:
+            return {'type': 'array', 'items': {'type': 'string'}}
+        if kind < 0.75 and depth < 2:
+            return {'type': 'object', 'properties': self.properties(refs, 3, depth + 1)}
+        if kind < 0.78:
+            return {'type': 'object', 'additionalProperties': {'type': 'string'}}
+        if refs and kind < 0.9:
+            return _ref(self.rng.choice(refs))
+        if refs:
+            return {'type': 'array', 'items': _ref(self.rng.choice(refs))}
+        return {'type': 'string'}
+
+    def properties(self, refs: list, count: int, depth: int = 0) -> Dict:
+        names = ('id', 'name', 'description', 'href', 'nodeId', 'featureId', 'value', 'units', 'owner', 'state',
+                 'isHidden', 'index', 'color', 'expression', 'createdAt', 'modifiedAt', 'parameters', 'items',
+                 'children', 'query', 'transform', 'partId', 'bodyType', 'microversion', 'thumbnail', 'libraryVersion')
+        chosen = self.rng.sample(names, min(count, len(names)))
+        return {name: self.property(refs, depth) for name in chosen}
+
+    def families(self) -> list:
+        """
+        The polymorphic BT types: per family a base schema and subtypes; the subtypes contain the bases
+        of the other families (and of their own), so the types nest and recurse as in the Onshape spec
+        """
+        bases = [self.name(family) for family in FAMILIES]
+        for family, base in zip(FAMILIES, bases):
+            subtypes = [self.name(family + suffix) for suffix in
+                        self.rng.sample(('Boolean', 'String', 'Quantity', 'Enum', 'Array', 'Reference', 'Derived',
+                                         'Lookup', 'Appearance', 'Foreign', 'Nullable', 'Literal', 'Query',
+                                         'Point', 'Spline'), self.rng.randint(4, 12))]
+            self.schemas[base] = {
+                'type': 'object',
+                'properties': dict(self.properties([], 3), btType={'type': 'string'}),
+                'discriminator': {'propertyName': 'btType',
+                                  'mapping': {name: '#/components/schemas/' + name for name in subtypes}},
+                'oneOf': [_ref(name) for name in subtypes],
+            }
+            for subtype in subtypes:
+                self.schemas[subtype] = {'type': 'object', 'allOf': [
+                    _ref(base), {'type': 'object', 'properties': self.properties(bases, self.rng.randint(2, 8))}]}
+        return bases
+
+    def spec(self, tags: int, operations_per_tag: int) -> Dict:
+        shared = []
+        for stem in ('OwnerInfo', 'UserSummaryInfo', 'ThumbnailInfo', 'MicroversionIdAndConfiguration',
+                     'ConfigurationInfo', 'Color', 'Vector3d', 'BoundingBox', 'Transform', 'ViewInfo'):
+            name = self.name(stem)
+            self.schemas[name] = {'type': 'object', 'properties': self.properties(shared, self.rng.randint(3, 8))}
+            shared.append(name)
+        bases = self.families()
+
+        paths = {}
+        for tag in TAGS[:tags]:
+            root = '/' + tag[0].lower() + tag[1:] + 's'
+            for number in range(operations_per_tag):
+                noun = NOUNS[number % len(NOUNS)]
+                scoped = self.rng.random() < 0.7
+                path = root + (ELEMENT_PATH if scoped else '/d/{did}' if number % 2 else '/{id}') + \
+                    '/' + noun[0].lower() + noun[1:] + (str(number // len(NOUNS)) if number >= len(NOUNS) else '')
+                kind = self.rng.choice(('get', 'get', 'list', 'post', 'post', 'delete', 'download'))
+                operation = {
+                    'tags': [tag],
+                    'summary': self.words(self.rng.randint(3, 9)),
+                    'description': self.words(self.rng.randint(10, 30)),
+                    'operationId': '{}{}{}{}'.format({'post': 'update', 'delete': 'delete', 'list': 'list'}.get(
+                        kind, 'get'), tag, noun, number),
+                    'parameters': [{'name': name, 'in': 'path', 'required': True, 'description': PATH_PARAMETERS[name],
+                                    'schema': {'type': 'string'}} for name in split_names(path)],
+                }
+                for name, kind_type, default in self.rng.sample(QUERY_PARAMETERS, self.rng.randint(0, 5)):
+                    schema = {'type': kind_type}
+                    if default is not None:
+                        schema['default'] = default
+                    operation['parameters'].append({'name': name, 'in': 'query', 'description': self.words(5),
+                                                    'schema': schema})
+                method = 'get'
+                if kind == 'list':
+                    item = self.name(tag + noun + 'Info')
+                    self.schemas[item] = {'type': 'object', 'properties': self.properties(shared, 8)}
+                    page = self.name(tag + noun + 'ListResponse')
+                    self.schemas[page] = {'type': 'object', 'properties': {
+                        'items': {'type': 'array', 'items': _ref(item)}, 'next': {'type': 'string'},
+                        'previous': {'type': 'string'}, 'href': {'type': 'string'}}}
+                    operation['parameters'] += [{'name': 'offset', 'in': 'query', 'schema': {'type': 'integer',
+                                                                                            'default': 0}},
+                                                {'name': 'limit', 'in': 'query', 'schema': {'type': 'integer',
+                                                                                           'default': 20}}]
+                    content = {ACCEPT: {'schema': _ref(page)}}
+                elif kind == 'download':
+                    content = {'application/octet-stream': {'schema': {'type': 'string', 'format': 'binary'}}}
+                else:
+                    info = self.name(tag + noun + 'Info')
+                    self.schemas[info] = {'type': 'object',
+                                          'properties': self.properties(shared + bases, self.rng.randint(4, 14))}
+                    content = {ACCEPT: {'schema': _ref(info)}}
+                if kind == 'post':
+                    method = 'post'
+                    body = self.name(tag + noun + 'Params')
+                    self.schemas[body] = {'type': 'object',
+                                          'properties': self.properties(shared + bases, self.rng.randint(3, 10))}
+                    operation['requestBody'] = {'required': True, 'description': self.words(6),
+                                                'content': {ACCEPT: {'schema': _ref(body)}}}
+                elif kind == 'delete':
+                    method, content = 'delete', {}
+                operation['responses'] = {'default': {'description': 'Success!', 'content': content}}
+                paths.setdefault(path, {})[method] = operation
+
+        return {
+            'openapi': '3.0.1',
+            'info': {'title': 'Synthetic Onshape REST API', 'version': '1.0'},
+            'servers': [{'url': 'https://cad.onshape.com/api/v6'}],
+            'tags': [{'name': tag, 'description': self.words(12)} for tag in TAGS[:tags]],
+            'paths': paths,
+            'components': {'schemas': self.schemas},
+        }
+
+
+def split_names(path: str) -> list:
+    return [part[1:-1] for part in path.split('/') if part.startswith('{')]
+
+
+def synthetic_spec(tags: int = len(TAGS), operations_per_tag: int = 30, seed: int = 0) -> Dict:
+    """
+    The synthetic spec; the same arguments always give the same spec
+    """
+    return _Builder(seed).spec(tags, operations_per_tag)
+
+
+def synthetic_spec_bytes(**options) -> bytes:
+    """
+    The synthetic spec as JSON, byte for byte the same for the same arguments
+    """
+    return json.dumps(synthetic_spec(**options), indent=1, sort_keys=True).encode()
+
+
+if __name__ == '__main__':
+    print(synthetic_spec_bytes().decode())
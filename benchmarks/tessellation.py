@@ -0,0 +1,152 @@
+"""
+Compare the NumPy array decoders of snippet_runtime.tessellation with the default path of the
+snippets, which parses a tessellation response into nested lists of Python floats.
+
+    python benchmarks/tessellation.py --facets 200000
+    python benchmarks/tessellation.py --faces recorded/tessellatedfaces.json --stl recorded/part.stl
+
+Without --faces/--stl, synthetic responses with --facets triangles are generated. Reports the best time
+of --repeat runs, the peak memory allocated while decoding and the memory the result holds on to.
+Record real responses with the `output=` argument of any endpoint function.
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from snippet_runtime.codec import codec_name, json_loads  # noqa: E402
+from snippet_runtime.tessellation import STL_HEADER, decode_stl, decode_tessellated_faces  # noqa: E402
+
+
+def synthetic_faces(facets: int, facets_per_face: int = 500) -> bytes:
+    """
+    A tessellated faces response of one part with the given number of triangles
+    """
+    rng = random.Random(0)
+
+    def point():
+        return [rng.uniform(-0.1, 0.1) for _ in range(3)]
+
+    faces = []
+    for start in range(0, facets, facets_per_face):
+        faces.append({'id': 'F{}'.format(len(faces)),
+                      'facets': [{'vertices': [point(), point(), point()], 'normal': point()}
+                                 for _ in range(min(facets_per_face, facets - start))]})
+    return json.dumps([{'id': 'JHD', 'faces': faces}]).encode()
+
+
+def synthetic_stl(facets: int) -> bytes:
+    """
+    A binary STL file with the given number of triangles
+    """
+    values = np.random.default_rng(0).uniform(-0.1, 0.1, (facets, 12)).astype('<f4')
+    records = np.zeros(facets, [('values', '<f4', (12,)), ('attribute', '<u2')])
+    records['values'] = values
+    return b'\0' * 80 + struct.pack('<I', facets) + records.tobytes()
+
+
+def lists_faces(raw: bytes):
+    """
+    The default path: the parsed response, and its coordinates as a list of [x, y, z] lists
+    """
+    parsed = json_loads(raw)
+    return parsed, [vertex for part in parsed for face in part['faces'] for facet in face['facets']
+                    for vertex in facet['vertices']]
+
+
+def lists_stl(raw: bytes):
+    """
+    Decoding a binary STL into lists with the struct module
+    """
+    count = struct.unpack_from('<I', raw, 80)[0]
+    triangles = [values[3:12] for values in struct.iter_unpack('<12fH', raw[STL_HEADER:STL_HEADER + 50 * count])]
+    return [list(values[i:i + 3]) for values in triangles for i in (0, 3, 6)]
+
+
+def retained_size(value) -> int:
+    """
+    The bytes held by a decoded result: the NumPy buffers of a Mesh, or the lists and floats of the default path
+    """
+    if hasattr(value, 'vertices'):
+        return sum(getattr(value, name).nbytes for name in ('vertices', 'facets', 'normals')
+                   if isinstance(getattr(value, name), np.ndarray) and not isinstance(getattr(value, name), np.memmap))
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+def measure(function, repeat: int) -> tuple:
+    """
+    The best time of function, the peak memory of one more run and the size of its result
+    """
+    seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, retained_size(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--facets', type=int, default=100000, help="triangles of the synthetic responses")
+    parser.add_argument('--faces', help="a recorded tessellated faces response (JSON)")
+    parser.add_argument('--stl', help="a recorded binary STL export")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.faces:
+        with open(args.faces, 'rb') as f:
+            faces = f.read()
+    else:
+        faces = synthetic_faces(args.facets)
+    if args.stl:
+        with open(args.stl, 'rb') as f:
+            stl = f.read()
+    else:
+        stl = synthetic_stl(args.facets)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        cases = [
+            ('faces', 'lists ({})'.format(codec_name()), lambda: lists_faces(faces)),
+            ('faces', 'lists + numpy.array', lambda: np.array(lists_faces(faces)[1], np.float32)),
+            ('faces', 'arrays', lambda: decode_tessellated_faces(memoryview(faces))),
+            ('faces', 'arrays, merged', lambda: decode_tessellated_faces(memoryview(faces), merge=True)),
+            ('faces', 'arrays, out_dir', lambda: decode_tessellated_faces(memoryview(faces), out_dir=out_dir)),
+            ('stl', 'lists (struct)', lambda: lists_stl(stl)),
+            ('stl', 'arrays', lambda: decode_stl(memoryview(stl))),
+            ('stl', 'arrays, out_dir', lambda: decode_stl(memoryview(stl), out_dir=out_dir)),
+        ]
+        print("faces response: {:.1f} MB, STL: {:.1f} MB".format(len(faces) / 1e6, len(stl) / 1e6))
+        print("{:<6} {:<20} {:>10} {:>8} {:>12} {:>12}".format(
+            'input', 'decoder', 'seconds', 'speedup', 'peak MB', 'result MB'))
+        baseline = {}
+        for kind, name, function in cases:
+            seconds, peak, size = measure(function, args.repeat)
+            baseline.setdefault(kind, seconds)
+            print("{:<6} {:<20} {:>10.4f} {:>7.2f}x {:>12.1f} {:>12.1f}".format(
+                kind, name, seconds, baseline[kind] / seconds, peak / 1e6, size / 1e6))
+
+
+if __name__ == '__main__':
+    main()
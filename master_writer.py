@@ -1,58 +1,124 @@
+import argparse
+import ast
 import json
+import multiprocessing
 import os
+import re
 import nbformat as nbf
 
-from onshape_client.client import Client
-from API_generator import generate_api
-
-
-# Setup Onshape Client with API keys
-base = 'https://cad.onshape.com'
-access = ""
-secret = "" 
-for _, _, files in os.walk('.'):
-    if "OnshapeAPIKey.py" in files:  # Put API key in project folder
-        exec(open("OnshapeAPIKey.py").read())
-        break
-client = Client(configuration={'base_url': base,
-                               'access_key': access,
-                               'secret_key': secret})
-
-# Get all info from Onshape Open API
-# Source (Glassworks): https://cad.onshape.com/glassworks/explorer/
-response = client.api_client.request(method='GET',
-                                     url=base + '/api/openapi',
-                                     query_params={},
-                                     headers={},
-                                     body={})
-openApi = json.loads(response.data)
-
-###################### Start writing the Jupyter notebook #########################
-nb = nbf.v4.new_notebook()  # the notebook 
-cells = []  # the cells in the notebook (ordered -> use append())
-
-"""
-To add text: nbf.v4.new_markdown_cell(text)
-To add code: nbf.v4.new_code_cell(code)
-Then, append to cells 
-"""
-
-# General info as an introduction 
-cells.append(nbf.v4.new_markdown_cell('''# Onshape REST API 
+import snippet_runtime
+from API_generator import generate_api, generate_payload_builders, payload_templates
+from package_writer import write_package
+from notebook_manifest import (OperationHasher, cell_id, generator_fingerprint, read_manifest, 
+                               snippet_operation_id, write_manifest)
+from spec_index import get_index
+from spec_loader import DEFAULT_CACHE_DIR, load_openapi
+
+
+NOTEBOOK = "API_Snippets.ipynb"
+MANIFEST = "API_Snippets.manifest.json"  # operationId -> hash of everything its snippet is generated from
+RUNTIME_MODULES = ['codec', 'payloads', 'urls', 'metrics', 'transport', 'responses', 'cache', 'coalescing', 'endpoints', 'downloads', 'pagination', 'batch', 'translations', 'tessellation']  # the modules of snippet_runtime the setup section is made of, in dependency order
+ASYNC_RUNTIME_MODULES = ['aio']  # added for --async
+# A string literal or a comment (skipped), or a name (group 1) of Python code 
+CODE_NAME = re.compile(r'''"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|#[^\n]*|([A-Za-z_]\w*)''')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate API_Snippets.ipynb from the Onshape OpenAPI spec")
+    parser.add_argument('--spec', help="read the OpenAPI spec from a local JSON file instead of downloading it")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="folder of cached specs and their pre-parsed snapshots (default: %(default)s)")
+    parser.add_argument('--offline', action='store_true',
+                        help="never touch the network; build from the last cached spec")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="worker processes generating the snippets; 0 uses every core (default: %(default)s)")
+    parser.add_argument('--incremental', action='store_true', 
+                        help="only regenerate the snippets whose operation changed since the last build, "
+                             "updating {} in place".format(NOTEBOOK))
+    parser.add_argument('--async', dest='asynchronous', action='store_true', 
+                        help="also generate an asyncio version of every endpoint function (named <operationId>_async)")
+    parser.add_argument('--compact', action='store_true', 
+                        help="bind every endpoint with the shared endpoint helper instead of writing out its function "
+                             "and docstring; a much smaller notebook, documented with help(<operationId>)")
+    parser.add_argument('--package', metavar='DIR', 
+                        help="also write the snippets as an importable, precompiled Python package into DIR")
+    parser.add_argument('--package-name', default='onshape_api', 
+                        help="name of the package written with --package (default: %(default)s)")
+    parser.add_argument('--all-helpers', action='store_true', 
+                        help="paste every module of snippet_runtime into the setup section, not only those the "
+                             "snippets use (for helpers such as ResponseCache or run_batch)")
+    return parser.parse_args()
+
+
+def runtime_source(modules: list) -> str: 
+    """
+    The source of snippet_runtime modules merged into one notebook cell. 
+    Their (single-line) relative imports are dropped, as all helpers share the notebook namespace. 
+    """
+    sources = []
+    for name in modules: 
+        with open(os.path.join(os.path.dirname(snippet_runtime.__file__), name + '.py')) as f: 
+            lines = [line for line in f.read().split('\n') if not line.startswith('from .')]
+        sources.append('\n'.join(lines).strip('\n'))
+    return '\n\n\n'.join(sources) + '\n'
+
+
+def _runtime_module(name: str) -> tuple: 
+    """
+    The names a module of snippet_runtime defines at the top level, and the modules of snippet_runtime it imports 
+    """
+    with open(os.path.join(os.path.dirname(snippet_runtime.__file__), name + '.py')) as f: 
+        tree = ast.parse(f.read())
+    names = set()
+    imports = []
+    for node in tree.body: 
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)): 
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)): 
+            for target in node.targets if isinstance(node, ast.Assign) else [node.target]: 
+                names.update(child.id for child in ast.walk(target) if isinstance(child, ast.Name))
+        elif isinstance(node, ast.ImportFrom) and node.level == 1: 
+            imports.append(node.module)
+    return names, imports
+
+
+def used_runtime_modules(code: str, modules: list = RUNTIME_MODULES + ASYNC_RUNTIME_MODULES) -> list: 
+    """
+    The modules of snippet_runtime that code (the cells of the notebook) uses, with every module they import, 
+    in the order of modules (their dependency order) 
+    """
+    used = set(CODE_NAME.findall(code))
+    found = {name: _runtime_module(name) for name in modules}
+    needed = set()
+    stack = [name for name in modules if found[name][0] & used]
+    while stack: 
+        name = stack.pop()
+        if name not in needed: 
+            needed.add(name)
+            stack.extend(found[name][1])
+    return [name for name in modules if name in needed]
+
+
+def setup_cells(runtime_modules: list = RUNTIME_MODULES) -> list:
+    """
+    The introduction and section 0 (setup) of the notebook
+    """
+    cells = []
+
+    # General info as an introduction
+    cells.append(nbf.v4.new_markdown_cell('''# Onshape REST API 
 Below is the Python version of all the Onshape REST API endpoints in the form of code snippets. You can follow guidance in [this GitHub repository](https://github.com/PTC-Education/Python-OpenAPI) to import these snippets in your own Jupyter notebook using Google Colab. Meanwhile, the official full documentation of all API endpoints can be found on [this website](https://cad.onshape.com/glassworks/explorer/). 
 
 Note: this Jupyter notebook is designed to be launched and used in Google Colab for the best experience. 
-'''))
+''', id='intro'))
 
-cells.append(nbf.v4.new_markdown_cell('''# 0. Setup
+    cells.append(nbf.v4.new_markdown_cell('''# 0. Setup
 **Important:** you have to run ALL cells in this section before you can properly use the rest of the code snippets. When importing snippets to your own Jupyter notebook, you have to import ALL cells in this section and run them before executing any of the snippets in this notebook. 
-'''))
+''', id='setup'))
 
-cells.append(nbf.v4.new_code_cell('''#@title Import and Setup Onshape Client
+    cells.append(nbf.v4.new_code_cell('''#@title Import and Setup Onshape Client
 !pip install onshape-client
 from onshape_client.client import Client
-from onshape_client.onshape_url import OnshapeElement
-import json
 
 #@markdown Chage the base if using an enterprise (i.e. "https://ptc.onshape.com")
 base = 'https://cad.onshape.com' #@param {type:"string"}
@@ -83,44 +149,223 @@ else:
                                    "secret_key": secret})
     clear_output()
     print('Onshape client configured - ready to go!')
-'''))
-
-# A list of all API endpoint paths 
-endpoints = list(openApi['paths'].keys())  # each item is a str 
-
-# A list of all API categories 
-temp_tags = openApi['tags']  # each item is a dict {'name': str, 'description': str}
-tags = {}  # dict{name: description}
-# Note that temp_tags is in alphebatical order (not the same for endpoints)
-for item in temp_tags: 
-    tags[item['name']] = item['description']
-
-curr_tag = "None"
-tag_ind = 0
-
-for endpoint in endpoints: 
-    # All types of the endpoint (get, post, delete)
-    api_type = list(openApi['paths'][endpoint].keys()) 
-    # Check if need to start a new section 
-    if openApi['paths'][endpoint][api_type[0]]['tags'][0] != curr_tag: 
-        tag_ind += 1
-        curr_tag = openApi['paths'][endpoint][api_type[0]]['tags'][0]
-        if curr_tag in tags: 
-            tag_descript = tags[curr_tag]
-        else: 
-            tag_descript = None 
+''', id='setup-client'))
+
+    cells.append(nbf.v4.new_code_cell('''#@title Shared Helpers
+#@markdown Helpers used by the snippets below; see `snippet_runtime` in the GitHub repository for details and for the other helpers.
+
+''' + runtime_source(runtime_modules), id='setup-runtime'))
+    return cells
+
+
+def payload_templates_cell(openApi: dict, templates: dict = None):
+    """
+    The setup cell of a compact notebook registering the request body templates of the POST endpoints
+    """
+    templates = templates if templates is not None else payload_templates(openApi)
+    entries = ',\n'.join('    {}: {}'.format(json.dumps(name), json.dumps(template)) 
+                         for name, template in sorted(templates.items()))
+    return nbf.v4.new_code_cell('''#@title Payload Templates
+#@markdown The request bodies of the POST endpoints: `payload_template("<schema>")` returns a template to fill in.
+
+register_payload_templates({{
+{}
+}})
+'''.format(entries), id='setup-payload-templates')
+
+
+def payload_builders_cell(openApi: dict, builders: str = None):
+    """
+    The setup cell defining the payload builders of the POST request bodies (see generate_payload_builders)
+    """
+    return nbf.v4.new_code_cell('''#@title Payload Builders
+#@markdown A class per request body schema of the POST endpoints, e.g. `BTMFeature_134(name="Extrude 1")`; pass one as the `payload` of an endpoint.
+
+''' + (builders if builders is not None else generate_payload_builders(openApi)) + '\n', id='setup-payload-builders')
+
+
+def plan_sections(openApi: dict) -> list:
+    """
+    Group the endpoints into the sections of the notebook, in the order of the spec
+    Returns a list of (section index, tag, tag description, [(endpoint, api type), ...])
+    """
+    index = get_index(openApi)
+    sections = []
+    curr_tag = "None"
+    tag_ind = 0
+
+    for endpoint, operations in index.by_path.items():
+        # Check if need to start a new section (the tag of the first type of the endpoint)
+        first = next(iter(operations.values()))
+        if first.tag != curr_tag:
+            tag_ind += 1
+            curr_tag = first.tag
+            sections.append((tag_ind, curr_tag, index.tags.get(curr_tag), []))
+        # All types of the endpoint (get, post, delete)
+        sections[-1][3].extend((endpoint, typ) for typ in operations)
+    return sections
+
+
+_worker_spec = None  # the spec of a worker process, set once by _init_worker
+_worker_options = {}  # the keyword arguments of generate_api
+
+
+def _init_worker(openApi: dict, options: dict) -> None:
+    global _worker_spec, _worker_options
+    _worker_spec = openApi
+    _worker_options = options
+
+
+def _generate_one(task: tuple):
+    """
+    Generate the snippet of one (endpoint, api type); None if the generation failed
+    """
+    endpoint, typ = task
+    try:
+        return generate_api(_worker_spec, endpoint, typ, **_worker_options)
+    except Exception:
+        return None
+
+
+def generate_snippets(openApi: dict, tasks: list, jobs: int = 1, **options) -> list:
+    """
+    Generate the code of every (endpoint, api type) in tasks, in the same order.
+    Failed endpoints are reported and returned as None.
+
+    jobs: the number of worker processes; every call of generate_api is independent once
+            the spec is loaded, so the work is split across a process pool. With the "fork"
+            start method the workers share the parsed spec instead of receiving a copy.
+    options: keyword arguments for generate_api
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or len(tasks) < 2:
+        _init_worker(openApi, options)
+        snippets = [_generate_one(task) for task in tasks]
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with context.Pool(jobs, initializer=_init_worker, initargs=(openApi, options)) as pool:
+            snippets = pool.map(_generate_one, tasks, chunksize)  # keeps the order of tasks
+    for (endpoint, typ), code in zip(tasks, snippets):
+        if code is None:
+            print("Error encountered for endpoint:", endpoint, typ)
+    return snippets
+
+
+def main():
+    args = parse_args()
+
+    # Onshape API keys (optional: the spec itself is public)
+    base = 'https://cad.onshape.com'
+    access = ""
+    secret = ""
+    for _, _, files in os.walk('.'):
+        if "OnshapeAPIKey.py" in files:  # Put API key in project folder
+            keys = {}
+            exec(open("OnshapeAPIKey.py").read(), keys)
+            access, secret = keys.get('access', ""), keys.get('secret', "")
+            break
+
+    # Get all info from Onshape Open API, revalidating the local cache with its ETag
+    # Source (Glassworks): https://cad.onshape.com/glassworks/explorer/
+    openApi = load_openapi(base, spec_file=args.spec, cache_dir=args.cache_dir, offline=args.offline,
+                           access=access, secret=secret)
+
+    ###################### Start writing the Jupyter notebook #########################
+    nb = nbf.v4.new_notebook()  # the notebook
+    options = {'asynchronous': args.asynchronous, 'compact': args.compact}
+    cells = []  # the cells in the notebook after the setup cells (ordered -> use append())
+    templates = payload_templates(openApi) if args.compact else None  # for payload_template
+    if args.compact:
+        cells.append(payload_templates_cell(openApi, templates))
+    builders = generate_payload_builders(openApi)
+    cells.append(payload_builders_cell(openApi, builders))
+
+    """
+    To add text: nbf.v4.new_markdown_cell(text)
+    To add code: nbf.v4.new_code_cell(code)
+    Then, append to cells
+    """
+
+    sections = plan_sections(openApi)
+    tasks = [task for section in sections for task in section[3]]
+    index = get_index(openApi)
+    operation_ids = [index.at(endpoint, typ).operation_id or cell_id(typ, endpoint) for endpoint, typ in tasks]
+
+    # Hash every operation with the schemas it references; unchanged snippets are kept as they are 
+    hasher = OperationHasher(openApi)
+    fingerprint = generator_fingerprint(options)
+    hashes = [hasher.operation_hash(endpoint, typ, fingerprint) for endpoint, typ in tasks]
+    old_nb = None
+    old_cells = {}  # operationId -> snippet cell of the previous build
+    old_hashes = {}
+    if args.incremental and os.path.exists(NOTEBOOK): 
+        with open(NOTEBOOK) as f: 
+            old_nb = nbf.read(f, as_version=4)
+        for cell in old_nb.cells: 
+            operation_id = snippet_operation_id(cell)
+            if operation_id is not None: 
+                old_cells[operation_id] = cell
+        old_hashes = read_manifest(MANIFEST)['operations']
+    stale = [i for i, operation_id in enumerate(operation_ids) 
+             if operation_id not in old_cells or old_hashes.get(operation_id) != hashes[i]]
+    snippets = [None] * len(tasks)
+    for i, code in zip(stale, generate_snippets(openApi, [tasks[i] for i in stale], args.jobs, **options)): 
+        snippets[i] = code
+
+    package_snippets = []  # (tag, operationId, code) of every snippet in the notebook
+    i = 0
+    for tag_ind, curr_tag, tag_descript, section_tasks in sections:
         cells.append(nbf.v4.new_markdown_cell('''# {}. {}
 {} 
-        '''.format(tag_ind, curr_tag, tag_descript)))
-    # Generate and add code for each type of the endpoint 
-    for typ in api_type: 
-        try: 
-            cells.append(nbf.v4.new_code_cell('''{}'''.format(generate_api(openApi, endpoint, typ))))
-        except: 
-            print("Error encountered for endpoint:", endpoint, typ)
+        '''.format(tag_ind, curr_tag, tag_descript), id=cell_id('section', str(tag_ind), curr_tag)))
+        # Add code for each type of the endpoint
+        for _ in section_tasks:
+            operation_id = operation_ids[i]
+            if snippets[i] is not None:
+                # A regenerated snippet keeps the id of the cell it replaces 
+                old_cell = old_cells.get(operation_id, {})
+                cell = nbf.v4.new_code_cell('''{}'''.format(snippets[i]), 
+                                            id=old_cell.get('id', cell_id(operation_id)), 
+                                            metadata={'operationId': operation_id})
+            elif operation_id in old_cells and old_hashes.get(operation_id) == hashes[i]: 
+                cell = old_cells[operation_id]
+            else: 
+                cell = None  # the generation failed 
+            if cell is not None: 
+                cells.append(cell)
+                package_snippets.append((curr_tag, operation_id, cell.source))
+            i += 1
+
+    # Record the hashes of all snippets that made it into the notebook 
+    stale = set(stale)
+    write_manifest(MANIFEST, {operation_ids[i]: hashes[i] for i in range(len(tasks)) 
+                              if snippets[i] is not None or i not in stale})
+
+    if args.package: 
+        package_dir = write_package(package_snippets, index.tags, args.package, args.package_name, builders,
+                                    templates)
+        print("Package written to", package_dir)
+
+    # The setup cells, with the modules of snippet_runtime the other cells use 
+    runtime_modules = RUNTIME_MODULES + (ASYNC_RUNTIME_MODULES if args.asynchronous else [])
+    if not args.all_helpers: 
+        runtime_modules = used_runtime_modules('\n'.join(cell.source for cell in cells if cell.cell_type == 'code'), 
+                                               runtime_modules)
+
+    # Write all the cells in a Jupyter notebook
+    nb["cells"] = setup_cells(runtime_modules) + cells  # add cells to notebook
+    if old_nb is not None and old_nb.cells == nb.cells: 
+        print("Notebook is up to date: no snippets changed.")
+        return
+    with open(NOTEBOOK, 'w') as f:
+        nbf.write(nb, f)  # write the notebook
+    if args.incremental: 
+        print("Notebook updated: {} of {} snippets regenerated.".format(len(stale), len(tasks)))
+    else: 
+        print("Notebook created successfully!")
 
-# Write all the cells in a Jupyter notebook 
-nb["cells"] = cells  # add cells to notebook 
-with open("API_Snippets.ipynb", 'w') as f: 
-    nbf.write(nb, f)  # write the notebook 
-print("Notebook created successfully!")
+if __name__ == '__main__':
+    main()
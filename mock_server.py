@@ -0,0 +1,402 @@
+"""
+A local stand-in for the Onshape REST API, generated from the same OpenAPI spec as the notebook,
+for running and load testing the generated snippets without credentials or network.
+
+    python mock_server.py --offline --port 8080
+    python mock_server.py --spec openapi.json --latency 0.05 --jitter 0.02 --error-rate 0.01
+    python mock_server.py --record https://cad.onshape.com --traffic traffic.jsonl   # record real calls
+    python mock_server.py --offline --replay traffic.jsonl                           # and play them back
+    python mock_server.py --offline --fixture exportStl=big.stl   # serve a large file for an operation
+
+Point the snippets at it with a document url on the mock, e.g.
+http://127.0.0.1:8080/documents/<did>/w/<wid>/e/<eid>, and a PooledTransport (the mock serves plain HTTP).
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from spec_index import get_index, response_schema
+from spec_loader import DEFAULT_CACHE_DIR, load_openapi
+
+
+STRING_FORMATS = {'date-time': '2024-01-01T00:00:00Z', 'date': '2024-01-01', 'uri': 'https://cad.onshape.com',
+                  'uuid': '00000000-0000-0000-0000-000000000000', 'byte': '', 'binary': ''}
+# Request headers not forwarded upstream when recording: hop-by-hop headers, and those urllib sets itself.
+# Everything else is, e.g. the Date and On-Nonce headers the API key signature of onshape_client is made of
+UNFORWARDED_HEADERS = frozenset(('connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te',
+                                 'trailer', 'transfer-encoding', 'upgrade', 'host', 'content-length',
+                                 'accept-encoding'))
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')  # a single range of a Range header
+COPY_CHUNK = 2 ** 16
+
+
+class ExampleBuilder:
+    """
+    Builds an example value conforming to each schema of the spec; every component schema
+    is built once, and a schema that contains itself is cut off with null
+    """
+    def __init__(self, openApi: Dict):
+        self.schemas = openApi.get('components', {}).get('schemas', {})
+        self._components = {}  # component name -> example (None while it is being built)
+
+    def component(self, name: str):
+        if name not in self._components:
+            self._components[name] = None
+            self._components[name] = self.example(self.schemas.get(name, {}))
+        return self._components[name]
+
+    def example(self, schema: Dict):
+        if '$ref' in schema:
+            return self.component(schema['$ref'].split('/')[-1])
+        for key in ('example', 'default'):
+            if key in schema:
+                return schema[key]
+        if schema.get('enum'):
+            return schema['enum'][0]
+        if 'allOf' in schema:
+            merged = {}
+            for part in schema['allOf']:
+                value = self.example(part)
+                if isinstance(value, dict):
+                    merged.update(value)
+            return merged
+        for key in ('oneOf', 'anyOf'):
+            if schema.get(key):
+                return self.example(schema[key][0])
+        schema_type = schema.get('type', 'object' if 'properties' in schema else None)
+        if schema_type == 'object':
+            return {name: self.example(prop) for name, prop in schema.get('properties', {}).items()}
+        if schema_type == 'array':
+            return [self.example(schema.get('items', {}))]
+        if schema_type == 'string':
+            return STRING_FORMATS.get(schema.get('format'), 'string')
+        if schema_type == 'integer':
+            return schema.get('minimum', 0)
+        if schema_type == 'number':
+            return float(schema.get('minimum', 0))
+        if schema_type == 'boolean':
+            return False
+        return None
+
+
+class Route:
+    """
+    One operation of the spec as the mock serves it: the regex of its path and its canned response,
+    or the file it serves (fixture)
+    """
+    __slots__ = ('operation_id', 'method', 'pattern', 'status', 'content_type', 'body', 'fixture')
+
+    def __init__(self, operation, status: int, content_type: Optional[str], body: bytes, fixture: str = None):
+        parts = re.split(r'\{[^}]+\}', operation.path)
+        # the snippets call /api/..., the "next" links of Onshape /api/v<N>/...
+        self.pattern = re.compile('^/api(?:/v\\d+)?' + '([^/]+)'.join(map(re.escape, parts)) + '$')
+        self.operation_id = operation.operation_id
+        self.method = operation.method.upper()
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.fixture = fixture
+
+
+def build_routes(openApi: Dict, fixtures: Dict[str, str] = None) -> Dict[str, list]:
+    """
+    The routes of every operation of the spec, by HTTP method; paths with fewer parameters are tried first,
+    so that e.g. /documents/{did}/versions wins over /documents/{did}/{wvm}
+
+    fixtures: operationId -> a file served as the response of that operation
+    """
+    fixtures = fixtures or {}
+    builder = ExampleBuilder(openApi)
+    routes = {}
+    for operation in get_index(openApi).operations:
+        success = [int(status) for status in operation.statuses if status.isdigit() and status.startswith('2')]
+        status = min(success) if success else 200
+        body = b''
+        if operation.accept and 'json' in operation.accept:
+            example = builder.example(response_schema(openApi, openApi['paths'][operation.path][operation.method]))
+            if operation.paginated and isinstance(example, dict):
+                example = dict(example, next=None, previous=None)  # a single page
+            body = json.dumps(example).encode()
+        elif operation.accept:
+            body = bytes(range(256))  # some binary content (e.g. an exported file)
+        routes.setdefault(operation.method.upper(), []).append(
+            Route(operation, status, operation.accept, body, fixtures.get(operation.operation_id)))
+    for method_routes in routes.values():
+        method_routes.sort(key=lambda route: route.pattern.pattern.count('([^/]+)'))
+    return routes
+
+
+def read_traffic(path: str) -> Dict[tuple, list]:
+    """
+    Recorded calls by (method, path with query); repeated calls are played back in turn
+    """
+    traffic = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                traffic.setdefault((entry['method'], entry['path']), []).append(entry)
+    return traffic
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections alive, as Onshape does
+    disable_nagle_algorithm = True  # or every response on a reused connection waits for a delayed ACK (~40 ms)
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+    def _reply(self, status: int, body: bytes, content_type: Optional[str] = None, headers: Dict = None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.server.count(status)  # before the client can have the response
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _reply_content(self, content_type: Optional[str], size: int, open_body, etag: str):
+        """
+        A successful response with a body of size bytes read from open_body(), a binary file;
+        a Range request gets the requested part of it (206) if the server serves ranges, unless If-Range
+        names another version, and a request with the current ETag in If-None-Match gets a 304
+        """
+        if self.headers.get('If-None-Match') == etag:
+            return self._reply(304, b'', None, {'ETag': etag})
+        status, start, end = 200, 0, size - 1
+        headers = {'Accept-Ranges': 'bytes', 'ETag': etag} if self.server.ranges else {'ETag': etag}
+        match = self.server.ranges and BYTE_RANGE.match(self.headers.get('Range') or '')
+        if match and match.group(1) + match.group(2) and self.headers.get('If-Range') in (None, etag):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:  # the last N bytes
+                start = max(0, size - int(match.group(2)))
+            if start >= size or start > end:
+                return self._reply(416, b'', None, {'Content-Range': 'bytes */{}'.format(size)})
+            status = 206
+            headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.server.count(status)
+        self.end_headers()
+        if self.command != 'HEAD':
+            with open_body() as f:
+                f.seek(start)
+                left = end - start + 1
+                while left > 0:
+                    chunk = f.read(min(COPY_CHUNK, left))
+                    if not chunk:
+                        break
+                    try:
+                        self.wfile.write(chunk)
+                    except (BrokenPipeError, ConnectionResetError):
+                        self.close_connection = True  # the client stopped reading (e.g. it had the bytes it needed)
+                        break
+                    left -= len(chunk)
+
+    def _handle(self):
+        self.server.enter(self.headers.get('Host'))
+        try:
+            self._respond()
+        finally:
+            self.server.leave(self.headers.get('Host'))
+
+    def _respond(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if server.latency or server.jitter:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+        if server.error_rate and random.random() < server.error_rate:
+            status = random.choice(server.error_statuses)
+            headers = {'Retry-After': '1'} if status in (429, 503) else {}
+            return self._reply(status, json.dumps({'message': 'Injected error'}).encode(), 'application/json', headers)
+
+        if server.upstream:
+            return self._reply(*server.record(self.command, self.path, self.headers, body))
+        replayed = server.replay(self.command, self.path)
+        if replayed is not None:
+            return self._reply(*replayed)
+        path = self.path.split('?', 1)[0]
+        for route in server.routes.get('GET' if self.command == 'HEAD' else self.command, ()):
+            if route.pattern.match(path):
+                if route.fixture:
+                    info = os.stat(route.fixture)
+                    return self._reply_content(route.content_type, info.st_size, lambda: open(route.fixture, 'rb'),
+                                               '"{:x}-{:x}"'.format(info.st_size, info.st_mtime_ns))
+                if route.status == 200 and route.body:
+                    return self._reply_content(route.content_type, len(route.body), lambda: io.BytesIO(route.body),
+                                               '"{:x}"'.format(zlib.crc32(route.body)))
+                return self._reply(route.status, route.body, route.content_type)
+        self._reply(404, json.dumps({'message': 'No operation for {} {}'.format(self.command, path)}).encode(),
+                    'application/json')
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _handle
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    The mock Onshape server: every operation of the spec answers with an example of its response schema,
+    or with recorded traffic
+
+    latency, jitter: seconds added to every response (latency ± jitter)
+    error_rate: the fraction of requests answered with one of error_statuses instead (429/503 with Retry-After)
+    upstream: proxy every request to this Onshape stack and append it to traffic_file (recording)
+    traffic_file: the recorded calls (JSON lines) to append to when recording, or to play back otherwise
+    fixtures: operationId -> a file served as its response (with HTTP range support, for download tests)
+    ranges: answer Range requests with the requested part (206); False sends the whole body instead
+    """
+    daemon_threads = True
+
+    def __init__(self, openApi: Dict, address: tuple = ('127.0.0.1', 8080), latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_statuses: tuple = (429, 503),
+                 upstream: Optional[str] = None, traffic_file: Optional[str] = None, verbose: bool = False,
+                 fixtures: Optional[Dict[str, str]] = None, ranges: bool = True):
+        super().__init__(address, MockHandler)
+        self.routes = build_routes(openApi, fixtures)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.traffic_file = traffic_file
+        self.traffic = read_traffic(traffic_file) if traffic_file and not upstream else {}
+        self.verbose = verbose
+        self.ranges = ranges
+        self._replayed = {}  # (method, path) -> calls played back so far
+        self._lock = threading.Lock()
+        self.statuses = {}  # status -> responses sent
+        self.in_flight = {}  # Host header -> requests being handled
+        self.most_in_flight = 0  # the most requests handled at once
+        self.most_in_flight_per_host = {}  # Host header -> the most requests to that host handled at once
+
+    def reset(self) -> None:
+        """
+        Forget the responses sent and the most requests handled at once
+        """
+        with self._lock:
+            self.statuses.clear()
+            self.most_in_flight = sum(self.in_flight.values())
+            self.most_in_flight_per_host = dict(self.in_flight)
+
+    def enter(self, host: str) -> None:
+        with self._lock:
+            count = self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.most_in_flight = max(self.most_in_flight, sum(self.in_flight.values()))
+            self.most_in_flight_per_host[host] = max(self.most_in_flight_per_host.get(host, 0), count)
+
+    def leave(self, host: str) -> None:
+        with self._lock:
+            self.in_flight[host] -= 1
+
+    def handle_error(self, request, client_address):
+        if self.verbose or not isinstance(sys.exc_info()[1], ConnectionError):  # a client closing its connection
+            super().handle_error(request, client_address)
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def replay(self, method: str, path: str):
+        entries = self.traffic.get((method, path))
+        if not entries:
+            return None
+        with self._lock:
+            turn = self._replayed.get((method, path), 0)
+            self._replayed[(method, path)] = turn + 1
+        entry = entries[turn % len(entries)]
+        body = base64.b64decode(entry['body_base64']) if 'body_base64' in entry else entry['body'].encode()
+        return entry['status'], body, entry.get('content_type')
+
+    def record(self, method: str, path: str, headers, body: bytes) -> tuple:
+        request = urllib.request.Request(self.upstream + path, data=body or None, method=method,
+                                         headers={name: value for name, value in headers.items()
+                                                  if name.lower() not in UNFORWARDED_HEADERS})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, content_type, data = response.status, response.headers.get('Content-Type'), response.read()
+        except urllib.error.HTTPError as error:
+            status, content_type, data = error.code, error.headers.get('Content-Type'), error.read()
+        entry = {'method': method, 'path': path, 'status': status, 'content_type': content_type}
+        try:
+            entry['body'] = data.decode('utf8')
+        except UnicodeDecodeError:
+            entry['body_base64'] = base64.b64encode(data).decode()
+        if self.traffic_file:
+            with self._lock, open(self.traffic_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        return status, data, content_type
+
+
+def start_mock_server(openApi: Dict, port: int = 0, **options) -> MockServer:
+    """
+    Start a MockServer on a background thread (port 0: any free port, see server.server_port);
+    call shutdown() on it to stop
+    """
+    server = MockServer(openApi, ('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spec', help="read the OpenAPI spec from a local JSON file")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--offline', action='store_true', help="use the last cached spec, without any network")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random +/- seconds around --latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument('--error-status', type=int, action='append', dest='error_statuses',
+                        help="an injected error status (repeatable; default: 429 and 503)")
+    parser.add_argument('--record', metavar='UPSTREAM', help="proxy to this Onshape stack and record the traffic")
+    parser.add_argument('--replay', metavar='FILE', help="play back recorded traffic, falling back to the examples")
+    parser.add_argument('--traffic', default='traffic.jsonl', help="the file --record appends to (default: %(default)s)")
+    parser.add_argument('--fixture', action='append', default=[], metavar='OPERATION=FILE',
+                        help="serve FILE as the response of the operation OPERATION (repeatable)")
+    parser.add_argument('--no-ranges', dest='ranges', action='store_false',
+                        help="ignore Range requests, like a server without range support")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    openApi = load_openapi(spec_file=args.spec, cache_dir=args.cache_dir, offline=args.offline)
+    fixtures = dict(fixture.split('=', 1) for fixture in args.fixture)
+    server = MockServer(openApi, (args.host, args.port), latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, error_statuses=args.error_statuses or (429, 503),
+                        upstream=args.record, traffic_file=args.traffic if args.record else args.replay,
+                        verbose=args.verbose, fixtures=fixtures, ranges=args.ranges)
+    print("Mock Onshape API on http://{}:{}/api ({} operations)".format(
+        args.host, server.server_port, sum(len(routes) for routes in server.routes.values())))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("Responses sent:", dict(sorted(server.statuses.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+
+MANIFEST_VERSION = 1
+# The modules the text of a snippet depends on
+GENERATOR_FILES = ('API_generator.py', 'master_writer.py', 'spec_index.py', 'snippet_runtime/__init__.py',
+                   'snippet_runtime/downloads.py', 'snippet_runtime/endpoints.py', 'snippet_runtime/payloads.py',
+                   'snippet_runtime/tessellation.py', 'snippet_runtime/urls.py')
+
+
+def cell_id(*parts: str) -> str:
+    """
+    A stable notebook cell id (nbformat 4.5: 1-64 characters of [a-zA-Z0-9-_])
+    """
+    return re.sub('[^a-zA-Z0-9_-]', '-', '-'.join(parts))[:64]
+
+
+def generator_fingerprint(options: Optional[Dict] = None) -> str:
+    """
+    A hash of the code (and the options of generate_api) that turn the spec into snippets;
+    when it changes every snippet is stale
+    """
+    digest = hashlib.sha256(json.dumps(options or {}, sort_keys=True).encode())
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in GENERATOR_FILES:
+        with open(os.path.join(folder, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _find_refs(node, refs: set) -> set:
+    """
+    Collect every "$ref" string inside a piece of the spec
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            ref = node.get('$ref')
+            if isinstance(ref, str):
+                refs.add(ref)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return refs
+
+
+def _digest(node) -> str:
+    return hashlib.sha256(json.dumps(node, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+class OperationHasher:
+    """
+    Hashes each operation of the spec together with the transitive closure of the
+    components it references, so an operation's hash changes exactly when its snippet may.
+    Every referenced component is looked up, scanned and hashed only once.
+    """
+    def __init__(self, openApi: Dict):
+        self.openApi = openApi
+        self._direct = {}  # ref -> refs directly inside the referenced component
+        self._digests = {}  # ref -> hash of the referenced component
+
+    def _resolve(self, ref: str):
+        node = self.openApi
+        for part in ref.lstrip('#/').split('/'):
+            node = node[part.replace('~1', '/').replace('~0', '~')]
+        return node
+
+    def _visit(self, ref: str) -> set:
+        if ref not in self._direct:
+            try:
+                node = self._resolve(ref)
+            except (KeyError, TypeError):
+                node = None  # a dangling reference hashes as missing
+            self._direct[ref] = _find_refs(node, set())
+            self._digests[ref] = _digest(node)
+        return self._direct[ref]
+
+    def closure(self, node) -> List[str]:
+        """
+        All the references reachable from node, sorted
+        """
+        seen = set()
+        pending = list(_find_refs(node, set()))
+        while pending:
+            ref = pending.pop()
+            if ref not in seen:
+                seen.add(ref)
+                pending.extend(self._visit(ref) - seen)
+        return sorted(seen)
+
+    def operation_hash(self, api_path: str, api_type: str, fingerprint: str = "") -> str:
+        operation = self.openApi['paths'][api_path][api_type]
+        digest = hashlib.sha256()
+        digest.update(fingerprint.encode())
+        digest.update(json.dumps([api_path, api_type]).encode())
+        digest.update(_digest(operation).encode())
+        for ref in self.closure(operation):
+            digest.update(ref.encode())
+            digest.update(self._digests[ref].encode())
+        return digest.hexdigest()
+
+
+def read_manifest(path: str) -> Dict:
+    """
+    The manifest stored next to the notebook: {"version": int, "operations": {operationId: hash}}
+    """
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'operations': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'operations': {}}
+    return manifest
+
+
+def write_manifest(path: str, operations: Dict[str, str]) -> None:
+    with open(path, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'operations': operations}, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def snippet_operation_id(cell) -> Optional[str]:
+    """
+    The operationId of a snippet cell, from its metadata or, for notebooks written
+    before the metadata was added, from its "#@title `operationId`" line
+    """
+    if cell.get('cell_type') != 'code':
+        return None
+    if 'operationId' in cell.get('metadata', {}):
+        return cell['metadata']['operationId']
+    match = re.match(r'#@title `([^`]+)` \(type `[A-Z]+`\)', cell.get('source', ''))
+    return match.group(1) if match else None
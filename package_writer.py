@@ -0,0 +1,186 @@
+import compileall
+import json
+import keyword
+import os
+import pprint
+import re
+from typing import Dict, List
+
+import snippet_runtime
+
+
+MODULE_HEADER = '''"""
+{}
+
+Generated by master_writer.py from the Onshape OpenAPI spec; do not edit.
+"""
+{}from ._runtime import *
+{}
+__all__ = {}
+'''
+
+INIT_TEMPLATE = '''"""
+Python functions for all the Onshape REST API endpoints, one submodule per API tag.
+
+Generated by master_writer.py from the Onshape OpenAPI spec; do not edit.
+Submodules are only imported when first used, e.g. `from {package} import document`
+or `{package}.getDocument`, so a service pays only for the endpoints it calls.
+`{package}.payload_template("<schema>")` gives a template of a request body.
+"""
+import importlib
+
+# tag submodule -> the functions it defines
+_MODULES = {modules}
+_OPERATIONS = {{name: module for module, names in _MODULES.items() for name in names}}
+# shared helper -> the submodule it is imported from
+_HELPERS = {helpers}
+
+__all__ = sorted(_MODULES) + sorted(_OPERATIONS) + sorted(_HELPERS)
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        return importlib.import_module('.' + name, __name__)
+    module = _OPERATIONS.get(name) or _HELPERS.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module('.' + module, __name__), name)
+        globals()[name] = value  # later lookups skip __getattr__
+        return value
+    raise AttributeError("module {{!r}} has no attribute {{!r}}".format(__name__, name))
+
+
+def __dir__():
+    return __all__
+'''
+
+
+PAYLOADS_MODULE = 'payloads'  # the module of the payload builders
+PAYLOADS_DESCRIPTION = "The payload builders of the request bodies of the POST endpoints, one class per schema."
+TEMPLATES_MODULE = '_payload_templates'  # the data module of the payload templates of a compact package
+
+TEMPLATES_TEMPLATE = '''"""
+The request body templates of the POST endpoints (schema -> JSON text), registered for payload_template
+when this module is imported: by the first call of payload_template, or with the package's payload_template.
+
+Generated by master_writer.py from the Onshape OpenAPI spec; do not edit.
+"""
+from ._runtime import payload_template, register_payload_templates
+
+TEMPLATES = {{
+{}
+}}
+
+register_payload_templates(TEMPLATES)
+'''
+
+# The asyncio helpers are not part of `from ._runtime import *`; only the modules with "_async" variants import them
+ASYNC_IMPORT = 'from ._runtime.aio import async_endpoint, send_request_async\n'
+# The modules whose functions document payload_template load the templates the first time one is asked for
+TEMPLATES_LOADER = ("register_payload_templates(lambda: importlib.import_module('.{}', __package__).TEMPLATES)\n"
+                    .format(TEMPLATES_MODULE))
+
+
+def module_name(tag: str) -> str:
+    """
+    The Python module name for an API tag; e.g., "PartStudio" -> "part_studio"
+    """
+    name = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', tag.strip())
+    name = re.sub(r'\W+', '_', name).strip('_').lower() or 'untagged'
+    if name[0].isdigit() or keyword.iskeyword(name):
+        name = 'api_' + name
+    return name
+
+
+def _function_source(code: str) -> str:
+    """
+    A notebook snippet without its Colab "#@title" form line
+    """
+    if code.startswith('#@title'):
+        code = code.split('\n', 1)[1] if '\n' in code else ''
+    return code.strip('\n') + '\n'
+
+
+def _function_names(code: str) -> List[str]:
+    """
+    The functions a snippet defines: its operation, and its "_async" and "iter_" variants when generated
+    (with `def`, or assigned from the endpoint helpers in a compact snippet); and the classes of the payload builders
+    """
+    return [name or class_name or assigned for name, class_name, assigned
+            in re.findall(r'^(?:(?:async )?def (\w+)|class (\w+)|(\w+) = )', code, re.M)]
+
+
+def _write_if_changed(path: str, text: str) -> bool:
+    """
+    Write text to path unless it already holds it, keeping the mtimes (and .pyc files) of unchanged modules
+    """
+    try:
+        with open(path) as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    with open(path, 'w') as f:
+        f.write(text)
+    return True
+
+
+def write_package(snippets: List[tuple], tags: Dict[str, str], out_dir: str, package: str = 'onshape_api',
+                  payloads: str = None, templates: Dict[str, str] = None) -> str:
+    """
+    Write the generated snippets as an importable Python package and precompile it to .pyc
+
+    snippets: (tag, operationId, code) of every generated snippet, in notebook order
+    tags: the description of each tag
+    out_dir: the folder the package is written into
+    package: the name of the package
+    payloads: the code of the payload builders, written as the "payloads" module
+    templates: the payload templates of the compact snippets (schema -> JSON text), for payload_template
+    Returns the path of the package
+    """
+    modules = {}  # module name -> (tag, [(operationId, code), ...])
+    for tag, operation_id, code in snippets:
+        modules.setdefault(module_name(tag), (tag, []))[1].append((operation_id, code))
+    if payloads:
+        modules[PAYLOADS_MODULE] = (PAYLOADS_DESCRIPTION, [(None, payloads)])
+
+    package_dir = os.path.join(out_dir, package)
+    os.makedirs(package_dir, exist_ok=True)
+    for name, (tag, functions) in modules.items():
+        description = (tags.get(tag) or tag).replace('\\', '\\\\').replace('"""', '\\"\\"\\"')
+        names = [function for _, code in functions for function in _function_names(code)]
+        asynchronous = any(re.search(r'^async def |= async_endpoint\(', code, re.M) for _, code in functions)
+        uses_templates = templates is not None and any('payload_schema=' in code for _, code in functions)
+        imports = (ASYNC_IMPORT if asynchronous else '') + (TEMPLATES_LOADER if uses_templates else '')
+        text = MODULE_HEADER.format(description, 'import importlib\n\n' if uses_templates else '', imports, names)
+        for _, code in functions:
+            text += '\n\n' + _function_source(code)
+        _write_if_changed(os.path.join(package_dir, name + '.py'), text)
+
+    # The shared helpers the functions call, as the "_runtime" subpackage
+    runtime_dir = os.path.join(package_dir, '_runtime')
+    os.makedirs(runtime_dir, exist_ok=True)
+    source_dir = os.path.dirname(snippet_runtime.__file__)
+    for file_name in os.listdir(source_dir):
+        if file_name.endswith('.py'):
+            with open(os.path.join(source_dir, file_name)) as f:
+                _write_if_changed(os.path.join(runtime_dir, file_name), f.read())
+
+    if templates is not None:
+        entries = ',\n'.join('    {}: {}'.format(json.dumps(name), json.dumps(template))
+                             for name, template in sorted(templates.items()))
+        _write_if_changed(os.path.join(package_dir, TEMPLATES_MODULE + '.py'), TEMPLATES_TEMPLATE.format(entries))
+
+    # Remove the modules of tags that no longer exist
+    for file_name in os.listdir(package_dir):
+        stem, extension = os.path.splitext(file_name)
+        if extension == '.py' and stem != '__init__' and stem not in modules and (
+                stem != TEMPLATES_MODULE or templates is None):
+            os.remove(os.path.join(package_dir, file_name))
+
+    index = {name: [function for _, code in functions for function in _function_names(code)]
+             for name, (_, functions) in sorted(modules.items())}
+    helpers = {'payload_template': TEMPLATES_MODULE if templates is not None else '_runtime'}
+    init_text = INIT_TEMPLATE.format(package=package, modules=pprint.pformat(index, width=100), helpers=helpers)
+    _write_if_changed(os.path.join(package_dir, '__init__.py'), init_text)
+    compileall.compile_dir(package_dir, quiet=1)
+    return package_dir
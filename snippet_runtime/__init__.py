@@ -0,0 +1,52 @@
+"""
+Runtime helpers shared by the generated endpoint functions.
+
+In API_Snippets.ipynb the modules of this package are pasted into a setup cell (see
+master_writer.py), so none of them may rely on anything but the standard library and
+each other; the package written with `master_writer.py --package` imports them as `_runtime`.
+The asyncio helpers of `aio` are only imported when first used, so that importing the endpoint
+functions does not pay for asyncio.
+"""
+import importlib
+
+from .batch import BatchExecutor, BatchResult, TokenBucket, run_batch
+from .cache import CacheEntry, ResponseCache
+from .coalescing import RequestCoalescer
+from .codec import codec_name, json_dumps, json_loads, use_codec
+from .downloads import DownloadError, download_endpoint, download_file, is_download
+from .endpoints import endpoint, fill_path, payload_template, register_payload_templates
+from .metrics import Call, Histogram, Metrics, start_call, use_metrics
+from .payloads import UNSET, Payload, payload_body
+from .pagination import fetch_page, paginate, paginated
+from .responses import iter_items, preview, read_response, save_response
+from .tessellation import (Mesh, Polylines, array_endpoint, decode_stl, decode_tessellated_edges,
+                           decode_tessellated_faces, fetch_body, map_file)
+from .translations import TranslationError, TranslationResult, TranslationTracker, run_translations
+from .transport import (ApiError, PooledTransport, Response, StreamedResponse, get_transport, send_request,
+                        use_cache, use_coalescing, use_transport)
+from .urls import ElementIds, clear_url_cache, parse_url, url_cache_stats
+
+# helper -> the module it is imported from when first used (not part of `import *`)
+_LAZY = {'AsyncTransport': 'aio', 'async_endpoint': 'aio', 'run_concurrently': 'aio', 'send_request_async': 'aio',
+         'use_async_transport': 'aio'}
+
+__all__ = ['ApiError', 'BatchExecutor', 'BatchResult', 'CacheEntry', 'Call', 'DownloadError',
+           'ElementIds', 'Histogram', 'Mesh', 'Metrics', 'Payload', 'Polylines', 'PooledTransport',
+           'RequestCoalescer', 'Response', 'ResponseCache', 'StreamedResponse', 'TokenBucket',
+           'TranslationError', 'TranslationResult', 'TranslationTracker', 'UNSET', 'array_endpoint',
+           'clear_url_cache', 'codec_name', 'decode_stl', 'decode_tessellated_edges',
+           'decode_tessellated_faces', 'download_endpoint', 'download_file', 'endpoint',
+           'fetch_body', 'fetch_page', 'fill_path', 'get_transport', 'is_download', 'iter_items',
+           'json_dumps', 'json_loads', 'map_file', 'paginate', 'paginated', 'parse_url',
+           'payload_body', 'payload_template', 'preview', 'read_response',
+           'register_payload_templates', 'run_batch', 'run_translations', 'save_response',
+           'send_request', 'start_call', 'url_cache_stats', 'use_cache', 'use_coalescing',
+           'use_codec', 'use_metrics', 'use_transport']
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+        globals()[name] = value  # later lookups skip __getattr__
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
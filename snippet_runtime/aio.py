@@ -0,0 +1,157 @@
+import asyncio
+import base64
+from typing import Iterable
+
+from .endpoints import fill_path
+from .metrics import start_call
+from .payloads import payload_body
+from .responses import read_response
+from .transport import ApiError, Response, encode_body, with_query
+from .urls import parse_url
+
+
+class AsyncTransport:
+    """
+    An asyncio transport for the "_async" endpoint functions, backed by one shared aiohttp session
+    with keep-alive connections. Needs aiohttp (`pip install aiohttp`).
+
+        async with AsyncTransport(access, secret) as session:
+            info = await getDocument_async(session, url)
+
+    access_key, secret_key: Onshape API keys, sent with HTTP basic authentication
+    max_per_host: the most connections open at once to one host
+    timeout: total timeout of a call in seconds
+    """
+    def __init__(self, access_key: str = "", secret_key: str = "", max_per_host: int = 10, timeout: float = 60):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.auth = None
+        if access_key and secret_key:
+            token = base64.b64encode('{}:{}'.format(access_key, secret_key).encode()).decode()
+            self.auth = 'Basic ' + token
+        self._session = None
+        self.requests = 0
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError("AsyncTransport needs aiohttp: pip install aiohttp") from None
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.max_per_host)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def request(self, method: str, url: str, query_params=None, headers=None, body=None, **kwargs) -> Response:
+        """
+        Make an API call; the asynchronous counterpart of PooledTransport.request
+        """
+        self.requests += 1
+        url = with_query(url, query_params)
+        headers = dict(headers or {})
+        if self.auth:
+            headers.setdefault('Authorization', self.auth)
+        data = encode_body(method, body, headers)
+        async with self._get_session().request(method, url, headers=headers, data=data) as response:
+            raw = await response.read()
+            result = Response(response.status, response.reason,
+                              {name.lower(): value for name, value in response.headers.items()}, raw)
+        if result.status >= 400:
+            raise ApiError(result.status, result.reason, raw, result.headers)
+        return result
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+_async_transport = None  # the session used by "_async" functions called with session=None
+
+
+def use_async_transport(transport) -> None:
+    """
+    Share one AsyncTransport between all "_async" functions called without a session
+    """
+    global _async_transport
+    _async_transport = transport
+
+
+async def send_request_async(session, method: str, url: str, query_params: dict, headers: dict, body,
+                             stream: bool = False, call=None):
+    """
+    Make an API call for a generated "_async" function, through session or the transport set with use_async_transport.
+    The body is always read in full (stream is accepted for symmetry with send_request).
+    call: the metrics.Call timing this call, if metrics are recorded
+    """
+    session = session or _async_transport
+    if session is None:
+        raise ValueError("No AsyncTransport: pass a session or call use_async_transport first")
+    if call is not None:
+        call.lap('url')
+    try:
+        response = await session.request(method, url=url, query_params=query_params, headers=headers,
+                                         body=payload_body(body))
+    except Exception as error:
+        if call is not None:
+            call.finish(getattr(error, 'status', None) or type(error).__name__)
+        raise
+    if call is not None:
+        call.lap('request')
+        call.status = response.status
+    return response
+
+
+def async_endpoint(function):
+    """
+    The "_async" version of a function created with `endpoint`, making its call through an AsyncTransport
+    """
+    operation_id = function.operation_id
+
+    async def call_endpoint(session, url, payload={}, params={}, show_response=False, output=None, items=None):
+        call = start_call(operation_id)
+        ids = parse_url(url)
+        fixed_url, params = fill_path(operation_id, function.path_parts, ids, params)
+        response = await send_request_async(session, function.method, ids.base + fixed_url, params,
+                                            dict(function.headers), payload,
+                                            stream=output is not None or items is not None, call=call)
+        return read_response(response, show_response, output, items, call)
+
+    call_endpoint.__name__ = call_endpoint.__qualname__ = operation_id + '_async'
+    call_endpoint.__doc__ = '''
+    The asynchronous version of `{}` (see help({})).
+    - `session`: the AsyncTransport making the call (None: the one set with use_async_transport)
+    '''.format(operation_id, operation_id)
+    return call_endpoint
+
+
+async def run_concurrently(session, calls: Iterable[tuple], max_concurrency: int = 20, per_host: int = 10,
+                           return_exceptions: bool = False) -> list:
+    """
+    Run many "_async" endpoint calls at once and return their results in the order of calls
+
+    session: the AsyncTransport making the calls (None: the one set with use_async_transport)
+    calls: (function, url, params) or (function, url, params, payload) tuples
+    max_concurrency: the most calls in flight at once
+    per_host: the most calls in flight at once to one Onshape stack
+    return_exceptions: return the exception of a failed call in its place instead of raising it
+    """
+    overall = asyncio.Semaphore(max_concurrency)
+    hosts = {}  # stack base url -> semaphore
+
+    async def run(call):
+        function, url, params = call[:3]
+        host = hosts.setdefault(parse_url(url).base, asyncio.Semaphore(per_host))
+        async with host, overall:  # wait for the host first, so that a busy host holds no global slot
+            if len(call) > 3:
+                return await function(session, url, call[3], params=params)
+            return await function(session, url, params=params)
+
+    return await asyncio.gather(*(run(call) for call in calls), return_exceptions=return_exceptions)
@@ -0,0 +1,206 @@
+import json
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUSES = (429, 503)  # "Too Many Requests" and "Service Unavailable" are retried, honoring Retry-After
+
+# The outcome of one job of a batch: index is its position in the submitted jobs,
+# and exactly one of result and error is set
+BatchResult = namedtuple('BatchResult', ['index', 'job', 'result', 'error'])
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket: acquire() blocks until a call may be made, so that on average
+    at most `rate` calls are made per second, with bursts of up to `burst` calls
+    """
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """
+        Make no calls at all for the next `seconds` (e.g. after a 429 with Retry-After)
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    delay = self.paused_until - now
+            time.sleep(delay)
+
+
+def retry_after(error) -> float:
+    """
+    The seconds to wait given by the Retry-After header of an API error (seconds or an HTTP date); None if absent
+    """
+    headers = getattr(error, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _job_key(job: tuple) -> tuple:
+    """
+    Identical jobs (same function, url, params and payload) share one request while it is in flight
+    """
+    operation, url, params = job[:3]
+    payload = job[3] if len(job) > 3 else {}
+    return (operation, url, json.dumps(params, sort_keys=True, default=str),
+            json.dumps(payload, sort_keys=True, default=str))
+
+
+class BatchExecutor:
+    """
+    Runs many calls of the generated endpoint functions through a pool of threads, e.g. one operation
+    across thousands of documents:
+
+        executor = BatchExecutor(client, workers=8, rate=5)
+        for result in executor.run((getMassProperties, url, {}) for url in urls):
+            ...
+
+    Each job is a tuple (function, url, params[, payload]). Calls are rate limited with a token bucket;
+    429 and 503 responses are retried after their Retry-After delay (which also pauses every other
+    worker) or else after an exponential backoff with random jitter. Identical jobs submitted while
+    one of them is in flight are only requested once.
+
+    client: the Onshape client (or PooledTransport) passed to every function
+    workers: the number of calls made at once
+    rate, burst: at most `rate` calls per second on average, in bursts of at most `burst`; None: no limit
+    max_retries: the most retries of one job before its error is returned
+    backoff, max_backoff: the base and the cap, in seconds, of the exponential backoff
+    """
+    def __init__(self, client, workers: int = 8, rate: float = None, burst: int = None, max_retries: int = 5,
+                 backoff: float = 1.0, max_backoff: float = 60.0):
+        self.client = client
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._in_flight = {}  # job key -> the future of the call
+        self._counts = {'jobs': 0, 'calls': 0, 'retries': 0, 'deduplicated': 0, 'errors': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _call(self, job: tuple):
+        operation, url, params = job[:3]
+        payload = job[3] if len(job) > 3 else {}
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            self._count('calls')
+            try:
+                return operation(self.client, url, payload, params)
+            except Exception as error:
+                if getattr(error, 'status', None) not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = retry_after(error)
+                if delay is not None:
+                    delay += random.uniform(0, self.backoff)
+                    if self.bucket is not None:
+                        self.bucket.pause(delay)
+                else:
+                    delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                self._count('retries')
+                time.sleep(delay)
+
+    def _submit(self, pool: ThreadPoolExecutor, job: tuple):
+        key = _job_key(job)
+        with self._lock:
+            self._counts['jobs'] += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counts['deduplicated'] += 1
+                return future
+            future = self._in_flight[key] = pool.submit(self._call, job)
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key: tuple, future) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def _result(self, index: int, job: tuple, future) -> BatchResult:
+        error = future.exception()
+        if error is not None:
+            self._count('errors')
+            return BatchResult(index, job, None, error)
+        return BatchResult(index, job, future.result(), None)
+
+    def run(self, jobs, ordered: bool = True, window: int = None):
+        """
+        Run the jobs and yield a BatchResult for each, in the order of the jobs (ordered=True)
+        or as soon as each finishes (ordered=False). Jobs are read from the iterable only as
+        workers become free, so at most `window` (default: 4 per worker) are pending at once.
+        """
+        window = window or 4 * self.workers
+        jobs = iter(enumerate(jobs))
+        pending = deque()  # (index, job, future), in submission order
+        with ThreadPoolExecutor(self.workers, thread_name_prefix='onshape-batch') as pool:
+            try:
+                while True:
+                    while len(pending) < window:
+                        entry = next(jobs, None)
+                        if entry is None:
+                            break
+                        pending.append((entry[0], entry[1], self._submit(pool, entry[1])))
+                    if not pending:
+                        return
+                    if ordered:
+                        index, job, future = pending.popleft()
+                        future.exception()  # wait for it
+                        yield self._result(index, job, future)
+                    else:
+                        wait([future for _, _, future in pending], return_when=FIRST_COMPLETED)
+                        for entry in [entry for entry in pending if entry[2].done()]:
+                            pending.remove(entry)
+                            yield self._result(*entry)
+            finally:
+                for _, _, future in pending:
+                    future.cancel()  # the caller stopped early: skip the jobs not started yet
+
+    def stats(self) -> dict:
+        """
+        The jobs run so far, the calls made for them (including retries), and how many were deduplicated or failed
+        """
+        with self._lock:
+            return dict(self._counts)
+
+
+def run_batch(client, jobs, ordered: bool = True, **options):
+    """
+    Run the jobs (function, url, params[, payload]) with a BatchExecutor(client, **options); yields BatchResults
+    """
+    return BatchExecutor(client, **options).run(jobs, ordered)
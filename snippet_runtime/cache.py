@@ -0,0 +1,206 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from .transport import Response, with_query
+
+# Documents addressed by version (/v/) or microversion (/m/) never change, so their responses are never revalidated
+IMMUTABLE_PATH = re.compile(r'/[vm]/[0-9a-fA-F]{24}(/|$)')
+
+# One cached response: its ETag, whether its url is immutable, its (lowercased) headers and its body
+CacheEntry = namedtuple('CacheEntry', ['etag', 'immutable', 'headers', 'raw'])
+
+
+def cache_key(url: str, query_params, headers: dict) -> str:
+    """
+    The key of a GET request: its url with the query parameters in a canonical order, and its Accept header
+    """
+    query = sorted(dict(query_params or {}).items())
+    return '{} {}'.format(with_query(url, query), (headers or {}).get('Accept', ''))
+
+
+def _not_modified(error: Exception) -> bool:
+    """
+    Whether a conditional GET failed because the response was a 304: clients raising for it (status 304),
+    or onshape_client, which follows every 3xx status as a redirect and fails on the missing Location header
+    """
+    if getattr(error, 'status', None) == 304:
+        return True
+    return isinstance(error, KeyError) and bool(error.args) and str(error.args[0]).lower() == 'location'
+
+
+def _entry_size(key: str, entry: CacheEntry) -> int:
+    return len(key) + len(entry.raw) + sum(len(name) + len(str(value)) for name, value in entry.headers.items())
+
+
+class _DiskTier:
+    """
+    The optional second tier of a ResponseCache: a SQLite file evicting its least recently used entries
+    """
+    def __init__(self, path: str, max_entries: int, max_bytes: int):
+        import sqlite3  # only imported by the caches with a disk tier
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT, immutable INTEGER, '
+                         'headers TEXT, body BLOB, size INTEGER, used REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+        self.entries, self.bytes = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+    def get(self, key: str):
+        row = self._db.execute('SELECT etag, immutable, headers, body FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute('UPDATE responses SET used = ? WHERE key = ?', (time.time(), key))
+        return CacheEntry(row[0], bool(row[1]), json.loads(row[2]), bytes(row[3]))
+
+    def put(self, key: str, entry: CacheEntry, size: int) -> int:
+        """
+        Store an entry; returns the number of entries evicted to make room for it
+        """
+        old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+        self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (key, entry.etag, int(entry.immutable), json.dumps(entry.headers), entry.raw, size, time.time()))
+        if old is None:
+            self.entries += 1
+        self.bytes += size - (old[0] if old else 0)
+        evicted = 0
+        while self.entries > self.max_entries or self.bytes > self.max_bytes:
+            oldest = self._db.execute('SELECT key, size FROM responses ORDER BY used LIMIT 64').fetchall()
+            for old_key, old_size in oldest:
+                if self.entries <= self.max_entries and self.bytes <= self.max_bytes:
+                    break
+                self._db.execute('DELETE FROM responses WHERE key = ?', (old_key,))
+                self.entries -= 1
+                self.bytes -= old_size
+                evicted += 1
+        return evicted
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class ResponseCache:
+    """
+    A cache of the responses of GET calls, used by every endpoint function once set with `use_cache(cache)`.
+
+    Responses are kept in memory (least recently used first out), and optionally in a SQLite file
+    as well so that they survive the process. A cached response is revalidated with its ETag
+    (If-None-Match): a 304 from Onshape is answered from the cache. Responses of version (/v/)
+    and microversion (/m/) urls cannot change and are answered from the cache without any request.
+    Responses that have neither an ETag nor an immutable url are not cached.
+
+    max_entries, max_bytes: the limits of the memory tier
+    path: the SQLite file of the disk tier; None: memory only
+    disk_max_entries, disk_max_bytes: the limits of the disk tier
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 2 ** 20, path: str = None,
+                 disk_max_entries: int = 100000, disk_max_bytes: int = 2 ** 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # key -> (CacheEntry, size), least recently used first
+        self._bytes = 0
+        self._disk = _DiskTier(path, disk_max_entries, disk_max_bytes) if path else None
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    def _remember(self, key: str, entry: CacheEntry, size: int) -> None:
+        if key in self._memory:
+            self._bytes -= self._memory.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._memory[key] = (entry, size)
+        self._bytes += size
+        while len(self._memory) > self.max_entries or self._bytes > self.max_bytes:
+            self._bytes -= self._memory.popitem(last=False)[1][1]
+            self._counts['evicted'] += 1
+
+    def get(self, key: str):
+        """
+        The cached entry of a key, or None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+            entry = self._disk.get(key) if self._disk else None
+            if entry is not None:
+                self._remember(key, entry, _entry_size(key, entry))
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        size = _entry_size(key, entry)
+        with self._lock:
+            self._remember(key, entry, size)
+            if self._disk:
+                self._counts['evicted'] += self._disk.put(key, entry, size)
+            self._counts['stored'] += 1
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def request(self, transport, url: str, query_params: dict, headers: dict):
+        """
+        Make a GET call through transport (which has the `request` method of onshape_client),
+        answering it from the cache when possible
+        """
+        if 'If-None-Match' in headers or 'If-None-Match' in (query_params or {}):
+            return transport.request('GET', url=url, query_params=query_params, headers=headers, body=None)
+        key = cache_key(url, query_params, headers)
+        entry = self.get(key)
+        if entry is not None and entry.immutable:
+            self._count('hits')
+            return Response(200, 'OK', dict(entry.headers), entry.raw)
+
+        request_headers = dict(headers)
+        if entry is not None and entry.etag:
+            request_headers['If-None-Match'] = entry.etag
+        try:
+            response = transport.request('GET', url=url, query_params=query_params, headers=request_headers, body=None)
+        except Exception as error:
+            if 'If-None-Match' not in request_headers or not _not_modified(error):
+                raise
+            response = None  # a client that cannot return a 304 (not modified)
+        if response is None or response.status == 304:
+            self._count('revalidated')
+            return Response(200, 'OK', dict(entry.headers), entry.raw)
+
+        self._count('misses')
+        response_headers = {name.lower(): value for name, value in dict(response.getheaders()).items()}
+        etag = response_headers.get('etag')
+        immutable = IMMUTABLE_PATH.search(url) is not None
+        if response.status == 200 and (etag or immutable):
+            raw = getattr(response, 'raw', None)
+            if not isinstance(raw, bytes):
+                raw = response.data if isinstance(response.data, bytes) else response.data.encode('utf8')
+            self.put(key, CacheEntry(etag, immutable, response_headers, raw))
+        return response
+
+    def clear(self) -> None:
+        """
+        Forget every cached response, in memory and on disk
+        """
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+            if self._disk:
+                self._disk._db.execute('DELETE FROM responses')
+                self._disk.entries = self._disk.bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Responses answered from the cache (hits: without a request, revalidated: with a 304), misses, and sizes
+        """
+        with self._lock:
+            stats = dict(self._counts, entries=len(self._memory), bytes=self._bytes)
+            if self._disk:
+                stats.update(disk_entries=self._disk.entries, disk_bytes=self._disk.bytes)
+        return stats
+
+    def close(self) -> None:
+        if self._disk:
+            self._disk.close()
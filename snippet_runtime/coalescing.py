@@ -0,0 +1,97 @@
+import threading
+
+from .cache import cache_key
+from .transport import Response
+
+
+class _Flight:
+    """
+    A GET call in flight, and what the calls waiting for it receive once it is over
+    """
+    __slots__ = ('done', 'waiters', 'shared', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.shared = None  # (status, reason, headers, body) of the response
+        self.error = None
+
+
+def _shareable(response) -> tuple:
+    """
+    The status, reason, (lowercased) headers and body of a fully read response, to build copies of it
+    """
+    headers = {name.lower(): value for name, value in dict(response.getheaders()).items()}
+    raw = getattr(response, 'raw', None)
+    if not isinstance(raw, bytes):
+        raw = response.data if isinstance(response.data, bytes) else response.data.encode('utf8')
+    return response.status, response.reason, headers, raw
+
+
+class RequestCoalescer:
+    """
+    Single-flight GET calls, used by every endpoint function once set with `use_coalescing(coalescer)`:
+    when several threads make the same GET call (same transport, url, query parameters and Accept header)
+    while it is in flight, only the first one is sent; the others wait for it and receive a copy of its
+    response, or the same error.
+
+        coalescer = use_coalescing(RequestCoalescer())
+        ...  # e.g. many workers calling getDocument on the same documents
+        coalescer.stats()  # {'requests': 120, 'coalesced': 880, ...}
+
+    Calls are only shared while one is in flight: a call made after the response was received is sent
+    again (see ResponseCache to reuse responses). Streamed calls (output=, items=) are never shared.
+    """
+    def __init__(self):
+        self._flights = {}  # key -> _Flight
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'coalesced': 0, 'errors': 0, 'most_waiters': 0}
+
+    def request(self, get, transport, url: str, query_params: dict, headers: dict):
+        """
+        Make a GET call with get(transport, url, query_params, headers), unless the same call is in flight
+        """
+        key = (id(transport), cache_key(url, query_params, headers))
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._counts['requests'] += 1
+            else:
+                flight.waiters += 1
+                self._counts['coalesced'] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return Response(flight.shared[0], flight.shared[1], dict(flight.shared[2]), flight.shared[3])
+
+        response = None
+        try:
+            response = get(transport, url, query_params, headers)
+            return response
+        except Exception as error:
+            flight.error = error
+            with self._lock:
+                self._counts['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]  # later calls make a new request
+                self._counts['most_waiters'] = max(self._counts['most_waiters'], flight.waiters)
+            try:
+                if flight.waiters and response is not None:
+                    flight.shared = _shareable(response)
+                elif flight.waiters and flight.error is None:
+                    flight.error = RuntimeError("The shared GET call of {} was interrupted".format(url))
+            finally:
+                flight.done.set()
+
+    def stats(self) -> dict:
+        """
+        The requests sent, the calls that shared the response of another one instead (coalesced),
+        the requests that failed, and the most calls that waited for a single request
+        """
+        with self._lock:
+            return dict(self._counts, in_flight=len(self._flights))
@@ -0,0 +1,57 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# name -> (loads, dumps); loads takes str or bytes, dumps returns UTF-8 bytes
+JSON_CODECS = {'json': (json.loads, lambda obj: json.dumps(obj).encode())}
+if ujson is not None:
+    JSON_CODECS['ujson'] = (ujson.loads,
+                            lambda obj: ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode())
+if orjson is not None:
+    JSON_CODECS['orjson'] = (orjson.loads, orjson.dumps)
+
+_codec = None  # the name of the codec in use
+
+
+def use_codec(name: str = None) -> str:
+    """
+    Pick the JSON codec of all API calls: "orjson", "ujson" or "json" (the standard library).
+    Without a name the fastest installed one is used. Returns the name of the codec in use.
+    """
+    global _codec, _loads, _dumps
+    if name is None:
+        name = next(codec for codec in ('orjson', 'ujson', 'json') if codec in JSON_CODECS)
+    if name not in JSON_CODECS:
+        raise ValueError("JSON codec {!r} is not installed; available: {}".format(name, sorted(JSON_CODECS)))
+    _codec = name
+    _loads, _dumps = JSON_CODECS[name]
+    return name
+
+
+def json_loads(data):
+    """
+    Parse a JSON document (str or bytes) with the codec in use
+    """
+    return _loads(data)
+
+
+def json_dumps(obj) -> bytes:
+    """
+    Serialize a request body to compact UTF-8 JSON with the codec in use
+    """
+    return _dumps(obj)
+
+
+def codec_name() -> str:
+    return _codec
+
+
+use_codec()
@@ -0,0 +1,267 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .endpoints import fill_path
+from .metrics import start_call
+from .responses import _chunks
+from .transport import get_transport
+from .urls import parse_url
+
+DOWNLOAD_CHUNK = 2 ** 20  # bytes read and written at a time by download
+MIN_SEGMENT = 8 * 2 ** 20  # the smallest range given to one connection of a parallel download
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+def is_download(content_type: str) -> bool:
+    """
+    Whether an operation returns a file rather than JSON or text (e.g. application/octet-stream, model/stl),
+    judging by its response content type
+    """
+    if not content_type:
+        return False
+    media = content_type.split(';')[0].strip().lower()
+    return not (media.endswith('json') or media.endswith('+json') or media.startswith('text/'))
+
+
+class DownloadError(IOError):
+    """
+    A download that ended with fewer (or more) bytes than the server announced, or whose file changed
+    on the server while it was downloaded
+    """
+
+
+def _status(error):
+    return getattr(error, 'status', None)
+
+
+def _content_range(response) -> tuple:
+    """
+    (first byte, last byte, total size or None) of a 206 response
+    """
+    match = CONTENT_RANGE.match(response.getheader('Content-Range') or '')
+    if match is None:
+        raise DownloadError("Partial response without a valid Content-Range: {!r}".format(
+            response.getheader('Content-Range')))
+    return int(match.group(1)), int(match.group(2)), None if match.group(3) == '*' else int(match.group(3))
+
+
+def _release(response) -> None:
+    release = getattr(response, 'release', None) or getattr(response, 'release_conn', None)
+    if release is not None:
+        release()
+
+
+class _State:
+    """
+    The progress of a download, kept next to the partial file (path + ".part.json") so that
+    an interrupted download resumes where it stopped
+
+    segments: [start, next byte to write, end (exclusive)] of every range of the file
+    """
+    def __init__(self, path: str, size: int = None, etag: str = None, segments: list = None):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.segments = segments or []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            return cls(path, state['size'], state.get('etag'), state['segments'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self) -> None:
+        with self.lock:
+            text = json.dumps({'size': self.size, 'etag': self.etag, 'segments': self.segments})
+        with open(self.path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(self.path + '.tmp', self.path)
+
+    def remaining(self) -> int:
+        return sum(end - done for _, done, end in self.segments)
+
+
+def _copy(response, part: str, segment: list, state: _State, chunk_size: int) -> None:
+    """
+    Write the body of a response to the range [next byte to write, end) of the partial file;
+    the rest of the body, if any, is not read
+    """
+    with open(part, 'r+b') as f:
+        f.seek(segment[1])
+        for chunk in _chunks(response, chunk_size):
+            chunk = chunk[:segment[2] - segment[1]]  # never write past the range
+            f.write(chunk)
+            with state.lock:
+                segment[1] += len(chunk)
+            if segment[1] >= segment[2]:
+                break
+    if segment[1] != segment[2]:
+        raise DownloadError("Range {}-{}: the response ended {} bytes early".format(
+            segment[0], segment[2] - 1, segment[2] - segment[1]))
+
+
+def _write_range(transport, url: str, query_params: dict, headers: dict, part: str, segment: list,
+                 state: _State, chunk_size: int) -> None:
+    """
+    Download what is missing of one range of the file into its place in the partial file
+    """
+    request_headers = dict(headers, Range='bytes={}-{}'.format(segment[1], segment[2] - 1))
+    if state.etag:
+        request_headers['If-Range'] = state.etag  # the whole file instead, if it is another version now
+    response = transport.request('GET', url=url, query_params=query_params, headers=request_headers,
+                                 _preload_content=False)
+    try:
+        if response.status == 200 and state.etag:
+            raise DownloadError("The file changed during the download (ETag {} instead of {})".format(
+                response.getheader('ETag'), state.etag))
+        if response.status != 206 or _content_range(response)[0] != segment[1]:
+            raise DownloadError("The server did not return the range {}-{}".format(segment[1], segment[2] - 1))
+        size = _content_range(response)[2]
+        if size != state.size:
+            raise DownloadError("The file changed during the download ({} bytes instead of {})".format(
+                size, state.size))
+        _copy(response, part, segment, state, chunk_size)
+    finally:
+        _release(response)
+
+
+def download_file(client, url: str, path: str, query_params: dict = None, headers: dict = None, segments: int = 1,
+                  resume: bool = True, chunk_size: int = DOWNLOAD_CHUNK, min_segment: int = MIN_SEGMENT,
+                  call=None) -> int:
+    """
+    Download the file at url into path chunk by chunk, without ever holding it in memory; returns its size.
+
+    The file is written as path + ".part" and renamed once its size has been verified against the size
+    the server announced. When the server supports HTTP ranges (a 206 response to a Range request):
+    - an interrupted download resumes where it stopped (with resume=True), unless the file changed (ETag)
+    - with segments > 1, ranges of at least min_segment bytes are downloaded in parallel connections
+    Otherwise the file is downloaded in one piece, from the start.
+
+    client: as for the endpoint functions (the transport set with use_transport is used first)
+    call: the metrics.Call timing this download, if metrics are recorded
+    """
+    transport = get_transport(client)
+    query_params = dict(query_params or {})
+    headers = dict(headers or {})
+    part = path + '.part'
+    state = _State.load(part + '.json') if resume and os.path.exists(part) else None
+    if call is not None:
+        call.lap('url')
+
+    # Ask for the bytes not downloaded yet; the answer tells whether ranges are supported and the size
+    start = state.segments[0][1] if state and len(state.segments) == 1 else 0
+    probe_headers = dict(headers, Range='bytes={}-'.format(start))
+    if state and state.etag:
+        probe_headers['If-Range'] = state.etag
+    try:
+        response = transport.request('GET', url=url, query_params=query_params, headers=probe_headers,
+                                     _preload_content=False)
+    except Exception as error:
+        if _status(error) == 416 and state and state.remaining() == 0:
+            response = None  # everything was downloaded already
+        else:
+            if call is not None:
+                call.finish(_status(error) or type(error).__name__)
+            raise
+    if call is not None:
+        call.lap('request')
+        call.status = response.status if response is not None else 206
+
+    try:
+        if response is not None and response.status == 206:
+            first, _, size = _content_range(response)
+            if size is None:
+                raise DownloadError("The server did not announce the size of the file (Content-Range: bytes */*)")
+            etag = response.getheader('ETag')
+            if state is None or state.size != size or (state.etag and etag and state.etag != etag):
+                # A new download (or the file changed): plan the ranges of the whole file
+                count = max(1, min(segments, size // max(1, min_segment)))
+                bounds = [size * i // count for i in range(count + 1)]
+                state = _State(part + '.json', size, etag,
+                               [[bounds[i], bounds[i], bounds[i + 1]] for i in range(count)])
+                with open(part, 'wb') as f:
+                    f.truncate(size)
+            state.etag = state.etag or etag
+            pending = [segment for segment in state.segments if segment[1] < segment[2]]
+            # The probe already streams the range starting where it starts; the other ranges are requested
+            probe, response = response, None
+            probe_segment = next((segment for segment in pending if segment[1] == first), None)
+
+            def fill(segment):
+                if segment is probe_segment:
+                    try:
+                        _copy(probe, part, segment, state, chunk_size)
+                    finally:
+                        _release(probe)
+                else:
+                    _write_range(transport, url, query_params, headers, part, segment, state, chunk_size)
+
+            try:
+                if len(pending) > 1:
+                    with ThreadPoolExecutor(len(pending), thread_name_prefix='onshape-download') as pool:
+                        for future in [pool.submit(fill, segment) for segment in pending]:
+                            future.result()
+                elif pending:
+                    fill(pending[0])
+            finally:
+                _release(probe)
+                state.save()
+            size = state.size
+        elif response is not None:
+            # No range support: the whole file, from the start
+            expected = response.getheader('Content-Length')
+            size = 0
+            with open(part, 'wb') as f:
+                for chunk in _chunks(response, chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+            response = None
+            if expected is not None and int(expected) != size:
+                raise DownloadError("Received {} of {} bytes".format(size, expected))
+        else:
+            size = state.size
+    except Exception as error:
+        if call is not None:
+            call.finish(_status(error) or type(error).__name__)
+        raise
+    finally:
+        if response is not None:
+            _release(response)
+
+    if os.path.getsize(part) != size:
+        raise DownloadError("{} has {} bytes instead of {}".format(part, os.path.getsize(part), size))
+    os.replace(part, path)
+    if os.path.exists(part + '.json'):
+        os.remove(part + '.json')
+    if call is not None:
+        call.lap('transfer')
+        call.finish(received=size)
+    return size
+
+
+def download_endpoint(function):
+    """
+    The "_download" version of a function created with `endpoint` whose response is a file (see is_download)
+    """
+    operation_id = function.operation_id
+
+    def call_endpoint(client, url, path, params={}, segments=1, resume=True):
+        call = start_call(operation_id)
+        ids = parse_url(url)
+        fixed_url, params = fill_path(operation_id, function.path_parts, ids, params)
+        return download_file(client, ids.base + fixed_url, path, params, function.headers, segments, resume, call=call)
+
+    call_endpoint.__name__ = call_endpoint.__qualname__ = operation_id + '_download'
+    call_endpoint.__doc__ = '''
+    Download the response of `{}` into the file at `path` (see `download_file`); returns its size.
+    - `segments`: the ranges downloaded in parallel, if the server supports ranges (default: 1)
+    - `resume`: continue an interrupted download of the same file (default: True)
+    '''.format(operation_id)
+    return call_endpoint
@@ -0,0 +1,93 @@
+import re
+
+from .codec import json_loads
+from .metrics import start_call
+from .responses import read_response
+from .transport import send_request
+from .urls import ELEMENT_PATH_PARAMS, parse_url
+
+_payload_templates = {}  # request body schema -> its payload template, as JSON text
+_template_loaders = []  # functions returning more templates, called when a schema is not registered yet
+
+
+def register_payload_templates(templates) -> None:
+    """
+    Make the payload templates (schema name -> JSON text) available to payload_template; templates may
+    also be a function returning them, called the first time a template that is not registered is asked for
+    """
+    if callable(templates):
+        _template_loaders.append(templates)
+    else:
+        _payload_templates.update(templates)
+
+
+def payload_template(schema: str):
+    """
+    A template of the payload of the operations whose request body is `schema`
+    """
+    while schema not in _payload_templates and _template_loaders:
+        _payload_templates.update(_template_loaders.pop()())
+    return json_loads(_payload_templates[schema])
+
+
+def fill_path(operation_id: str, path_parts: tuple, ids, params: dict) -> tuple:
+    """
+    The url path of an operation, from its split path template (see split_path), the parts of the
+    document url and, for the other path parameters, params; returns (path, the remaining params)
+    """
+    params = dict(params)
+    parts = list(path_parts)
+    for i in range(1, len(parts), 2):
+        if parts[i] in ELEMENT_PATH_PARAMS:
+            parts[i] = getattr(ids, ELEMENT_PATH_PARAMS[parts[i]])
+        elif parts[i] in params:
+            parts[i] = str(params.pop(parts[i]))
+        else:
+            raise ValueError("{} needs the path parameter '{}' in params".format(operation_id, parts[i]))
+    return "".join(parts), params
+
+
+def endpoint(operation_id: str, method: str, path: str, accept: str = None, summary: str = "", tag: str = "",
+             params: list = (), payload_schema: str = None):
+    """
+    Create the function calling one operation, with the same arguments and behavior as the full
+    snippets of API_Snippets.ipynb; used by the compact notebook (`master_writer.py --compact`)
+
+    path: the path template of the operation in the spec, e.g. "/documents/{did}"
+    accept: the response content type of the operation
+    params: the names of its query parameters, for the documentation
+    payload_schema: the schema of its request body, for payload_template
+    """
+    path_parts = tuple(re.split(r'\{([^}]+)\}', '/api' + path))
+    headers = {"Accept": accept, "Content-Type": "application/json"} if accept else {}
+
+    def call_endpoint(client, url, payload={}, params={}, show_response=False, output=None, items=None):
+        call = start_call(operation_id)
+        ids = parse_url(url)
+        fixed_url, params = fill_path(operation_id, path_parts, ids, params)
+        response = send_request(client, method, ids.base + fixed_url, params, dict(headers), payload,
+                                stream=output is not None or items is not None, call=call)
+        return read_response(response, show_response, output, items, call)
+
+    custom = [name for name in path_parts[1::2] if name not in ELEMENT_PATH_PARAMS]
+    doc = '''
+    API call type: `{}`
+    {}
+    More details can be found in https://cad.onshape.com/glassworks/explorer/#/{}/{}
+    - `params`: {}'''.format(method, summary, tag, operation_id,
+                             ', '.join(['`{}` (Required)'.format(name) for name in custom]
+                                       + ['`{}`'.format(name) for name in params]) or "none")
+    if payload_schema:
+        doc += '''
+    - `payload`: a payload builder of the schema (see the "Payload Builders" cell), or a dictionary like
+        `payload_template("{}")`'''.format(payload_schema)
+    call_endpoint.__doc__ = doc + '''
+    - `show_response`, `output`, `items`: as for every endpoint (see the shared helpers)
+    '''
+    call_endpoint.__name__ = call_endpoint.__qualname__ = operation_id
+    call_endpoint.operation_id = operation_id
+    call_endpoint.method = method
+    call_endpoint.path_parts = path_parts
+    call_endpoint.headers = headers
+    call_endpoint.accept = accept
+    return call_endpoint
@@ -0,0 +1,217 @@
+import csv
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The upper bounds, in seconds, of the latency histogram buckets (as in the Prometheus client libraries)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# The parts of a call: building the url, the request until the response is received (with its body,
+# unless it is streamed), reading a streamed body, and parsing the JSON
+PHASES = ('url', 'request', 'transfer', 'decode')
+
+_metrics = None  # the registry recording every call, if set with use_metrics
+
+
+class Histogram:
+    """
+    Counts of observations per bucket, with their sum
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        An estimate of the q-quantile: the upper bound of the bucket holding it
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class _OperationMetrics:
+    __slots__ = ('latency', 'phases', 'statuses', 'bytes')
+
+    def __init__(self, buckets: tuple):
+        self.latency = Histogram(buckets)
+        self.phases = {}  # phase -> Histogram
+        self.statuses = {}  # status -> count
+        self.bytes = 0
+
+
+class Call:
+    """
+    The timings of one call of an endpoint function, given to the registry when the call is over
+    """
+    __slots__ = ('registry', 'operation_id', 'start', 'last', 'phases', 'status', 'finished')
+
+    def __init__(self, registry, operation_id: str):
+        self.registry = registry
+        self.operation_id = operation_id
+        self.start = self.last = time.perf_counter()
+        self.phases = {}
+        self.status = None
+        self.finished = False
+
+    def lap(self, phase: str) -> None:
+        """
+        Attribute the time since the previous lap to phase
+        """
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def finish(self, status=None, received: int = 0) -> None:
+        if not self.finished:
+            self.finished = True
+            self.registry.record(self.operation_id, time.perf_counter() - self.start, self.phases,
+                                 status if status is not None else self.status, received)
+
+
+def start_call(operation_id: str):
+    """
+    Start timing a call of an endpoint function; None (and no cost) unless use_metrics was called
+    """
+    if _metrics is None:
+        return None
+    return Call(_metrics, operation_id)
+
+
+def use_metrics(registry=None):
+    """
+    Record every call of the snippets in registry: a Metrics, or any object with a
+    `record(operation_id, seconds, phases, status, received)` method. None stops recording.
+    Returns the registry.
+    """
+    global _metrics
+    _metrics = registry
+    return registry
+
+
+class Metrics:
+    """
+    Per-operation metrics of the endpoint functions: a latency histogram, the time spent in each
+    phase of the calls (see PHASES), the response status codes and the bytes received.
+
+        metrics = use_metrics(Metrics())
+        ...
+        metrics.write_csv("metrics.csv")  # or metrics.serve(9464) for Prometheus
+    """
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._operations = {}  # operationId -> _OperationMetrics
+        self._lock = threading.Lock()
+
+    def record(self, operation_id: str, seconds: float, phases: dict, status, received: int) -> None:
+        with self._lock:
+            operation = self._operations.get(operation_id)
+            if operation is None:
+                operation = self._operations[operation_id] = _OperationMetrics(self.buckets)
+            operation.latency.observe(seconds)
+            for phase, phase_seconds in phases.items():
+                if phase not in operation.phases:
+                    operation.phases[phase] = Histogram(self.buckets)
+                operation.phases[phase].observe(phase_seconds)
+            operation.statuses[status] = operation.statuses.get(status, 0) + 1
+            operation.bytes += received
+
+    def summary(self) -> dict:
+        """
+        operationId -> {calls, mean, p50, p95 (seconds), bytes, statuses, and the mean seconds of each phase}
+        """
+        with self._lock:
+            summary = {}
+            for operation_id, operation in sorted(self._operations.items()):
+                latency = operation.latency
+                row = {'calls': latency.count, 'mean': latency.sum / latency.count,
+                       'p50': latency.quantile(0.5), 'p95': latency.quantile(0.95), 'bytes': operation.bytes,
+                       'statuses': dict(operation.statuses)}
+                for phase in PHASES:
+                    histogram = operation.phases.get(phase)
+                    row[phase] = histogram.sum / histogram.count if histogram else 0.0
+                summary[operation_id] = row
+            return summary
+
+    def write_csv(self, path: str) -> None:
+        """
+        Write the summary as a CSV file, one row per operation
+        """
+        summary = self.summary()
+        statuses = sorted({str(status) for row in summary.values() for status in row['statuses']})
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['operation', 'calls', 'mean', 'p50', 'p95', 'bytes'] + list(PHASES)
+                            + ['status_' + status for status in statuses])
+            for operation_id, row in summary.items():
+                counts = {str(status): count for status, count in row['statuses'].items()}
+                writer.writerow([operation_id] + [row[name] for name in ('calls', 'mean', 'p50', 'p95', 'bytes')]
+                                + [row[phase] for phase in PHASES] + [counts.get(status, 0) for status in statuses])
+
+    def prometheus_text(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format
+        """
+        lines = ['# TYPE onshape_api_call_seconds histogram']
+        phase_lines = ['# TYPE onshape_api_phase_seconds summary']
+        byte_lines = ['# TYPE onshape_api_received_bytes_total counter']
+        status_lines = ['# TYPE onshape_api_responses_total counter']
+        with self._lock:
+            for operation_id, operation in sorted(self._operations.items()):
+                label = 'operation="{}"'.format(operation_id)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), operation.latency.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('onshape_api_call_seconds_bucket{{{},le="{}"}} {}'.format(label, le, cumulative))
+                lines.append('onshape_api_call_seconds_sum{{{}}} {}'.format(label, operation.latency.sum))
+                lines.append('onshape_api_call_seconds_count{{{}}} {}'.format(label, operation.latency.count))
+                for phase, histogram in sorted(operation.phases.items()):
+                    phase_label = '{},phase="{}"'.format(label, phase)
+                    phase_lines.append('onshape_api_phase_seconds_sum{{{}}} {}'.format(phase_label, histogram.sum))
+                    phase_lines.append('onshape_api_phase_seconds_count{{{}}} {}'.format(phase_label, histogram.count))
+                byte_lines.append('onshape_api_received_bytes_total{{{}}} {}'.format(label, operation.bytes))
+                for status, count in sorted(operation.statuses.items(), key=str):
+                    status_lines.append('onshape_api_responses_total{{{},status="{}"}} {}'.format(label, status, count))
+        return '\n'.join(lines + phase_lines + byte_lines + status_lines) + '\n'
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """
+        Serve the metrics for Prometheus at http://host:port/metrics from a background thread;
+        call shutdown() on the returned server to stop
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200 if self.path.split('?')[0] in ('/', '/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def clear(self) -> None:
+        with self._lock:
+            self._operations.clear()
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .responses import read_response
+from .transport import send_request
+
+PREFETCH_WORKERS = 4  # the most next pages requested in the background at once, for all iterators
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix='onshape-prefetch')
+        return _prefetcher
+
+
+def fetch_page(client, next_url: str, accept: str = None):
+    """
+    Request the page at the `next` link of a list response, with the Accept header of its operation
+    """
+    headers = {"Accept": accept, "Content-Type": "application/json"} if accept else {}
+    return read_response(send_request(client, "GET", next_url, {}, headers, None))
+
+
+def paginate(client, page, accept: str = None, prefetch: bool = False):
+    """
+    Yield the `items` of a list response and of every page after it, following the `next` links.
+    Only the current page is held in memory (and, with prefetch, the next one, which is requested
+    in a background thread while the items of the current page are consumed).
+
+    page: the first page, as returned by the endpoint function
+    accept: the Accept header of the operation
+    """
+    pending = None
+    try:
+        while page:
+            next_url = page.get('next')
+            if next_url and prefetch:
+                pending = _executor().submit(fetch_page, client, next_url, accept)
+            items = page.get('items') or ()
+            page = None  # keep only the items of this page while they are consumed
+            yield from items
+            if pending is not None:
+                page, pending = pending.result(), None
+            elif next_url:
+                page = fetch_page(client, next_url, accept)
+    finally:
+        if pending is not None:
+            pending.cancel()  # the caller stopped early: drop the prefetched page
+
+
+def paginated(function):
+    """
+    The iter_ function of a paged list endpoint created with `endpoint`, iterating over the items of all its pages
+    """
+    def iterate(client, url, params={}, prefetch=False):
+        yield from paginate(client, function(client, url, params=params), function.accept, prefetch)
+
+    iterate.__name__ = iterate.__qualname__ = 'iter_' + function.__name__
+    iterate.__doc__ = '''
+    Iterate over the `items` of `{}`, page after page; only one page is held in memory at a time.
+    - `params`: the parameters of `{}`; `limit` sets the number of items per page
+    - `prefetch`: request the next page in the background while the items of the current one are used (default: False)
+    '''.format(function.__name__, function.__name__)
+    return iterate
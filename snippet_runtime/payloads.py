@@ -0,0 +1,97 @@
+from .codec import json_dumps
+
+UNSET = object()  # the value of a field that was never set
+_SCALARS = frozenset((str, int, float, bool, type(None)))  # written to the wire as they are
+
+
+def _plain(value):
+    """
+    A field value as JSON data: builders become dictionaries, inside lists and dictionaries too
+    """
+    if isinstance(value, Payload):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [item if type(item) in _SCALARS else _plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: item if type(item) in _SCALARS else _plain(item) for key, item in value.items()}
+    return value
+
+
+class Payload:
+    """
+    The base of the payload builders generated for the request body schemas of the POST endpoints
+    (see the "Payload Builders" cell): one class per component schema, with a slot per property.
+
+        feature = BTMFeature_134(name="Extrude 1", featureType="extrude", parameters=[...])
+        addPartStudioFeature(client, url, payload=BTFeatureDefinitionCall_1406(feature=feature))
+
+    Fields are given by keyword and only the fields that were set are sent. The builders of the
+    polymorphic BT types send their schema name as "btType" unless it is set. to_dict() and
+    to_json() give the wire format.
+
+    The generated builders define their own __init__ and to_dict, which read and write the slots
+    directly; those of Payload work for any subclass declaring its fields in __slots__.
+    """
+    __slots__ = ()
+    _schema = None  # the component schema of the class
+    _renamed = {}  # attribute -> JSON key, for the keys that are not valid attribute names
+    _fields = ()  # the attributes of the fields, those of the base classes first (set for every subclass)
+    _keys = ()  # the JSON key of each field
+    _bt_type = None  # the "btType" sent by default
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        names = []
+        renamed = {}
+        for klass in reversed(cls.__mro__):
+            names.extend(klass.__dict__.get('__slots__', ()))
+            renamed.update(klass.__dict__.get('_renamed', {}))
+        cls._fields = tuple(names)
+        cls._keys = tuple(renamed.get(name, name) for name in names)
+        cls._bt_type = cls._schema if 'btType' in names else None
+
+    def __init__(self, **fields):
+        for name in self._fields:
+            setattr(self, name, fields.pop(name, UNSET))
+        if fields:
+            raise TypeError("{}() got an unexpected keyword argument {!r}".format(
+                type(self).__name__, next(iter(fields))))
+
+    def _body(self, values: tuple) -> dict:
+        """
+        The JSON data of the values of the fields, in the order of _fields, leaving out those never set
+        """
+        body = {'btType': self._bt_type} if self._bt_type is not None else {}
+        for key, value in zip(self._keys, values):
+            if value is not UNSET:
+                body[key] = value if value.__class__ in _SCALARS else _plain(value)
+        return body
+
+    def to_dict(self) -> dict:
+        """
+        The payload as JSON data, with the fields that were set
+        """
+        return self._body(tuple(getattr(self, name) for name in self._fields))
+
+    def to_json(self) -> bytes:
+        """
+        The payload as compact UTF-8 JSON, encoded with the codec in use
+        """
+        return json_dumps(self.to_dict())
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name)) for name in self._fields
+            if getattr(self, name) is not UNSET))
+
+
+def payload_body(body):
+    """
+    The request body to send for a payload: builders are turned into dictionaries, anything else is kept
+    """
+    return body.to_dict() if isinstance(body, Payload) else body
@@ -0,0 +1,134 @@
+import io
+import json
+
+from .codec import json_loads
+
+CHUNK_SIZE = 2 ** 16  # bytes copied at a time when streaming a response
+PREVIEW_CHARS = 20000  # characters of a response printed by show_response; None prints everything
+
+
+def _chunks(response, chunk_size: int = CHUNK_SIZE):
+    """
+    The body of a response chunk by chunk: streamed responses (PooledTransport, or urllib3 through
+    onshape_client) are read incrementally, fully read responses are returned whole
+    """
+    if hasattr(response, 'stream'):
+        yield from response.stream(chunk_size)
+    else:
+        raw = getattr(response, 'raw', None)
+        if not isinstance(raw, bytes):
+            raw = response.data
+        yield raw.encode('utf8') if isinstance(raw, str) else raw
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    A binary file object over the chunks of a response, for incremental parsers
+    """
+    def __init__(self, response):
+        self._chunks = _chunks(response)
+        self._buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b''
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def preview(parsed, max_chars: int = None) -> str:
+    """
+    Pretty-print parsed JSON lazily: encoding stops once max_chars characters are produced,
+    so printing a huge response never builds its whole text
+    """
+    max_chars = PREVIEW_CHARS if max_chars is None else max_chars
+    pieces = []
+    size = 0
+    for piece in json.JSONEncoder(indent=4, sort_keys=True).iterencode(parsed):
+        pieces.append(piece)
+        size += len(piece)
+        if max_chars and size > max_chars:
+            return ''.join(pieces)[:max_chars] + '\n... (truncated after {} characters)'.format(max_chars)
+    return ''.join(pieces)
+
+
+def save_response(response, output) -> int:
+    """
+    Copy the body of a response into output (a file path or a binary file object) chunk by chunk;
+    returns the number of bytes written
+    """
+    written = 0
+    if hasattr(output, 'write'):
+        for chunk in _chunks(response):
+            written += output.write(chunk) or len(chunk)
+        return written
+    with open(output, 'wb') as f:
+        for chunk in _chunks(response):
+            written += f.write(chunk)
+    return written
+
+
+def iter_items(response, prefix: str):
+    """
+    Yield the elements of the response at the ijson prefix one by one, e.g. "items.item" for
+    each element of the top-level "items" array, without holding the whole response in memory.
+    Without ijson (`pip install ijson`) the body is parsed at once and the same elements are yielded.
+    """
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+    if ijson is not None:
+        yield from ijson.items(_ChunkReader(response), prefix)
+        return
+    values = [json_loads(b''.join(_chunks(response)))]
+    for key in prefix.split('.') if prefix else []:
+        if key == 'item':
+            values = [item for value in values for item in value]
+        else:
+            values = [value[key] for value in values if key in value]
+    yield from values
+
+
+def read_response(response, show_response: bool = False, output=None, items: str = None, call=None):
+    """
+    Turn the response of a generated function into its return value
+
+    show_response: print the response, truncated to PREVIEW_CHARS characters
+    output: stream the body into this file path or binary file object and return the number of bytes
+    items: return an iterator over the elements at this ijson prefix (e.g. "items.item") instead of the parsed body
+    call: the metrics.Call timing this call, if metrics are recorded
+    """
+    if output is not None:
+        written = save_response(response, output)
+        if call is not None:
+            call.lap('transfer')
+            call.finish(received=written)
+        if show_response:
+            print("Saved {} bytes to {}".format(written, getattr(output, 'name', output)))
+        return written
+    if items is not None:
+        if call is not None:
+            call.finish()  # the items are parsed as they are used, after the call
+        return iter_items(response, items)
+    if hasattr(response, 'stream'):  # a streamed response that ended up being parsed anyway
+        raw = b''.join(_chunks(response))
+        if call is not None:
+            call.lap('transfer')
+    else:
+        raw = getattr(response, 'raw', None) or response.data
+    parsed = json_loads(raw)
+    if call is not None:
+        call.lap('decode')
+        call.finish(received=len(raw) if isinstance(raw, bytes) else len(raw.encode('utf8')))  # bytes, not characters
+    if show_response:
+        print(preview(parsed))
+    return parsed
@@ -0,0 +1,270 @@
+import io
+import itertools
+import mmap
+import os
+import re
+
+from .codec import json_loads
+
+# The operations whose response can be decoded into NumPy arrays, and the decoder of each
+ARRAY_DECODERS = {'getPartStudioTessellatedFaces': 'decode_tessellated_faces',
+                  'getFaces1': 'decode_tessellated_faces',
+                  'getPartStudioTessellatedEdges': 'decode_tessellated_edges',
+                  'getEdges': 'decode_tessellated_edges',
+                  'exportPartStudioStl': 'decode_stl',
+                  'exportStl': 'decode_stl'}
+STL_HEADER = 84  # bytes before the triangles of a binary STL file: an 80 bytes header and the triangle count
+STL_VERTEX = re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+STL_NORMAL = re.compile(rb'facet\s+normal\s+(\S+)\s+(\S+)\s+(\S+)')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The array decoders need numpy: pip install numpy") from None
+    return numpy
+
+
+class Mesh:
+    """
+    A triangle mesh in contiguous NumPy arrays
+
+    vertices: float32 (v, 3); facets: int32 (n, 3), the vertices of each triangle
+    normals: float32 (n, 3), the normal of each triangle
+    vertex_normals: float32 (n, 3, 3), the normal at each corner of each triangle (None if not in the response)
+    face_offsets: int32 (faces + 1), the first triangle of each face; face_ids: the id of each face
+    body_offsets: int32 (bodies + 1), the first face of each body (part); body_ids: the id of each body
+    """
+    __slots__ = ('vertices', 'facets', 'normals', 'vertex_normals', 'face_offsets', 'face_ids',
+                 'body_offsets', 'body_ids')
+
+    def __init__(self, vertices, facets, normals, vertex_normals=None, face_offsets=None, face_ids=(),
+                 body_offsets=None, body_ids=()):
+        self.vertices = vertices
+        self.facets = facets
+        self.normals = normals
+        self.vertex_normals = vertex_normals
+        self.face_offsets = face_offsets
+        self.face_ids = list(face_ids)
+        self.body_offsets = body_offsets
+        self.body_ids = list(body_ids)
+
+    def __repr__(self):
+        return 'Mesh({} vertices, {} triangles, {} faces, {} bodies)'.format(
+            len(self.vertices), len(self.facets), len(self.face_ids), len(self.body_ids))
+
+
+class Polylines:
+    """
+    Tessellated edges in contiguous NumPy arrays
+
+    vertices: float32 (v, 3), the points of every edge one after the other
+    offsets: int32 (edges + 1), the first point of each edge; edge_ids: the id of each edge
+    body_offsets: int32 (bodies + 1), the first edge of each body (part); body_ids: the id of each body
+    """
+    __slots__ = ('vertices', 'offsets', 'edge_ids', 'body_offsets', 'body_ids')
+
+    def __init__(self, vertices, offsets, edge_ids=(), body_offsets=None, body_ids=()):
+        self.vertices = vertices
+        self.offsets = offsets
+        self.edge_ids = list(edge_ids)
+        self.body_offsets = body_offsets
+        self.body_ids = list(body_ids)
+
+    def edge(self, i: int):
+        """
+        The points of the i-th edge (a view of vertices)
+        """
+        return self.vertices[self.offsets[i]:self.offsets[i + 1]]
+
+    def __repr__(self):
+        return 'Polylines({} vertices, {} edges, {} bodies)'.format(
+            len(self.vertices), len(self.edge_ids), len(self.body_ids))
+
+
+def map_file(path: str) -> memoryview:
+    """
+    A read-only memoryview of a file mapped into memory, so that it is paged in only as it is read
+    """
+    if os.path.getsize(path) == 0:
+        return memoryview(b'')
+    with open(path, 'rb') as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def fetch_body(function, client, url, params={}, path: str = None) -> memoryview:
+    """
+    Call an endpoint function and return its undecoded body without copying it: a memoryview of the
+    in-memory buffer it was streamed into or, with path, of that file memory-mapped
+    """
+    if path is None:
+        buffer = io.BytesIO()
+        function(client, url, params=params, output=buffer)
+        return buffer.getbuffer()
+    function(client, url, params=params, output=path)
+    return map_file(path)
+
+
+def _as_body(body):
+    return map_file(body) if isinstance(body, (str, os.PathLike)) else body
+
+
+def _load(body):
+    try:
+        return json_loads(body)  # orjson reads a memoryview in place
+    except TypeError:
+        return json_loads(bytes(body))
+
+
+def _allocate(np, out_dir: str, name: str, shape: tuple, dtype):
+    """
+    An array to fill: in memory, or an .npy file in out_dir mapped into memory
+    """
+    if out_dir is None:
+        return np.empty(shape, dtype)
+    os.makedirs(out_dir, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(out_dir, name + '.npy'), mode='w+', dtype=dtype, shape=shape)
+
+
+def _store(np, out_dir: str, name: str, array, dtype):
+    if out_dir is None:
+        return np.ascontiguousarray(array, dtype)
+    stored = _allocate(np, out_dir, name, array.shape, dtype)
+    stored[...] = array
+    return stored
+
+
+def _from_values(np, out_dir: str, name: str, values, shape: tuple):
+    """
+    A float32 array of shape from an iterator over all its values in order; numpy converts them one by one
+    as they are read, without a Python list per row
+    """
+    array = np.fromiter(values, np.float32, int(np.prod(shape))).reshape(shape)
+    return array if out_dir is None else _store(np, out_dir, name, array, np.float32)
+
+
+def _offsets(np, sizes: list):
+    """
+    The int32 offsets of consecutive groups of the given sizes: 0, then the end of each group
+    """
+    offsets = np.zeros(len(sizes) + 1, np.int32)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets
+
+
+def _merge(np, mesh: Mesh, out_dir: str) -> Mesh:
+    """
+    Share the vertices of adjacent triangles: every distinct point is kept once and facets index into them
+    """
+    vertices, inverse = np.unique(np.asarray(mesh.vertices), axis=0, return_inverse=True)
+    mesh.vertices = _store(np, out_dir, 'vertices', vertices, np.float32)
+    mesh.facets = _store(np, out_dir, 'facets', inverse.reshape(-1, 3), np.int32)
+    return mesh
+
+
+def decode_tessellated_faces(body, merge: bool = False, out_dir: str = None) -> Mesh:
+    """
+    Decode a tessellated faces response (a list of bodies, each with "faces" made of "facets" with
+    3 "vertices", a "normal" and optionally "vertexNormals") into a Mesh, without building a Python
+    float for every coordinate of the result
+
+    body: the undecoded response: bytes, a memoryview (see fetch_body) or the path of a saved response
+    merge: share the vertices of adjacent triangles (by default each triangle has its own 3 vertices)
+    out_dir: write the arrays as .npy files into this folder and return them memory-mapped, for models
+        larger than memory (they can be reopened with numpy.load(..., mmap_mode='r'))
+    """
+    np = _numpy()
+    bodies = _load(_as_body(body))
+    if isinstance(bodies, dict):
+        bodies = [bodies]
+    faces = [face for part in bodies for face in part.get('faces') or ()]
+    facets = [facet for face in faces for facet in face.get('facets') or ()]
+    count = len(facets)
+    chain = itertools.chain.from_iterable
+
+    vertices = _from_values(np, None if merge else out_dir, 'vertices',
+                            chain(chain(facet['vertices'] for facet in facets)), (count * 3, 3))
+    normals = _from_values(np, out_dir, 'normals', chain(facet['normal'] for facet in facets), (count, 3))
+    vertex_normals = None
+    if count and 'vertexNormals' in facets[0]:
+        vertex_normals = _from_values(np, out_dir, 'vertex_normals',
+                                      chain(chain(facet['vertexNormals'] for facet in facets)), (count, 3, 3))
+    face_offsets = _offsets(np, [len(face.get('facets') or ()) for face in faces])
+    body_offsets = _offsets(np, [len(part.get('faces') or ()) for part in bodies])
+
+    mesh = Mesh(vertices, None, normals, vertex_normals, face_offsets, [face.get('id') for face in faces],
+                body_offsets, [part.get('id') for part in bodies])
+    if merge:
+        return _merge(np, mesh, out_dir)
+    mesh.facets = _store(np, out_dir, 'facets', np.arange(count * 3, dtype=np.int32).reshape(count, 3), np.int32)
+    return mesh
+
+
+def decode_tessellated_edges(body, out_dir: str = None) -> Polylines:
+    """
+    Decode a tessellated edges response (a list of bodies, each with "edges" made of "vertices")
+    into Polylines; body and out_dir as for decode_tessellated_faces
+    """
+    np = _numpy()
+    bodies = _load(_as_body(body))
+    if isinstance(bodies, dict):
+        bodies = [bodies]
+    edges = [edge for part in bodies for edge in part.get('edges') or ()]
+    offsets = _offsets(np, [len(edge.get('vertices') or ()) for edge in edges])
+    chain = itertools.chain.from_iterable
+    vertices = _from_values(np, out_dir, 'vertices', chain(chain(edge.get('vertices') or () for edge in edges)),
+                            (int(offsets[-1]), 3))
+    return Polylines(vertices, offsets, [edge.get('id') for edge in edges],
+                     _offsets(np, [len(part.get('edges') or ()) for part in bodies]), [part.get('id') for part in bodies])
+
+
+def decode_stl(body, merge: bool = False, out_dir: str = None) -> Mesh:
+    """
+    Decode an STL export into a Mesh. A binary STL is read in place from the buffer (or the memory-mapped
+    file) with a structured dtype, with a single copy into the contiguous result arrays; an ASCII STL is
+    parsed with regular expressions. body, merge and out_dir as for decode_tessellated_faces
+    """
+    np = _numpy()
+    body = _as_body(body)
+    size = len(body)
+    count = int.from_bytes(bytes(body[80:STL_HEADER]), 'little') if size >= STL_HEADER else -1
+    if size == STL_HEADER + 50 * count:
+        triangle = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+        records = np.frombuffer(body, triangle, count, STL_HEADER)  # a view of the body, no copy
+        vertices = _store(np, None if merge else out_dir, 'vertices', records['vertices'].reshape(count * 3, 3),
+                          np.float32)
+        normals = _store(np, out_dir, 'normals', records['normal'], np.float32)
+    else:
+        text = bytes(body)
+        vertices = np.array(STL_VERTEX.findall(text), np.float32).reshape(-1, 3)
+        if not merge:
+            vertices = _store(np, out_dir, 'vertices', vertices, np.float32)
+        normals = _store(np, out_dir, 'normals', np.array(STL_NORMAL.findall(text), np.float32).reshape(-1, 3),
+                         np.float32)
+        count = len(normals)
+    mesh = Mesh(vertices, None, normals, None, np.array([0, count], np.int32), [None], np.array([0, 1], np.int32),
+                [None])
+    if merge:
+        return _merge(np, mesh, out_dir)
+    mesh.facets = _store(np, out_dir, 'facets', np.arange(count * 3, dtype=np.int32).reshape(count, 3), np.int32)
+    return mesh
+
+
+def array_endpoint(function):
+    """
+    The "_arrays" version of an endpoint function listed in ARRAY_DECODERS: its response decoded straight
+    into NumPy arrays (see the decoder) instead of nested Python lists; needs numpy
+    """
+    decoder = globals()[ARRAY_DECODERS[function.__name__]]
+
+    def call_endpoint(client, url, params={}, path=None, **options):
+        return decoder(fetch_body(function, client, url, params, path), **options)
+
+    call_endpoint.__name__ = call_endpoint.__qualname__ = function.__name__ + '_arrays'
+    call_endpoint.__doc__ = '''
+    The response of `{}` decoded by `{}` into NumPy arrays.
+    - `path`: stream the response into this file and decode it memory-mapped, for very large models (default: None)
+    - `options`: the options of `{}` (`out_dir`, and `merge` for meshes)
+    '''.format(function.__name__, decoder.__name__, decoder.__name__)
+    return call_endpoint
@@ -0,0 +1,273 @@
+import heapq
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .batch import RETRY_STATUSES, retry_after
+from .downloads import download_file
+from .metrics import start_call
+from .responses import _chunks, read_response
+from .transport import send_request
+from .urls import parse_url
+
+TRANSLATION_ACCEPT = "application/json;charset=UTF-8; qs=0.09"  # the response content type of getTranslation
+EXTERNAL_DATA_ACCEPT = "application/octet-stream"  # the response content type of downloadExternalData
+DURATION_SAMPLES = 20  # the most recent translation durations the polling delays adapt to
+
+# The outcome of one translation: index is its position in the submitted jobs, translation the last
+# BTTranslationRequestInfo received, files the result files (their paths, or their bytes without out_dir),
+# seconds the time from its submission until its files were fetched; error is set if it failed
+TranslationResult = namedtuple('TranslationResult', ['index', 'job', 'translation', 'files', 'error', 'seconds'])
+
+
+class TranslationError(Exception):
+    """
+    A translation that failed (requestState FAILED) or did not finish in time
+    """
+    def __init__(self, message: str, translation: dict = None):
+        super().__init__(message)
+        self.translation = translation
+
+
+class _Translation:
+    """
+    The progress of one submitted job, only changed by the scheduler
+    """
+    __slots__ = ('index', 'job', 'ids', 'info', 'started', 'delay')
+
+    def __init__(self, index: int, job: tuple, delay: float):
+        self.index = index
+        self.job = job
+        self.ids = parse_url(job[1])
+        self.info = None
+        self.started = time.monotonic()
+        self.delay = delay
+
+
+class TranslationTracker:
+    """
+    Submits many translations and polls them all from one scheduler, fetching the result files of each
+    one as soon as it is done, so that the total time approaches that of the slowest translation:
+
+        tracker = TranslationTracker(client, out_dir="exports")
+        for result in tracker.run((createPartStudioTranslation, url, {}, payload) for url in urls):
+            print(result.translation["name"], result.files or result.error)
+
+    Each job is a tuple (function, url, params[, payload]) of an operation that starts a translation
+    (e.g. createPartStudioTranslation, createAssemblyTranslation). Every translation is polled with
+    getTranslation after an exponential backoff with random jitter, shortened to poll around the time
+    the translations finished so far took. 429 and 503 responses are retried after their Retry-After
+    delay, during which no other poll is made.
+
+    client: the Onshape client (or PooledTransport) passed to every function
+    workers: the threads submitting translations, polling them and fetching their results
+    max_polls: the most getTranslation calls in flight at once
+    window: the most translations submitted but not finished at once (default: 4 per worker)
+    initial_delay, backoff, max_delay: the first polling delay, its growth factor and its cap, in seconds
+    timeout: the most seconds a translation may take before it is given up (None: no limit)
+    out_dir: download the result files into this folder (named after the translation) instead of memory
+    fetch: download the result files at all; translations stored in a document have none
+    max_retries: the most retries of one call answered with 429 or 503
+    """
+    def __init__(self, client, workers: int = 8, max_polls: int = 4, window: int = None,
+                 initial_delay: float = 1.0, backoff: float = 1.5, max_delay: float = 30.0, timeout: float = None,
+                 out_dir: str = None, fetch: bool = True, max_retries: int = 5):
+        self.client = client
+        self.workers = workers
+        self.max_polls = max_polls
+        self.window = window or 4 * workers
+        self.initial_delay = initial_delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.out_dir = out_dir
+        self.fetch = fetch
+        self.max_retries = max_retries
+        self._paused_until = 0.0  # no poll before this time (set by a Retry-After)
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=DURATION_SAMPLES)
+        self._counts = {'translations': 0, 'polls': 0, 'retries': 0, 'done': 0, 'failed': 0, 'files': 0,
+                        'most_polls_in_flight': 0}
+
+    def _retrying(self, function, *args):
+        """
+        Call function, retrying 429 and 503 responses after their Retry-After delay or an exponential backoff
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return function(*args)
+            except Exception as error:
+                if getattr(error, 'status', None) not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = retry_after(error)
+                with self._lock:
+                    if delay is not None:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    else:
+                        delay = random.uniform(0, min(self.max_delay, self.initial_delay * 2 ** attempt))
+                    self._counts['retries'] += 1
+                time.sleep(delay)
+
+    def _create(self, job: tuple) -> dict:
+        operation, url, params = job[:3]
+        payload = job[3] if len(job) > 3 else {}
+        return self._retrying(operation, self.client, url, payload, params)
+
+    def _get(self, base: str, translation_id: str) -> dict:
+        call = start_call('getTranslation')
+        response = send_request(self.client, "GET", base + "/api/translations/" + translation_id, {},
+                                {"Accept": TRANSLATION_ACCEPT, "Content-Type": "application/json"}, None, call=call)
+        return read_response(response, call=call)
+
+    def _poll(self, tracked: _Translation) -> dict:
+        return self._retrying(self._get, tracked.ids.base, tracked.info['id'])
+
+    def _download(self, url: str, path: str):
+        headers = {"Accept": EXTERNAL_DATA_ACCEPT}
+        if path is not None:
+            download_file(self.client, url, path, headers=headers, call=start_call('downloadExternalData'))
+            return path
+        call = start_call('downloadExternalData')
+        response = send_request(self.client, "GET", url, {}, headers, None, stream=True, call=call)
+        data = b''.join(_chunks(response))
+        if call is not None:
+            call.lap('transfer')
+            call.finish(received=len(data))
+        return data
+
+    def _fetch(self, tracked: _Translation) -> list:
+        """
+        The result files of a finished translation: their paths in out_dir, or their bytes
+        """
+        info = tracked.info
+        file_ids = (info.get('resultExternalDataIds') or []) if self.fetch else []
+        did = info.get('resultDocumentId') or tracked.ids.did
+        name = info.get('name') or info['id']
+        files = []
+        for i, file_id in enumerate(file_ids):
+            url = "{}/api/documents/d/{}/externaldata/{}".format(tracked.ids.base, did, file_id)
+            path = None
+            if self.out_dir is not None:
+                os.makedirs(self.out_dir, exist_ok=True)
+                path = os.path.join(self.out_dir, name if len(file_ids) == 1 else '{}-{}'.format(name, i + 1))
+            files.append(self._retrying(self._download, url, path))
+        return files
+
+    def _next_poll(self, tracked: _Translation, now: float) -> float:
+        """
+        When to poll a running translation next: after its backoff delay (with jitter), or when a
+        translation usually finishes if that comes first
+        """
+        delay = tracked.delay * random.uniform(0.9, 1.1)
+        tracked.delay = min(self.max_delay, tracked.delay * self.backoff)
+        if self._durations:
+            expected = tracked.started + sorted(self._durations)[len(self._durations) // 2]
+            if now < expected < now + delay:
+                delay = expected - now
+        return now + max(delay, 0.05)
+
+    def _finish(self, tracked: _Translation, files: list = None, error: Exception = None) -> TranslationResult:
+        seconds = time.monotonic() - tracked.started
+        if error is None:
+            self._counts['done'] += 1
+            self._counts['files'] += len(files)
+        else:
+            self._counts['failed'] += 1
+        return TranslationResult(tracked.index, tracked.job, tracked.info, files, error, seconds)
+
+    def _received(self, tracked: _Translation, info: dict, pool: ThreadPoolExecutor, running: dict, waiting: list):
+        """
+        Handle a new state of a translation; returns its result if it is over without files to fetch
+        """
+        tracked.info = info
+        state = info.get('requestState')
+        now = time.monotonic()
+        if state == 'FAILED':
+            return self._finish(tracked, error=TranslationError(
+                "Translation {} failed: {}".format(info.get('id'), info.get('failureReason')), info))
+        if state == 'DONE':
+            self._durations.append(now - tracked.started)
+            running[pool.submit(self._fetch, tracked)] = ('fetch', tracked)
+        elif self.timeout is not None and now - tracked.started > self.timeout:
+            return self._finish(tracked, error=TranslationError(
+                "Translation {} not finished after {} seconds".format(info.get('id'), self.timeout), info))
+        else:
+            heapq.heappush(waiting, (self._next_poll(tracked, now), tracked.index, tracked))
+        return None
+
+    def run(self, jobs):
+        """
+        Submit the translations of the jobs and yield a TranslationResult for each as soon as its result
+        files are fetched (or it failed). Jobs are read from the iterable only as translations finish,
+        so that at most `window` are running at once.
+        """
+        jobs = iter(enumerate(jobs))
+        running = {}  # future -> (what it does: 'create', 'poll' or 'fetch', the _Translation)
+        waiting = []  # heap of (time of the next poll, index, _Translation)
+        active = 0  # translations submitted and not finished
+        polls = 0  # polls in flight
+        with ThreadPoolExecutor(self.workers, thread_name_prefix='onshape-translation') as pool:
+            try:
+                while True:
+                    while active < self.window:
+                        entry = next(jobs, None)
+                        if entry is None:
+                            break
+                        tracked = _Translation(entry[0], entry[1], self.initial_delay)
+                        running[pool.submit(self._create, tracked.job)] = ('create', tracked)
+                        active += 1
+                        self._counts['translations'] += 1
+                    now = time.monotonic()
+                    while waiting and polls < self.max_polls and max(waiting[0][0], self._paused_until) <= now:
+                        tracked = heapq.heappop(waiting)[2]
+                        running[pool.submit(self._poll, tracked)] = ('poll', tracked)
+                        polls += 1
+                        self._counts['polls'] += 1
+                    self._counts['most_polls_in_flight'] = max(self._counts['most_polls_in_flight'], polls)
+                    if not running and not waiting:
+                        return
+
+                    timeout = None
+                    if waiting and polls < self.max_polls:
+                        timeout = max(0.0, max(waiting[0][0], self._paused_until) - now)
+                    if running:
+                        done = wait(list(running), timeout, FIRST_COMPLETED)[0]
+                    else:
+                        time.sleep(timeout)
+                        done = ()
+                    for future in done:
+                        kind, tracked = running.pop(future)
+                        if kind == 'poll':
+                            polls -= 1
+                        error = future.exception()
+                        if error is not None:
+                            result = self._finish(tracked, error=error)
+                        elif kind == 'fetch':
+                            result = self._finish(tracked, future.result())
+                        else:
+                            result = self._received(tracked, future.result(), pool, running, waiting)
+                        if result is not None:
+                            active -= 1
+                            yield result
+            finally:
+                for future in running:
+                    future.cancel()  # the caller stopped early: skip what has not started yet
+
+    def stats(self) -> dict:
+        """
+        The translations submitted, the polls made, the retries, the translations done or failed,
+        the files fetched and the most polls that were in flight at once
+        """
+        with self._lock:
+            return dict(self._counts)
+
+
+def run_translations(client, jobs, **options):
+    """
+    Run the translation jobs (function, url, params[, payload]) with a TranslationTracker(client, **options);
+    yields TranslationResults as they finish
+    """
+    return TranslationTracker(client, **options).run(jobs)
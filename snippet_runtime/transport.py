@@ -0,0 +1,362 @@
+import base64
+import http.client
+import threading
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from .codec import json_dumps
+from .payloads import payload_body
+
+
+def with_query(url: str, query_params) -> str:
+    """
+    Append the query parameters to url; booleans are written as Onshape expects them ("true"/"false")
+    """
+    if not query_params:
+        return url
+    query = {key: str(value).lower() if isinstance(value, bool) else value
+             for key, value in dict(query_params).items()}
+    return url + ('&' if '?' in url else '?') + urlencode(query, doseq=True)
+
+
+def encode_body(method: str, body, headers: dict):
+    """
+    The request body to send: None for GET/HEAD, JSON for dictionaries and lists (setting the
+    Content-Type header if it is missing), and bytes or strings as they are
+    """
+    if method in ('GET', 'HEAD') or body is None:
+        return None
+    if isinstance(body, (bytes, str)):
+        return body
+    headers.setdefault('Content-Type', 'application/json')
+    return json_dumps(body)
+
+
+class ApiError(Exception):
+    """
+    An HTTP error status returned by Onshape through PooledTransport
+    """
+    def __init__(self, status: int, reason: str, body: bytes = b'', headers: dict = None):
+        super().__init__("({}) {}".format(status, reason))
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.headers = headers or {}
+
+
+class Response:
+    """
+    A fully read response, with the same attributes as the responses of onshape_client
+    (`status`, `reason`, `data`, `getheader()`, `getheaders()`); `raw` holds the undecoded body
+    """
+    def __init__(self, status: int, reason: str, headers: dict, raw: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.raw = raw
+
+    @property
+    def data(self) -> str:
+        return self.raw.decode('utf8')
+
+    def getheaders(self) -> dict:
+        return self.headers
+
+    def getheader(self, name: str, default=None):
+        return self.headers.get(name.lower(), default)
+
+
+class StreamedResponse(Response):
+    """
+    A response whose body is read on demand with read() or stream(); the connection goes back
+    to the pool once the body has been read to the end (or is closed if released early)
+    """
+    def __init__(self, transport, pool, connection, response, headers: dict):
+        super().__init__(response.status, response.reason, headers, None)
+        self._transport = transport
+        self._pool = pool
+        self._connection = connection
+        self._response = response
+
+    def read(self, amt: int = None) -> bytes:
+        if self._response is None:
+            return b''
+        chunk = self._response.read(amt)
+        if amt is None or not chunk:
+            self.release()
+        return chunk
+
+    def stream(self, chunk_size: int = 2 ** 16):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def release(self) -> None:
+        """
+        Give the connection back to the pool; an unfinished body closes the connection instead
+        """
+        if self._response is not None:
+            finished = self._response.isclosed()
+            self._transport._release(self._pool, self._connection, finished and not self._response.will_close)
+            self._pool.slots.release()
+            self._response = None
+
+    close = release
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __del__(self):
+        if getattr(self, '_response', None) is not None:
+            self.release()
+
+    @property
+    def raw(self) -> bytes:
+        if self._raw is None:
+            self._raw = self.read()
+        return self._raw
+
+    @raw.setter
+    def raw(self, value: bytes):
+        self._raw = value
+
+
+class _HostPool:
+    """
+    The idle keep-alive connections to one host, and a semaphore bounding the connections in use
+    """
+    def __init__(self, max_connections: int):
+        self.idle = []
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.opened = 0
+        self.reused = 0
+
+
+class PooledTransport:
+    """
+    An HTTP transport for the generated endpoint functions that keeps connections alive
+    and reuses them, instead of paying for a new TCP/TLS handshake per call.
+
+    Use it for every snippet with `use_transport(PooledTransport(access, secret))`, or pass it
+    in place of the Onshape client: `getDocument(transport, url)`.
+
+    access_key, secret_key: Onshape API keys, sent with HTTP basic authentication
+    max_per_host: the most connections open at once to one host; further calls wait for a free one
+    max_idle_per_host: the most idle connections kept open per host
+    timeout: socket timeout in seconds
+    """
+    def __init__(self, access_key: str = "", secret_key: str = "", max_per_host: int = 10,
+                 max_idle_per_host: int = None, timeout: float = 60):
+        self.max_per_host = max_per_host
+        self.max_idle_per_host = max_per_host if max_idle_per_host is None else max_idle_per_host
+        self.timeout = timeout
+        self.auth = None
+        if access_key and secret_key:
+            token = base64.b64encode('{}:{}'.format(access_key, secret_key).encode()).decode()
+            self.auth = 'Basic ' + token
+        self._pools = {}  # (scheme, host:port) -> _HostPool
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def _pool(self, key: tuple) -> _HostPool:
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = _HostPool(self.max_per_host)
+            return self._pools[key]
+
+    def _connect(self, key: tuple, pool: _HostPool):
+        with self._lock:
+            if pool.idle:
+                pool.reused += 1
+                return pool.idle.pop(), True
+            pool.opened += 1
+        scheme, netloc = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout), False
+
+    def _release(self, pool: _HostPool, connection, reusable: bool) -> None:
+        with self._lock:
+            if reusable and len(pool.idle) < self.max_idle_per_host:
+                pool.idle.append(connection)
+                return
+        connection.close()
+
+    def _send(self, method: str, url: str, headers: dict, body, preload: bool = True) -> Response:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = parts.path + ('?' + parts.query if parts.query else '')
+        pool = self._pool(key)
+        pool.slots.acquire()
+        streaming = False  # a StreamedResponse releases the slot itself
+        try:
+            for attempt in range(2):
+                connection, reused = self._connect(key, pool)
+                try:
+                    connection.request(method, target, body=body, headers=headers)
+                    response = connection.getresponse()
+                    if preload:
+                        raw = response.read()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    connection.close()
+                    if reused and attempt == 0:  # the server closed an idle connection; try a fresh one
+                        with self._lock:
+                            self.retries += 1
+                        continue
+                    raise
+                except BaseException:
+                    connection.close()
+                    raise
+                response_headers = {name.lower(): value for name, value in response.getheaders()}
+                if not preload:
+                    streaming = True
+                    return StreamedResponse(self, pool, connection, response, response_headers)
+                self._release(pool, connection, not response.will_close)
+                return Response(response.status, response.reason, response_headers, raw)
+        finally:
+            if not streaming:
+                pool.slots.release()
+
+    def request(self, method: str, url: str, query_params=None, headers=None, body=None,
+                _preload_content: bool = True, **kwargs) -> Response:
+        """
+        Make an API call; the same signature as `client.api_client.request` of onshape_client.
+        Redirects are followed and error statuses (400 and above) raise ApiError.
+        With _preload_content=False the body is not read: a StreamedResponse is returned instead.
+        """
+        with self._lock:  # the transport is shared between threads (BatchExecutor, coalescing)
+            self.requests += 1
+        url = with_query(url, query_params)
+        headers = dict(headers or {})
+        if self.auth:
+            headers.setdefault('Authorization', self.auth)
+        data = encode_body(method, body, headers)
+
+        for _ in range(5):
+            response = self._send(method, url, headers, data, _preload_content)
+            if response.status not in (301, 302, 303, 307, 308) or not response.getheader('Location'):
+                break
+            response.raw  # finish reading a streamed redirect so its connection is released
+            location = urljoin(url, response.getheader('Location'))
+            if urlsplit(location).netloc != urlsplit(url).netloc:
+                headers.pop('Authorization', None)  # never send the keys to another host
+            if response.status == 303:
+                method, data = 'GET', None
+            url = location
+        if response.status >= 400:
+            raise ApiError(response.status, response.reason, response.raw, response.headers)
+        return response
+
+    def stats(self) -> dict:
+        """
+        Connection reuse statistics, in total and per host
+        """
+        with self._lock:
+            hosts = {'{}://{}'.format(*key): {'opened': pool.opened, 'reused': pool.reused, 'idle': len(pool.idle)}
+                     for key, pool in self._pools.items()}
+            requests, retries = self.requests, self.retries
+        opened = sum(host['opened'] for host in hosts.values())
+        reused = sum(host['reused'] for host in hosts.values())
+        return {'requests': requests, 'connections_opened': opened, 'connections_reused': reused,
+                'reuse_ratio': reused / (opened + reused) if opened + reused else 0.0,
+                'retries': retries, 'hosts': hosts}
+
+    def close(self) -> None:
+        """
+        Close all idle connections
+        """
+        with self._lock:
+            for pool in self._pools.values():
+                for connection in pool.idle:
+                    connection.close()
+                pool.idle.clear()
+
+
+_transport = None  # the transport used by every endpoint function, if set with use_transport
+_cache = None  # the ResponseCache answering GET calls, if set with use_cache
+_coalescer = None  # the RequestCoalescer sharing identical GET calls in flight, if set with use_coalescing
+
+
+def use_transport(transport) -> None:
+    """
+    Send every API call of the snippets through transport (e.g. a PooledTransport);
+    None goes back to the `client` given to each function
+    """
+    global _transport
+    _transport = transport
+
+
+def use_cache(cache) -> None:
+    """
+    Answer the GET calls of the snippets from cache (a ResponseCache) when possible; None turns caching off
+    """
+    global _cache
+    _cache = cache
+
+
+def use_coalescing(coalescer):
+    """
+    Share one request between the identical GET calls of the snippets made at the same time from several
+    threads, with coalescer (a RequestCoalescer); None turns coalescing off. Returns the coalescer.
+    """
+    global _coalescer
+    _coalescer = coalescer
+    return coalescer
+
+
+def get_transport(client):
+    """
+    What makes the API calls of client: the transport set with use_transport, or else client itself
+    (the api_client of an onshape_client Client)
+    """
+    transport = _transport or client
+    if hasattr(transport, 'api_client'):
+        transport = transport.api_client
+    return transport
+
+
+def _cached_get(transport, url: str, query_params: dict, headers: dict):
+    """
+    A GET call answered from the ResponseCache when possible
+    """
+    if _cache is not None:
+        return _cache.request(transport, url, query_params, headers)
+    return transport.request('GET', url=url, query_params=query_params, headers=headers, body=None)
+
+
+def send_request(client, method: str, url: str, query_params: dict, headers: dict, body, stream: bool = False,
+                 call=None):
+    """
+    Make an API call for a generated function, through the transport set with use_transport,
+    or else through `client`: an onshape_client Client, or any object with a compatible `request` method
+
+    stream: do not read the body yet, so that read_response can process it chunk by chunk
+    (streamed responses are never cached nor shared)
+    call: the metrics.Call timing this call, if metrics are recorded
+    """
+    transport = get_transport(client)
+    body = payload_body(body)  # a payload builder is sent as JSON data
+    if call is not None:
+        call.lap('url')
+    try:
+        if _coalescer is not None and method == 'GET' and not stream:
+            response = _coalescer.request(_cached_get, transport, url, query_params, headers)
+        elif _cache is not None and method == 'GET' and not stream:
+            response = _cache.request(transport, url, query_params, headers)
+        elif stream:
+            response = transport.request(method, url=url, query_params=query_params, headers=headers, body=body,
+                                         _preload_content=False)
+        else:
+            response = transport.request(method, url=url, query_params=query_params, headers=headers, body=body)
+    except Exception as error:
+        if call is not None:
+            call.finish(getattr(error, 'status', None) or type(error).__name__)
+        raise
+    if call is not None:
+        call.lap('request')
+        call.status = response.status
+    return response
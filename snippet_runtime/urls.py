@@ -0,0 +1,49 @@
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import urlparse
+
+
+URL_CACHE_SIZE = 1024  # distinct document urls remembered by parse_url
+
+# The parts of an Onshape document url that the endpoints need
+ElementIds = namedtuple('ElementIds', ['base', 'did', 'wvm', 'wvmid', 'eid'])
+
+# The path parameters filled from the document url, and which part of the parsed url holds each
+ELEMENT_PATH_PARAMS = {'did': 'did',
+                       'wvm': 'wvm', 'wv': 'wvm', 'wm': 'wvm',
+                       'wvmid': 'wvmid', 'wvid': 'wvmid', 'wmid': 'wvmid', 'wid': 'wvmid',
+                       'eid': 'eid'}
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def parse_url(url: str) -> ElementIds:
+    """
+    Parse an Onshape document url the same way as onshape_client's OnshapeElement, e.g.
+    https://cad.onshape.com/documents/{did}/{wvm}/{wvmid}/e/{eid} -> (base, did, wvm, wvmid, eid)
+
+    Results are kept in a bounded LRU cache keyed by the url string, so calling many
+    endpoints on the same document only parses its url once.
+    """
+    parsed = urlparse(url)
+    path_list = parsed.path.split('/')
+    if len(path_list) < 5:
+        raise ValueError("Not an Onshape document url: {}".format(url))
+    if len(path_list) > 8:
+        eid = path_list[8]  # a url with a microversion: /documents/{did}/{wvm}/{wvmid}/m/{mid}/e/{eid}
+    elif len(path_list) > 5 and path_list[5] == 'e':
+        eid = path_list[6]
+    else:
+        eid = None
+    return ElementIds(parsed.scheme + '://' + parsed.netloc, path_list[2], path_list[3], path_list[4], eid)
+
+
+def url_cache_stats() -> dict:
+    """
+    The hit and miss counters of the parse_url cache
+    """
+    info = parse_url.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}
+
+
+def clear_url_cache() -> None:
+    parse_url.cache_clear()
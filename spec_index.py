@@ -0,0 +1,178 @@
+import re
+from typing import Dict, List, Optional
+
+
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace')
+
+
+def accept_header(operation: Dict) -> Optional[str]:
+    """
+    The response content type of an operation, which is sent as its "Accept" header;
+    None if the operation does not declare one
+    """
+    for status in ('default', '200'):
+        if status in operation['responses']:
+            content = list(operation['responses'][status].get('content', {}).keys())
+            return content[0] if content else None
+    return None
+
+
+def response_schema(openApi: Dict, operation: Dict) -> Dict:
+    """
+    The schema of the response an operation returns (the one of its Accept header), with $refs followed;
+    {} if there is none
+    """
+    for status in ('default', '200'):
+        if status in operation['responses']:
+            content = list(operation['responses'][status].get('content', {}).values())
+            schema = content[0].get('schema', {}) if content else {}
+            break
+    else:
+        return {}
+    seen = set()
+    while '$ref' in schema and schema['$ref'] not in seen:
+        seen.add(schema['$ref'])
+        schema = openApi['components']['schemas'].get(schema['$ref'].split('/')[-1], {})
+    return schema
+
+
+def is_paginated(openApi: Dict, operation: Dict) -> bool:
+    """
+    Whether an operation is a paged list: a GET taking the `offset` and `limit` query parameters
+    whose response holds a page of `items` and the `next` link to the following page
+    """
+    query = {param.get('name') for param in operation.get('parameters', []) if param.get('in') == 'query'}
+    if not {'offset', 'limit'} <= query:
+        return False
+    properties = response_schema(openApi, operation).get('properties', {})
+    return 'items' in properties and 'next' in properties
+
+
+def split_path(api_path: str) -> tuple:
+    """
+    Split an endpoint path into its literal segments (even positions) and path parameter names (odd positions)
+    e.g., "/documents/{did}" -> ("/api/documents/", "did", "")
+    """
+    return tuple(re.split(r'\{([^}]+)\}', '/api' + api_path))
+
+
+class Parameter:
+    """
+    One parameter of an operation, as the generator uses it
+    """
+    __slots__ = ('name', 'location', 'required', 'type', 'description', 'default')
+
+    def __init__(self, param: Dict):
+        schema = param.get('schema', {})
+        self.name = param['name']
+        self.location = param['in']  # "path", "query" or "header"
+        self.required = 'required' in param
+        self.type = schema.get('type')
+        self.description = param.get('description')
+        self.default = schema.get('default')
+
+    def __repr__(self):
+        return 'Parameter({!r}, {!r})'.format(self.name, self.location)
+
+
+class Operation:
+    """
+    Everything the generator and the runtime tools need to know about one operation of the spec,
+    read from it once
+
+    parameters: the Parameters of the operation, or None if it declares no "parameters" at all
+    accept: the response content type, sent as the Accept header (None if there is none)
+    statuses: the response statuses the spec declares
+    body_ref: the name of the component schema of the request body (None if it is not a reference)
+    body_type: the type of the request body schema when it is not a reference
+    """
+    __slots__ = ('operation_id', 'method', 'path', 'path_parts', 'tag', 'summary', 'parameters', 'accept',
+                 'statuses', 'has_body', 'body_required', 'body_description', 'body_ref', 'body_type', 'paginated')
+
+    def __init__(self, openApi: Dict, api_path: str, method: str, operation: Dict):
+        self.operation_id = operation.get('operationId')
+        self.method = method
+        self.path = api_path
+        self.path_parts = split_path(api_path)
+        self.tag = operation.get('tags', ['None'])[0]
+        self.summary = operation.get('summary', "").replace('\n', ' ')
+        if 'parameters' in operation:
+            self.parameters = tuple(Parameter(param) for param in operation['parameters'])
+        else:
+            self.parameters = None
+        self.accept = accept_header(operation)
+        self.statuses = tuple(operation['responses'])
+        body = operation.get('requestBody')
+        self.has_body = body is not None
+        self.body_required = self.has_body and 'required' in body
+        self.body_description = body.get('description') if body else None
+        self.body_ref = self.body_type = None
+        if body and body.get('content'):
+            schema = next(iter(body['content'].values())).get('schema', {})
+            if '$ref' in schema:
+                self.body_ref = schema['$ref'].split('/')[-1]
+            else:
+                self.body_type = schema.get('type')
+        self.paginated = method == 'get' and is_paginated(openApi, operation)
+
+    def parameter_names(self) -> List[str]:
+        return [param.name for param in self.parameters or ()]
+
+    def __repr__(self):
+        return 'Operation({!r}, {} {})'.format(self.operation_id, self.method.upper(), self.path)
+
+
+class SpecIndex:
+    """
+    The operations of an OpenAPI spec, read in a single pass and indexed by operationId,
+    by tag, by path and by parameter name, e.g.:
+
+        index = get_index(openApi)
+        index.by_id['getDocument'].accept
+        index.taking('did', 'eid')  # the operations with both parameters in their path or query
+    """
+    def __init__(self, openApi: Dict):
+        self.openApi = openApi
+        self.tags = {item['name']: item.get('description') for item in openApi.get('tags', [])}
+        self.operations = []  # in the order of the spec
+        self.by_id = {}  # operationId -> Operation
+        self.by_tag = {}  # tag -> [Operation, ...]
+        self.by_path = {}  # path -> {method: Operation}, in the order of the spec
+        self.by_parameter = {}  # parameter name -> [Operation, ...]
+        for api_path, path_item in openApi['paths'].items():
+            for method, operation in path_item.items():
+                if method not in HTTP_METHODS or not isinstance(operation, dict):
+                    continue  # e.g. path-level "parameters"
+                record = Operation(openApi, api_path, method, operation)
+                self.operations.append(record)
+                if record.operation_id is not None:
+                    self.by_id[record.operation_id] = record
+                self.by_tag.setdefault(record.tag, []).append(record)
+                self.by_path.setdefault(api_path, {})[method] = record
+                for name in dict.fromkeys(record.parameter_names() + list(record.path_parts[1::2])):
+                    self.by_parameter.setdefault(name, []).append(record)
+
+    def at(self, api_path: str, method: str) -> Operation:
+        return self.by_path[api_path][method.lower()]
+
+    def taking(self, *names: str) -> List[Operation]:
+        """
+        The operations that take every one of the given parameters, in the order of the spec
+        """
+        if not names:
+            return list(self.operations)
+        matches = set.intersection(*(set(self.by_parameter.get(name, ())) for name in names))
+        return [operation for operation in self.by_parameter.get(names[0], ()) if operation in matches]
+
+
+_indexes = {}  # id(openApi) -> SpecIndex
+
+
+def get_index(openApi: Dict) -> SpecIndex:
+    """
+    The index of an OpenAPI spec, built the first time it is needed
+    """
+    index = _indexes.get(id(openApi))
+    if index is None or index.openApi is not openApi:
+        index = _indexes[id(openApi)] = SpecIndex(openApi)
+    return index
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import json
+import marshal
+import os
+import sys
+import urllib.error
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+from snippet_runtime.codec import json_loads
+
+
+DEFAULT_CACHE_DIR = '.openapi_cache'
+SPEC_PATH = '/api/openapi'
+# marshal is not stable across interpreter versions, so snapshots are tagged with it
+SNAPSHOT_SUFFIX = '.py{}{}.marshal'.format(*sys.version_info[:2])
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """
+    Write data to path through a temporary file so that an interrupted build
+    never leaves a truncated cache entry behind
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _read_index(cache_dir: str) -> Dict:
+    """
+    The index maps each spec URL to the ETag and content hash of its last download
+    """
+    try:
+        with open(os.path.join(cache_dir, 'index.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir: str, index: Dict) -> None:
+    _atomic_write(os.path.join(cache_dir, 'index.json'),
+                  json.dumps(index, indent=2, sort_keys=True).encode())
+
+
+def load_snapshot(cache_dir: str, digest: str, raw: Optional[bytes] = None) -> Dict:
+    """
+    Return the parsed spec for the content hash digest.
+    The pre-parsed marshal snapshot is used when present; otherwise the raw JSON
+    (given, or read from the cache) is parsed once and the snapshot is written for next time.
+
+    cache_dir: the content-addressed cache folder
+    digest: the sha256 of the raw JSON document
+    raw: the raw JSON document, if it was just downloaded or read
+    """
+    snapshot_path = os.path.join(cache_dir, digest + SNAPSHOT_SUFFIX)
+    try:
+        with open(snapshot_path, 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    if raw is None:
+        with open(os.path.join(cache_dir, digest + '.json'), 'rb') as f:
+            raw = f.read()
+    openApi = json_loads(raw)
+    os.makedirs(cache_dir, exist_ok=True)
+    _atomic_write(snapshot_path, marshal.dumps(openApi))
+    return openApi
+
+
+def store_spec(cache_dir: str, raw: bytes) -> str:
+    """
+    Add a raw JSON document to the content-addressed cache and return its digest
+    """
+    digest = hashlib.sha256(raw).hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    raw_path = os.path.join(cache_dir, digest + '.json')
+    if not os.path.exists(raw_path):
+        _atomic_write(raw_path, raw)
+    return digest
+
+
+def read_spec_file(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> Dict:
+    """
+    Load the spec from a local JSON file, reusing the parsed snapshot of identical content
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = store_spec(cache_dir, raw)
+    return load_snapshot(cache_dir, digest, raw)
+
+
+def fetch_spec(url: str, etag: Optional[str] = None, access: str = "", secret: str = "",
+               timeout: float = 60) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Download the spec, sending If-None-Match when an ETag is known.
+    Returns (None, etag) if Onshape answers 304 Not Modified, otherwise (body, new etag).
+    """
+    headers = {'Accept': 'application/json', 'Accept-Encoding': 'identity'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if access and secret:  # the spec is public, but keys avoid anonymous rate limits
+        token = base64.b64encode('{}:{}'.format(access, secret).encode()).decode()
+        headers['Authorization'] = 'Basic ' + token
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read(), response.headers.get('ETag')
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, etag
+        raise
+
+
+def load_openapi(base: str = 'https://cad.onshape.com', spec_file: Optional[str] = None,
+                 cache_dir: str = DEFAULT_CACHE_DIR, offline: bool = False,
+                 access: str = "", secret: str = "") -> Dict:
+    """
+    Get the Onshape OpenAPI document as a dictionary
+    Source (Glassworks): https://cad.onshape.com/glassworks/explorer/
+
+    base: the Onshape stack to download the spec from
+    spec_file: read this local JSON file instead of going to Onshape
+    cache_dir: the content-addressed cache of downloaded specs and their parsed snapshots
+    offline: never touch the network; use the last cached spec for base
+    access, secret: optional Onshape API keys
+    """
+    if spec_file:
+        return read_spec_file(spec_file, cache_dir)
+
+    url = base.rstrip('/') + SPEC_PATH
+    index = _read_index(cache_dir)
+    entry = index.get(url)
+    if offline:
+        if entry is None:
+            raise FileNotFoundError(
+                "No cached OpenAPI spec for {} in {}; run once online or pass a spec file".format(url, cache_dir))
+        return load_snapshot(cache_dir, entry['sha256'])
+
+    try:
+        raw, etag = fetch_spec(url, entry and entry.get('etag'), access, secret)
+    except (urllib.error.URLError, OSError) as e:
+        if entry is None:
+            raise
+        print("Could not reach {} ({}); using the cached spec".format(url, e))
+        return load_snapshot(cache_dir, entry['sha256'])
+    if raw is None:  # 304 Not Modified
+        return load_snapshot(cache_dir, entry['sha256'])
+
+    digest = store_spec(cache_dir, raw)
+    index[url] = {'etag': etag, 'sha256': digest}
+    _write_index(cache_dir, index)
+    return load_snapshot(cache_dir, digest, raw)
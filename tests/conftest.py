@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_server import start_mock_server  # noqa: E402
+from snippet_runtime import use_cache, use_coalescing, use_transport  # noqa: E402
+
+# A spec with a single operation, getDocument, for the tests calling the mock server
+SPEC = {
+    'openapi': '3.0.1',
+    'paths': {'/documents/{did}': {'get': {
+        'operationId': 'getDocument',
+        'parameters': [{'name': 'did', 'in': 'path', 'required': True, 'schema': {'type': 'string'}}],
+        'responses': {'default': {'description': 'ok', 'content': {
+            'application/json;charset=UTF-8; qs=0.09': {'schema': {
+                'type': 'object', 'properties': {'id': {'type': 'string'}, 'name': {'type': 'string'}}}}}}},
+    }}},
+    'components': {'schemas': {}},
+}
+
+
+def document_url(server, host: str = '127.0.0.1', did: str = 'a' * 24) -> str:
+    """
+    A document url on the mock server
+    """
+    return 'http://{}:{}/documents/{}/w/{}/e/{}'.format(host, server.server_port, did, 'b' * 24, 'c' * 24)
+
+
+@pytest.fixture(scope='session')
+def mock_server():
+    """
+    The mock server of SPEC, answering after 50 ms
+    """
+    server = start_mock_server(SPEC, latency=0.05)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mock(mock_server):
+    """
+    The mock server with its counts emptied and a document url on it; the global settings
+    of the snippets are reset after the test
+    """
+    mock_server.reset()
+    yield mock_server, document_url(mock_server)
+    use_transport(None)
+    use_cache(None)
+    use_coalescing(None)
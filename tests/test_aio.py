@@ -0,0 +1,62 @@
+"""
+AsyncTransport and run_concurrently against the mock server
+"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from conftest import document_url
+from snippet_runtime import ApiError, AsyncTransport, async_endpoint, endpoint, run_concurrently
+
+ACCEPT = "application/json;charset=UTF-8; qs=0.09"
+getDocument_async = async_endpoint(endpoint("getDocument", "GET", "/documents/{did}", ACCEPT))
+getMissing_async = async_endpoint(endpoint("getMissing", "GET", "/missing/{did}", ACCEPT))  # not in the spec
+
+
+def run(calls, **options) -> list:
+    async def main():
+        async with AsyncTransport() as session:
+            return await run_concurrently(session, calls, **options)
+    return asyncio.run(main())
+
+
+def test_results_in_input_order(mock, monkeypatch):
+    server, _ = mock
+    dids = ['{:024x}'.format(i) for i in range(30)]
+    monkeypatch.setattr(server, 'traffic', {
+        ('GET', '/api/documents/' + did): [{'status': 200, 'body': json.dumps({'id': did}),
+                                            'content_type': 'application/json'}] for did in dids})
+    monkeypatch.setattr(server, 'jitter', 0.04)  # the calls finish in another order
+    results = run([(getDocument_async, document_url(server, did=did), {}) for did in dids])
+    assert [result['id'] for result in results] == dids
+
+
+def test_max_concurrency(mock):
+    server, url = mock
+    results = run([(getDocument_async, url, {})] * 20, max_concurrency=3)
+    assert len(results) == 20
+    assert server.most_in_flight == 3
+    assert server.statuses == {200: 20}
+
+
+def test_per_host(mock):
+    server, _ = mock
+    hosts = ['127.0.0.1', 'localhost']  # two bases for the same server
+    calls = [(getDocument_async, document_url(server, host=hosts[i % 2]), {}) for i in range(20)]
+    run(calls, max_concurrency=20, per_host=2)
+    assert sorted(server.most_in_flight_per_host.values()) == [2, 2]
+    assert server.most_in_flight <= 4
+
+
+def test_failing_call_is_reported(mock):
+    server, url = mock
+    calls = [(getDocument_async, url, {}), (getMissing_async, url, {}), (getDocument_async, url, {})]
+    results = run(calls, return_exceptions=True)
+    assert isinstance(results[1], ApiError) and results[1].status == 404
+    assert results[0] == results[2] and 'id' in results[0]
+    with pytest.raises(ApiError) as error:
+        run(calls)
+    assert error.value.status == 404
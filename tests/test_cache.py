@@ -0,0 +1,47 @@
+"""
+The ResponseCache with the default client of the notebook (onshape_client), against the mock server
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+onshape_client = pytest.importorskip('onshape_client.client')
+
+from snippet_runtime import RequestCoalescer, ResponseCache, endpoint, use_cache, use_coalescing
+
+getDocument = endpoint("getDocument", "GET", "/documents/{did}", "application/json;charset=UTF-8; qs=0.09")
+
+
+@pytest.fixture(scope='module')
+def client(mock_server):
+    """
+    The default client, configured for the mock server
+    """
+    base = 'http://127.0.0.1:{}'.format(mock_server.server_port)
+    yield onshape_client.Client(configuration={'base_url': base, 'access_key': 'a' * 24, 'secret_key': 's' * 48})
+    onshape_client.Client.clear_client()
+
+
+def test_revalidated_with_default_client(mock, client):
+    server, url = mock
+    cache = ResponseCache()
+    use_cache(cache)
+    first = getDocument(client, url)
+    second = getDocument(client, url)  # answered with a 304, which onshape_client takes for a redirect
+    assert second == first
+    assert cache.stats()['revalidated'] == 1
+    assert server.statuses == {200: 1, 304: 1}
+
+
+def test_coalesced_and_cached_with_default_client(mock, client):
+    server, url = mock
+    cache = ResponseCache()
+    use_cache(cache)
+    coalescer = use_coalescing(RequestCoalescer())
+    with ThreadPoolExecutor(8) as pool:
+        first = list(pool.map(lambda _: getDocument(client, url), range(8)))
+        second = list(pool.map(lambda _: getDocument(client, url), range(8)))  # waiters of a revalidation
+    assert all(result == first[0] for result in first + second)
+    assert cache.stats()['revalidated'] >= 1
+    assert coalescer.stats()['coalesced'] > 0
+    assert 304 in server.statuses
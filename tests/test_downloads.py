@@ -0,0 +1,154 @@
+"""
+download_file against the files the mock server serves (fixtures): ranges, parallel segments and resuming
+"""
+import json
+import os
+import random
+
+import pytest
+
+from mock_server import start_mock_server
+from snippet_runtime import DownloadError, PooledTransport, download_endpoint, download_file, endpoint
+from snippet_runtime import downloads
+
+SIZE = 2 ** 20 + 7  # not a multiple of the segments
+SEGMENT = 2 ** 16
+SPEC = {
+    'openapi': '3.0.1',
+    'paths': {'/documents/{did}/export': {'get': {
+        'operationId': 'exportFile',
+        'parameters': [{'name': 'did', 'in': 'path', 'required': True, 'schema': {'type': 'string'}}],
+        'responses': {'200': {'description': 'ok', 'content': {'application/octet-stream': {}}}},
+    }}},
+    'components': {'schemas': {}},
+}
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    """
+    A mock server serving a file as the response of exportFile
+    """
+    fixture = tmp_path_factory.mktemp('served') / 'model.bin'
+    fixture.touch()
+    server = start_mock_server(SPEC, fixtures={'exportFile': str(fixture)})
+    server.fixture = fixture
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def change(fixture, data: bytes) -> None:
+    """
+    Write a new version of the served file (a new ETag, even within the same second)
+    """
+    fixture.write_bytes(data)
+    info = os.stat(fixture)
+    os.utime(fixture, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def served(server):
+    """
+    The mock server serving SIZE random bytes with range support, the url of the file, its path and its content
+    """
+    data = random.Random(0).randbytes(SIZE)
+    change(server.fixture, data)
+    server.ranges = True
+    server.reset()
+    url = 'http://127.0.0.1:{}/api/documents/{}/export'.format(server.server_port, 'a' * 24)
+    return server, url, server.fixture, data
+
+
+def test_single_stream(served, tmp_path):
+    server, url, _, data = served
+    exportFile = endpoint("exportFile", "GET", "/documents/{did}/export", "application/octet-stream")
+    path = str(tmp_path / 'out.bin')
+    document = 'http://127.0.0.1:{}/documents/{}/w/{}/e/{}'.format(server.server_port, 'a' * 24, 'b' * 24, 'c' * 24)
+    assert download_endpoint(exportFile)(PooledTransport(), document, path) == SIZE
+    assert open(path, 'rb').read() == data
+    assert server.statuses == {206: 1}
+    assert os.listdir(tmp_path) == ['out.bin']
+
+
+def test_segments_are_byte_identical(served, tmp_path):
+    server, url, _, data = served
+    path = str(tmp_path / 'out.bin')
+    assert download_file(PooledTransport(), url, path, segments=4, min_segment=SEGMENT) == SIZE
+    assert open(path, 'rb').read() == data
+    assert server.statuses == {206: 4}
+
+
+def test_without_range_support(served, tmp_path):
+    server, url, _, data = served
+    server.ranges = False
+    path = str(tmp_path / 'out.bin')
+    assert download_file(PooledTransport(), url, path, segments=4, min_segment=SEGMENT) == SIZE
+    assert open(path, 'rb').read() == data
+    assert server.statuses == {200: 1}
+
+
+def interrupt_last_segment(monkeypatch, transport, url: str, path: str) -> None:
+    """
+    Download the file in 4 segments, with the connection of the last one reset
+    """
+    write_range = downloads._write_range
+
+    def failing(transport, url, query_params, headers, part, segment, *args):
+        if segment[2] == SIZE:
+            raise ConnectionResetError("reset by the test")
+        return write_range(transport, url, query_params, headers, part, segment, *args)
+
+    monkeypatch.setattr(downloads, '_write_range', failing)
+    with pytest.raises(ConnectionResetError):
+        download_file(transport, url, path, segments=4, min_segment=SEGMENT)
+    monkeypatch.setattr(downloads, '_write_range', write_range)
+
+
+def test_resume_from_partial_file(served, tmp_path, monkeypatch):
+    server, url, _, data = served
+    path = str(tmp_path / 'out.bin')
+    transport = PooledTransport()
+    interrupt_last_segment(monkeypatch, transport, url, path)
+    with open(path + '.part.json') as f:
+        segments = json.load(f)['segments']
+    assert [end - done for _, done, end in segments] == [0, 0, 0, SIZE - SIZE * 3 // 4]
+
+    requested = []
+    write_range = downloads._write_range
+    monkeypatch.setattr(downloads, '_write_range', lambda *args: requested.append(list(args[5])) or write_range(*args))
+    server.reset()
+    assert download_file(transport, url, path, segments=4, min_segment=SEGMENT) == SIZE
+    assert requested == [[SIZE * 3 // 4, SIZE * 3 // 4, SIZE]]  # only the missing range
+    assert open(path, 'rb').read() == data
+    assert not os.path.exists(path + '.part.json')
+
+
+def test_resume_of_changed_file_starts_over(served, tmp_path, monkeypatch):
+    server, url, fixture, _ = served
+    path = str(tmp_path / 'out.bin')
+    transport = PooledTransport()
+    interrupt_last_segment(monkeypatch, transport, url, path)
+    data = random.Random(1).randbytes(SIZE)
+    change(fixture, data)
+    assert download_file(transport, url, path, segments=4, min_segment=SEGMENT) == SIZE
+    assert open(path, 'rb').read() == data
+
+
+@pytest.mark.parametrize('size', [SIZE, SIZE + 100], ids=['etag', 'size'])
+def test_file_changed_during_download(served, tmp_path, monkeypatch, size):
+    server, url, fixture, _ = served
+    write_range = downloads._write_range
+    changed = []
+
+    def changing(*args):
+        if not changed:
+            changed.append(True)
+            change(fixture, random.Random(1).randbytes(size))
+        return write_range(*args)
+
+    monkeypatch.setattr(downloads, '_write_range', changing)
+    path = str(tmp_path / 'out.bin')
+    with pytest.raises(DownloadError, match='changed during the download'):
+        download_file(PooledTransport(), url, path, segments=4, min_segment=SEGMENT)
+    assert not os.path.exists(path)
@@ -0,0 +1,24 @@
+"""
+read_response with the bodies of the different clients
+"""
+from snippet_runtime import Metrics, read_response, start_call, use_metrics
+
+
+class TextResponse:
+    """
+    A response of onshape_client, whose body is decoded text
+    """
+    status = 200
+
+    def __init__(self, data: str):
+        self.data = data
+
+
+def test_bytes_received_of_text_body():
+    body = '{"name": "Pièce à côté"}'
+    metrics = use_metrics(Metrics())
+    try:
+        assert read_response(TextResponse(body), call=start_call('getDocument')) == {'name': 'Pièce à côté'}
+    finally:
+        use_metrics(None)
+    assert metrics.summary()['getDocument']['bytes'] == len(body.encode('utf8')) == len(body) + 4
@@ -0,0 +1,100 @@
+"""
+PooledTransport against the mock server: connection reuse, redirects, retries and thread safety
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from mock_server import MockHandler
+from snippet_runtime import PooledTransport, endpoint
+
+getDocument = endpoint("getDocument", "GET", "/documents/{did}", "application/json;charset=UTF-8; qs=0.09")
+
+
+class Redirecting(BaseHTTPRequestHandler):
+    """
+    Answers every request with a redirect to the same path on the mock server, and keeps the headers it got
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.seen.append(dict(self.headers))
+        self.send_response(self.server.status)
+        self.send_header('Location', self.server.target + self.path)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def redirecting(mock_server):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Redirecting)
+    server.target = 'http://127.0.0.1:{}'.format(mock_server.server_port)
+    server.status = 302
+    server.seen = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(mock):
+    server, url = mock
+    transport = PooledTransport()
+    results = [getDocument(transport, url) for _ in range(5)]
+    assert all(result == results[0] for result in results)
+    stats = transport.stats()
+    assert stats['requests'] == 5
+    assert (stats['connections_opened'], stats['connections_reused']) == (1, 4)
+    assert stats['reuse_ratio'] == 0.8
+    assert server.statuses == {200: 5}
+    transport.close()
+    assert transport.stats()['hosts']['http://127.0.0.1:{}'.format(server.server_port)]['idle'] == 0
+
+
+@pytest.mark.parametrize('status', [302, 307])
+def test_redirects_are_followed(mock, redirecting, status):
+    server, url = mock
+    redirecting.status = status
+    transport = PooledTransport('a' * 24, 's' * 48)
+    moved = url.replace(str(server.server_port), str(redirecting.server_port))
+    assert getDocument(transport, moved) == getDocument(transport, url)
+    assert server.statuses == {200: 2}
+    assert 'Authorization' in redirecting.seen[0]
+    assert len(transport.stats()['hosts']) == 2
+
+
+def test_stale_connection_is_retried(mock, monkeypatch):
+    server, url = mock
+
+    class ClosingIdle(MockHandler):
+        timeout = 0.1  # the server closes a connection idle for longer
+
+    monkeypatch.setattr(server, 'RequestHandlerClass', ClosingIdle)
+    transport = PooledTransport()
+    first = getDocument(transport, url)
+    time.sleep(0.3)
+    assert getDocument(transport, url) == first
+    stats = transport.stats()
+    assert stats['retries'] == 1
+    assert (stats['connections_opened'], stats['connections_reused']) == (2, 1)
+    assert server.statuses == {200: 2}
+
+
+def test_counters_are_consistent_across_threads(mock, monkeypatch):
+    server, url = mock
+    monkeypatch.setattr(server, 'latency', 0.0)
+    transport = PooledTransport(max_per_host=4)
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda _: getDocument(transport, url), range(200)))
+    stats = transport.stats()
+    assert stats['requests'] == 200
+    assert stats['connections_opened'] + stats['connections_reused'] == 200
+    assert stats['connections_opened'] <= 4
+    assert stats['retries'] == 0
+    assert server.statuses == {200: 200}